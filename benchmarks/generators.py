@@ -0,0 +1,106 @@
+"""Synthetic Slurm / LUMI command output for benchmarks.
+
+Every generator is deterministic for a given `seed` so reports from different
+versions of the code are comparable.
+"""
+import random
+from datetime import datetime, timedelta
+
+SQUEUE_STATES = ["RUNNING"] * 6 + ["PENDING"] * 3 + ["CONFIGURING", "COMPLETING"]
+QUEUE_REASONS = ["(Priority)", "(Priority)", "(Resources)", "(Dependency)", "(QOSMaxGRESPerUser)"]
+GRES = ["gres/gpu:8", "gres/gpu:mi250:8", "gres/gpu:4", "gres/gpu:1", "N/A"]
+USERS = [f"user{i:03d}" for i in range(200)]
+
+BASE_TIME = datetime(2025, 10, 1, 12, 0, 0)
+
+
+def _slurm_duration(rng, max_seconds, compact=True):
+    """Random duration in Slurm format; squeue drops leading zero fields, sacct does not."""
+    seconds = rng.randrange(0, max_seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}-{hours:02d}:{minutes:02d}:{seconds:02d}"
+    if hours or not compact:
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def generate_squeue_jobs(rows, seed=0):
+    """Output of `squeue -o "%i %T %j %M %L %V"`."""
+    rng = random.Random(seed)
+    lines = ["JOBID STATE NAME TIME TIME_LEFT SUBMIT_TIME"]
+    for i in range(rows):
+        state = rng.choice(SQUEUE_STATES)
+        running = _slurm_duration(rng, 3 * 86400) if state == "RUNNING" else "0:00"
+        submit = BASE_TIME - timedelta(seconds=rng.randrange(0, 7 * 86400))
+        lines.append(" ".join([
+            str(4_000_000 + i),
+            state,
+            f"job_{rng.randrange(rows // 4 + 1)}",
+            running,
+            _slurm_duration(rng, 2 * 86400),
+            submit.strftime("%Y-%m-%dT%H:%M:%S"),
+        ]))
+    return "\n".join(lines)
+
+
+def generate_squeue_queue(rows, seed=0):
+    """Output of `squeue -p <partition> -o '%D %b %l %T %R'`."""
+    rng = random.Random(seed)
+    lines = ["NODES TRES_PER_NODE TIME_LIMIT STATE NODELIST(REASON)"]
+    for _ in range(rows):
+        nodes = rng.choice([1, 1, 2, 4, 8, 16, 64, 128])
+        if rng.random() < 0.5:
+            state, reason = "RUNNING", f"nid{rng.randrange(10000):06d}"
+        else:
+            state, reason = "PENDING", rng.choice(QUEUE_REASONS)
+        lines.append(f"{nodes} {rng.choice(GRES)} {_slurm_duration(rng, 2 * 86400)} {state} {reason}")
+    return "\n".join(lines)
+
+
+def generate_sacct(rows, projects, seed=0):
+    """Output of `sacct ... --format Account,User,Elapsed,AllocTRES,Start -P`."""
+    rng = random.Random(seed)
+    lines = ["Account|User|Elapsed|AllocTRES|Start"]
+    for _ in range(rows):
+        gpus = rng.choice([0, 2, 8, 16, 64, 128])
+        tres = f"billing=128,cpu=56,gres/gpu={gpus},mem=480G,node=1" if gpus else "billing=1,cpu=1,mem=2G,node=1"
+        start = BASE_TIME - timedelta(seconds=rng.randrange(0, 7 * 86400))
+        lines.append("|".join([
+            rng.choice(projects),
+            rng.choice(USERS),
+            _slurm_duration(rng, 2 * 86400, compact=False),
+            tres,
+            start.strftime("%Y-%m-%dT%H:%M:%S"),
+        ]))
+        # sacct -P also lists job steps, which have no user
+        if rng.random() < 0.3:
+            lines.append(f"{lines[-1].split('|')[0]}||00:00:01|cpu=1|{start.strftime('%Y-%m-%dT%H:%M:%S')}")
+    return "\n".join(lines)
+
+
+def generate_project_names(count):
+    return [f"project_{462000000 + i}" for i in range(count)]
+
+
+def generate_lumi_allocations(rows, seed=0):
+    """Output of `lumi-allocations` with `rows` project lines."""
+    rng = random.Random(seed)
+    lines = [
+        "> lumi-allocations",
+        f"Data updated: {BASE_TIME.strftime('%Y-%m-%d %H:%M:%S')}",
+        "Project             |                    CPU (used/allocated)|               GPU (used/allocated)|           Storage (used/allocated)",
+        "-" * 70,
+    ]
+    for name in generate_project_names(rows):
+        allocated = rng.choice([0, 50_000, 1_500_000, 2_000_000])
+        used = rng.randrange(0, (allocated or 10_000_000) + 1)
+        pct = f"{used / allocated * 100:5.1f}%" if allocated else "  N/A "
+        lines.append(
+            f"{name:<20}|{used * 10:>16}/{allocated * 10:<8} ({pct}) core/hours"
+            f"|{used:>12}/{allocated:<8} ({pct}) gpu/hours"
+            f"|{used // 10:>12}/{allocated // 10:<8} ({pct}) TB/hours"
+        )
+    return "\n".join(lines)
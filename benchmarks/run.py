@@ -0,0 +1,247 @@
+"""Time the monitor's parsers and aggregations on synthetic Slurm output.
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --output bench.json
+    python -m benchmarks.run --compare old.json --output new.json
+    python -m benchmarks.run --imports --only none
+
+The report is plain JSON keyed by benchmark name and row count, so two
+reports from different versions can be diffed directly or with --compare.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks import generators
+from slurmmonitor import quota
+from slurmmonitor.lumi.allocations import parse_lumi_allocations
+from slurmmonitor.slurm.util import parse_job_state, parse_queue_node_days
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+# entry points timed by --imports: main.py (e.g. a --once run) and the CLI
+IMPORT_TARGETS = ["main", "slurmmonitor.__main__"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUOTA_PROJECTS = generators.generate_project_names(8)
+
+
+@contextlib.contextmanager
+def patched(module, name, value):
+    orig = getattr(module, name)
+    setattr(module, name, value)
+    try:
+        yield
+    finally:
+        setattr(module, name, orig)
+
+
+def _quota_cfg():
+    return {
+        project: {
+            "start": "2025-06-01",
+            "end": "2026-05-31",
+            "milestone": {"name": "checkpoint", "date": "2026-01-31", "target_pct": 40.0},
+        }
+        for project in QUOTA_PROJECTS
+    }
+
+
+def bench_parse_job_state(rows):
+    text = generators.generate_squeue_jobs(rows)
+    return lambda: parse_job_state(text)
+
+
+def bench_queue_days(rows):
+    text = generators.generate_squeue_queue(rows)
+    return lambda: parse_queue_node_days(text)
+
+
+def bench_parse_lumi_allocations(rows):
+    text = generators.generate_lumi_allocations(rows)
+    return lambda: parse_lumi_allocations(text)
+
+
+def bench_weekly_by_project(rows):
+    text = generators.generate_sacct(rows, QUOTA_PROJECTS)
+
+    def run():
+        with patched(quota, "run_or_raise", lambda _: text):
+            return quota.get_weekly_gpu_hours_by_project(QUOTA_PROJECTS)
+    return run
+
+
+def bench_weekly_by_user(rows):
+    text = generators.generate_sacct(rows, QUOTA_PROJECTS)
+
+    def run():
+        with patched(quota, "run_or_raise", lambda _: text):
+            return quota.get_weekly_gpu_hours_by_user(QUOTA_PROJECTS)
+    return run
+
+
+def bench_compute_gpu_quota_messages(rows):
+    sacct = generators.generate_sacct(rows, QUOTA_PROJECTS)
+    allocations = parse_lumi_allocations(generators.generate_lumi_allocations(len(QUOTA_PROJECTS)))
+    allocations["updated_at"] = datetime.now()
+    cfg = _quota_cfg()
+
+    def run():
+        with patched(quota, "run_or_raise", lambda _: sacct), \
+                patched(quota, "get_lumi_allocations", lambda: allocations):
+            return quota.compute_gpu_quota_messages(cfg)
+    return run
+
+
+BENCHMARKS = {
+    "parse_job_state": bench_parse_job_state,
+    "queue_days": bench_queue_days,
+    "parse_lumi_allocations": bench_parse_lumi_allocations,
+    "weekly_gpu_hours_by_project": bench_weekly_by_project,
+    "weekly_gpu_hours_by_user": bench_weekly_by_user,
+    "compute_gpu_quota_messages": bench_compute_gpu_quota_messages,
+}
+
+
+def time_callable(fn, min_time=0.5, max_repeats=20):
+    """Run `fn` repeatedly and return per-call timings in seconds."""
+    timings = []
+    total = 0.0
+    while not timings or (total < min_time and len(timings) < max_repeats):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        total += elapsed
+    return timings
+
+
+def _importtime(code):
+    """[(module, cumulative seconds)] for the top-level imports `code` makes
+    in a fresh interpreter, from python -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  "):
+            entries.append((name.strip(), int(cumulative) / 1e6))
+    return entries
+
+
+def measure_import(module, repeats=3):
+    """Seconds to import `module`, best of `repeats` fresh interpreters, not
+    counting what the bare interpreter imports anyway. Also returns every
+    module the import loaded."""
+    baseline = {name for name, _ in _importtime("pass")}
+    best = None
+    for _ in range(repeats):
+        seconds = sum(t for name, t in _importtime(f"import {module}") if name not in baseline)
+        best = seconds if best is None else min(best, seconds)
+    loaded = subprocess.run(
+        [sys.executable, "-c", f"import sys; import {module}; print('\\n'.join(sorted(sys.modules)))"],
+        cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+    return best, loaded
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(names, sizes, min_time=0.5):
+    results = {}
+    for name in names:
+        results[name] = {}
+        for rows in sizes:
+            fn = BENCHMARKS[name](rows)
+            timings = time_callable(fn, min_time=min_time)
+            best = min(timings)
+            results[name][str(rows)] = {
+                "repeats": len(timings),
+                "min_s": best,
+                "median_s": statistics.median(timings),
+                "rows_per_s": rows / best if best > 0 else None,
+            }
+            print(f"{name:32} {rows:>9} rows  min {best * 1000:10.2f} ms  "
+                  f"median {statistics.median(timings) * 1000:10.2f} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare_reports(old, new):
+    """Return lines describing the min-time ratio new/old for each shared benchmark."""
+    lines = []
+    for name, by_size in new["results"].items():
+        for rows, result in by_size.items():
+            prev = old.get("results", {}).get(name, {}).get(rows)
+            if not prev or not prev.get("min_s"):
+                continue
+            ratio = result["min_s"] / prev["min_s"]
+            lines.append(f"{name:32} {rows:>9} rows  {prev['min_s'] * 1000:10.2f} ms -> "
+                         f"{result['min_s'] * 1000:10.2f} ms  ({ratio:.2f}x)")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(str(i) for i in DEFAULT_SIZES),
+                        help="comma separated row counts, e.g. 1000,10000,1000000")
+    parser.add_argument("--only", default=None,
+                        help="comma separated benchmark names to run ('none' with --imports)")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimum seconds spent per benchmark/size")
+    parser.add_argument("--output", default=None, help="write JSON report to this file")
+    parser.add_argument("--compare", default=None, help="previous JSON report to compare against")
+    parser.add_argument("--imports", action="store_true",
+                        help=f"also time importing {', '.join(IMPORT_TARGETS)}")
+    args = parser.parse_args(argv)
+
+    sizes = [int(i) for i in args.sizes.split(",") if i]
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    if names == ["none"]:
+        names = []
+    unknown = [i for i in names if i not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    report = run_benchmarks(names, sizes, min_time=args.min_time)
+    if args.imports:
+        report["imports"] = {}
+        for module in IMPORT_TARGETS:
+            seconds, _ = measure_import(module)
+            report["imports"][module] = {"min_s": seconds}
+            print(f"import {module:26}  min {seconds * 1000:10.2f} ms", file=sys.stderr)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        for line in compare_reports(old, report):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
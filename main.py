@@ -1,31 +1,36 @@
 import argparse
-import datetime
 import json
 import logging
-import os
-import requests
+import sys
 import time
+from datetime import datetime
 
-from slurmmonitor.checks import check_job_status, check_free_inodes, check_free_bytes, check_queue_days
-from slurmmonitor.config import job_config, free_bytes_config, free_inodes_config, gpu_quota_projects
+from slurmmonitor import quota
+from slurmmonitor.aggregator import NotificationAggregator
+from slurmmonitor.journal import TrackerJournal
+from slurmmonitor.lumi.allocations import allocations_cache
+from slurmmonitor.lustre import lustre_quota
 from slurmmonitor.snapshot import ClusterDataSnapshot
 from slurmmonitor.message import MessageTracker
-from slurmmonitor.quota import compute_gpu_quota_messages, get_weekly_gpu_hours_by_user
+from slurmmonitor.monitor import Monitor, snapshot_record
+from slurmmonitor.sinks import FanOut, build_sinks
+from slurmmonitor.schedule import FixedRateTicker, JobScheduler
+from slurmmonitor.settings import SettingsWatcher, load_settings
+from slurmmonitor.quota import compute_gpu_quota_messages, get_gpu_quota_values, get_weekly_gpu_hours_by_user
+from slurmmonitor.throughput import ThroughputTracker
+from slurmmonitor.timing import StageTimer
+from slurmmonitor.watch import file_metadata, make_watcher
 
-from dotenv import load_dotenv
+# Optional features (metrics and query servers, usage scans, the accounting
+# cube, profiling) import their modules in main() only when enabled, so a
+# --once run from a timer starts quickly.
 
-load_dotenv()
-
-def post_msg(message):
-    print(message)
-    headers = {'Content-Type': 'application/json'}
-    payload = {'text': message}
-
-    webhook_url = os.getenv("WEBHOOK_URL")
-    response = requests.post(webhook_url, headers=headers, data=json.dumps(payload))
-
-    if response.status_code != 200:
-        print(f"Error posting to slack: {response.status_code}, {response.text}")
+# cycles slower than this log their stage breakdown as a warning
+SLOW_CYCLE_SECONDS = 30
+# every snapshot is appended here; --once resumes from the last one
+LOG_FILE = "log.jsonl"
+# how long --once waits for sinks to deliver before exiting
+ONCE_DELIVERY_TIMEOUT = 60
 
 def setup_logging(debug):
     logger = logging.getLogger()
@@ -37,111 +42,276 @@ def setup_logging(debug):
     logger.addHandler(console_handler)
 
 
+def weekly_usage_lines(gpu_quota_projects):
+    weekly_by_user = get_weekly_gpu_hours_by_user(list(gpu_quota_projects.keys()))
+    lines = []
+    for project, by_user in (weekly_by_user or {}).items():
+        if not by_user:
+            continue
+        lines.append(f"{project}:")
+        for username, hours in sorted(by_user.items(), key=lambda kv: kv[1], reverse=True):
+            lines.append(f"  {username}: {hours} GPUh")
+    return lines
+
+
+def weekly_summary_lines(gpu_quota_projects):
+    lines = weekly_usage_lines(gpu_quota_projects)
+    return ["GPU usage by user (last 7d):"] + lines if lines else []
+
+
+def print_weekly_usage_by_user(gpu_quota_projects):
+    try:
+        lines = weekly_usage_lines(gpu_quota_projects)
+        if lines:
+            print("Weekly GPU usage by user (last 7d):")
+            print("\n".join(lines))
+    except Exception as e:
+        print(f"Error computing weekly per-user GPU usage: {e}")
+
+
+def update_quota_metrics(exporter, gpu_quota_projects):
+    try:
+        exporter.update_quota(get_gpu_quota_values(gpu_quota_projects))
+    except Exception as e:
+        print(f"Error collecting GPU quota metrics: {e}")
+
+
+def refresh_accounting_cube(gpu_quota_projects):
+    # keeps the query server's numbers current: at most one small sacct per SACCT_CACHE_SECONDS
+    try:
+        quota.accounting_cube.refresh(list(gpu_quota_projects), max_age=quota.SACCT_CACHE_SECONDS)
+    except Exception as e:
+        print(f"Error updating accounting cube: {e}")
+
+
+def restore_snapshot(monitor, filename, tracker_restored):
+    """Resume `monitor` from the last snapshot in `filename`, so a --once
+    run sees job state changes since the previous run."""
+    from slurmmonitor.replay import RecordedSnapshot, last_record
+
+    try:
+        record = last_record(filename)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        print(f"Not resuming from {filename}: {e}")
+        return
+    if record is None:
+        return
+    monitor.snapshot = RecordedSnapshot.from_record(record)
+    monitor.last_time = datetime.fromtimestamp(record["timestamp"])
+    if tracker_restored:
+        # not a fresh start, even if nothing was tracked yet: post this
+        # cycle's changes instead of echoing them
+        monitor.first_run = False
+
+
 def main(args):
+    from dotenv import load_dotenv
+
+    load_dotenv()
     setup_logging(args.debug)
 
-    message_tracker = MessageTracker()
+    allocations_cache.path = args.allocations_cache or None
+    if args.accounting_cube:
+        from slurmmonitor.accounting import AccountingCube
+
+        # weekly/daily GPU usage is summed from the cube instead of re-running sacct
+        quota.accounting_cube = AccountingCube.load(args.accounting_cube)
+
+    # stall and progress checks stat job files through this cache
+    file_metadata.configure(make_watcher(args.watch), poll_ttl=args.metadata_ttl)
+
+    # settings from --config, reloaded between cycles, or config.py alone
+    settings_watcher = SettingsWatcher(args.config) if args.config else None
+    settings = settings_watcher.current if settings_watcher else load_settings()
+    lustre_quota.configure(**settings.lustre_quota_config)
+
+    # each sink posts from its own background worker
+    fanout = FanOut(build_sinks(settings.sinks_config)).start()
+    if not fanout.sinks:
+        print("No notification sinks configured; messages are only printed")
+
+    journal = TrackerJournal(args.state_file) if args.state_file else None
+    message_tracker = MessageTracker(journal=journal, **settings.tracker_config)
 
-    last_time = datetime.datetime.now()
-    prev_snapshot = None
-    snapshot = None
-    first_run = True
+    usage = None
+    usage_cfg = settings.usage_scan_config
+    # a one-shot run exits before a background scan could report
+    if usage_cfg.get("enabled", True) and not args.once:
+        from slurmmonitor.usage import UsageScanner, UsageScans
+
+        # scans of paths with free_bytes/free_inodes alerts run on their own thread
+        scanner = UsageScanner(usage_cfg.get("cache_path"), max_workers=usage_cfg.get("max_workers", 8))
+        usage = UsageScans(scanner, min_interval=usage_cfg.get("min_interval", 3600)).start()
+
+    schedule_cfg = settings.schedule_config
+    # reports fire at their calendar times, caught up after a restart
+    scheduler = JobScheduler(schedule_cfg.get("jobs", {}), args.schedule_state or None)
+    ticker = FixedRateTicker(schedule_cfg.get("interval", 60), jitter=schedule_cfg.get("jitter", 0))
+
+    timer = StageTimer()
+    monitor = Monitor(
+        print,
+        settings.jobs,
+        settings.free_bytes_config,
+        settings.free_inodes_config,
+        quota_lines=lambda: compute_gpu_quota_messages(settings.gpu_quota_projects),
+        timer=timer,
+        # a single cycle has nothing to coalesce with; post right away
+        aggregator=None if args.once else NotificationAggregator(**settings.notification_config),
+        message_tracker=message_tracker,
+        fanout=fanout,
+        incremental=True,
+        rules=settings.rules_config,
+        throughput=ThroughputTracker(**settings.throughput_config),
+        usage=usage,
+        scheduler=scheduler,
+        weekly_lines=lambda: weekly_summary_lines(settings.gpu_quota_projects),
+    )
+
+    if args.once:
+        if journal is None:
+            print("--once without --state-file: alerts under a dwell time are never posted")
+        restore_snapshot(monitor, LOG_FILE, tracker_restored=journal is not None and journal.loaded)
+    elif monitor.first_run:
+        # No saved state: show GPU quota at startup to aid local runs
+        try:
+            quota_lines = compute_gpu_quota_messages(settings.gpu_quota_projects)
+            if quota_lines:
+                print("\n".join(quota_lines))
+        except Exception as e:
+            print(f"Error computing GPU quota messages: {e}")
+        print_weekly_usage_by_user(settings.gpu_quota_projects)
+    else:
+        print(f"Resuming with {len(message_tracker.messages)} tracked messages from {args.state_file}")
+
+    exporter = None
+    if args.metrics_port is not None and not args.once:
+        from slurmmonitor.metrics import MetricsExporter, MetricsServer
+
+        exporter = MetricsExporter(timer=timer)
+        server = MetricsServer(exporter, args.metrics_host, args.metrics_port).start()
+        print(f"Serving metrics on http://{args.metrics_host}:{server.port}/metrics")
+        update_quota_metrics(exporter, settings.gpu_quota_projects)
+
+    query_server = None
+    if args.query_socket and not args.once:
+        from slurmmonitor.query import QueryServer, QuotaQuery
+
+        query = QuotaQuery(quota.accounting_cube, allocations_cache, projects=settings.gpu_quota_projects,
+                           usage=usage)
+        query_server = QueryServer(query, args.query_socket).start()
+        print(f"Answering quota queries on {args.query_socket}")
+
+    profiler = None
+    profile_cycles = args.profile
+    if profile_cycles:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    cycles = 0
     while True:
+        timer.start_cycle()
+        if settings_watcher is not None:
+            with timer.span("settings_reload"):
+                reloaded = settings_watcher.poll()
+            if reloaded is not None:
+                settings, changes = reloaded
+                monitor.reconfigure(settings, changes)
+                if query_server is not None:
+                    query.projects = list(settings.gpu_quota_projects)
+
         try:
-            new_snapshot = ClusterDataSnapshot()
+            snapshot = ClusterDataSnapshot(timer=timer, settings=settings)
         except Exception as e:
             print(f"got exception getting ClusterDataSnapshot: {e}")
+            if args.once:
+                return 1
             time.sleep(5)
             continue
-        prev_snapshot = snapshot
-        snapshot = new_snapshot
-
-        messages = []
-        messages.extend(check_queue_days(snapshot))
-        messages.extend(check_free_bytes(free_bytes_config, snapshot))
-        messages.extend(check_free_inodes(free_inodes_config, snapshot))
-        messages.extend(check_job_status(job_config, snapshot, prev_snapshot))
-
-        out_messages = []
-        for message in messages:
-            out_message = message_tracker.handle(message)
-            if out_message is not None:
-                out_messages.append(out_message)
-        out_message = "\n".join([str(i) for i in out_messages])
-        # Include GPU quota in first loop output to aid local runs
-        if first_run:
-            try:
-                quota_lines = compute_gpu_quota_messages(gpu_quota_projects)
-                if quota_lines:
-                    if out_message:
-                        out_message += "\n"
-                    out_message += "\n".join(quota_lines)
-            except Exception as e:
-                print(f"Error computing GPU quota messages: {e}")
-            try:
-                projects = list(gpu_quota_projects.keys())
-                weekly_by_user = get_weekly_gpu_hours_by_user(projects)
-                if weekly_by_user:
-                    print("Weekly GPU usage by user (last 7d):")
-                    for project, by_user in weekly_by_user.items():
-                        if not by_user:
-                            continue
-                        print(f"{project}:")
-                        for username, hours in sorted(by_user.items(), key=lambda kv: kv[1], reverse=True):
-                            print(f"  {username}: {hours} GPUh")
-            except Exception as e:
-                print(f"Error computing weekly per-user GPU usage: {e}")
-        if out_message:
-            if first_run:
-                first_run = False
-                print(out_message)
-                continue
-            post_msg(out_message)
-
-        with open("log.jsonl", "a") as f:
-            f.write(json.dumps({
-                "timestamp": time.time(),
-                "job_state": {k: v.model_dump() for k,v in snapshot.jobs.items() if v is not None},
-            }) + "\n")
-
-        current_time = datetime.datetime.now()
-        if last_time.hour == 8 and current_time.hour == 9:
-            active_messages = message_tracker.get_active_messages()
-            daily_message = "\n".join([str(i) for i in active_messages])
-
-            # Append GPU quota status (daily only)
-            try:
-                quota_lines = compute_gpu_quota_messages(gpu_quota_projects)
-                if quota_lines:
-                    if daily_message:
-                        daily_message += "\n"
-                    daily_message += "\n".join(quota_lines)
-            except Exception as e:
-                print(f"Error computing GPU quota messages: {e}")
-            post_msg("Daily Status:\n" + daily_message)
 
+        result = monitor.run_cycle(snapshot)
+        if query_server is not None and quota.accounting_cube is not None:
+            with timer.span("accounting_refresh"):
+                refresh_accounting_cube(settings.gpu_quota_projects)
+        if exporter is not None:
+            exporter.update_snapshot(snapshot)
+
+        record = snapshot_record(snapshot, time.time())
+        record["timings"] = timer.cycle_timings()
+        with timer.span("log_write"):
+            with open(LOG_FILE, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+        if result.daily_report is not None:
             # Also log (stdout only) a per-user GPU usage breakdown for last 7 days
-            try:
-                projects = list(gpu_quota_projects.keys())
-                weekly_by_user = get_weekly_gpu_hours_by_user(projects)
-                if weekly_by_user:
-                    print("Weekly GPU usage by user (last 7d):")
-                    for project, by_user in weekly_by_user.items():
-                        if not by_user:
-                            continue
-                        print(f"{project}:")
-                        for username, hours in sorted(by_user.items(), key=lambda kv: kv[1], reverse=True):
-                            print(f"  {username}: {hours} GPUh")
-            except Exception as e:
-                print(f"Error computing weekly per-user GPU usage: {e}")
-        last_time = current_time
-
-        time.sleep(60)
+            print_weekly_usage_by_user(settings.gpu_quota_projects)
+            logging.info("Stage timings (rolling):\n" + timer.format_stats())
+            if exporter is not None:
+                update_quota_metrics(exporter, settings.gpu_quota_projects)
+
+        if timer.cycle_total() > SLOW_CYCLE_SECONDS:
+            logging.warning(f"slow {timer.format_cycle()}")
+        else:
+            logging.debug(timer.format_cycle())
+
+        cycles += 1
+        if profiler is not None and (cycles >= profile_cycles or args.once):
+            import pstats
+
+            profiler.disable()
+            profiler.dump_stats(args.profile_output)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
+            print(f"Wrote cProfile output for {cycles} cycles to {args.profile_output}")
+            profiler = None
+
+        if args.once:
+            break
+        skipped = ticker.wait()
+        if skipped:
+            logging.warning(f"cycle overran the {ticker.period}s interval, skipped {skipped} tick(s) "
+                            f"({ticker.skipped} since start)")
+
+    # the tracker journal is already saved; wait for the sinks to deliver
+    # what this cycle posted, then record the reports they confirmed
+    fanout.stop(timeout=ONCE_DELIVERY_TIMEOUT)
+    monitor.settle_reports()
+    return 0
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+    parser.add_argument('--once', action='store_true',
+                        help='Run one cycle from the saved state, post, save and exit (for cron/systemd timers)')
+    parser.add_argument('--profile', type=int, default=0, metavar='N',
+                        help='Run cProfile for the first N cycles and dump the stats')
+    parser.add_argument('--profile-output', default='monitor.prof',
+                        help='File to write --profile stats to (default: monitor.prof)')
+    parser.add_argument('--config', default=None,
+                        help='JSON or TOML file overriding config.py sections, reloaded when it changes')
+    parser.add_argument('--state-file', default='tracker_state.jsonl',
+                        help='Journal of tracked messages, kept across restarts ("" to disable)')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve OpenMetrics for the latest snapshot on this port')
+    parser.add_argument('--metrics-host', default='127.0.0.1',
+                        help='Address for the metrics endpoint (default: 127.0.0.1)')
+    parser.add_argument('--allocations-cache', default='lumi_allocations.json',
+                        help='File caching lumi-allocations output between runs ("" to disable)')
+    parser.add_argument('--accounting-cube', default=None,
+                        help='Keep daily GPU-hours per account/user/partition in this file (e.g. gpu_hours_cube.json) '
+                             'and sum weekly/daily usage from it instead of re-running sacct')
+    parser.add_argument('--schedule-state', default='schedule_state.json',
+                        help='File keeping the last run of each scheduled report ("" to disable)')
+    parser.add_argument('--query-socket', default=None,
+                        help='Answer "python -m slurmmonitor quota --socket" queries on this Unix socket')
+    parser.add_argument('--watch', choices=['auto', 'poll'], default='poll',
+                        help='auto: watch job files on local filesystems with inotify, polling the rest (default: poll)')
+    parser.add_argument('--metadata-ttl', type=float, default=0,
+                        help='Seconds to reuse polled job file metadata (default: 0)')
     args = parser.parse_args()
-    
-    main(args)
+
+    sys.exit(main(args))
@@ -1,4 +1,11 @@
-from . import checks
-from . import config
-from . import snapshot
-from . import message
+import importlib
+
+# Submodules load on first access, so `python -m slurmmonitor quota` and
+# `main.py --once` only import what their path uses.
+_SUBMODULES = ("checks", "config", "snapshot", "message", "monitor")
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,122 @@
+"""Ad-hoc reports from the accounting cube and usage scans.
+
+    python -m slurmmonitor quota [--since 2026-09-01] [--until 2026-10-01]
+                                 [--by user] [--account project_x] [--json]
+    python -m slurmmonitor usage /scratch/project_x [--json]
+
+With --socket the running monitor answers from its in-memory data (see
+query.py) and nothing else is run. Otherwise usage is read from the cube
+file main.py maintains (see accounting.py); it is brought up to date with
+sacct unless --no-update. A --since further back than the cube goes
+backfills it, in parallel day-sized sacct queries.
+
+`usage` scans a directory tree for the owners and subdirectories using its
+space and inodes, reusing unchanged directories from the last scan; with
+--socket it returns the monitor's latest scan instead.
+"""
+import argparse
+import json
+import sys
+from datetime import date, datetime
+
+from slurmmonitor.accounting import DIMENSIONS, AccountingCube
+from slurmmonitor.config import gpu_quota_projects
+from slurmmonitor.query import QueryError, QuotaQuery, ask, format_response, format_usage
+from slurmmonitor.usage import UsageScanner
+
+DEFAULT_CUBE = "gpu_hours_cube.json"
+DEFAULT_USAGE_CACHE = "usage_cache.json"
+
+
+def _parse_day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def quota_report(args):
+    request = {"days": args.days, "by": args.by, "accounts": args.account or list(gpu_quota_projects)}
+    if args.since:
+        request["since"] = args.since.isoformat()
+    if args.until:
+        request["until"] = args.until.isoformat()
+    if args.user:
+        request["users"] = args.user
+    if args.partition:
+        request["partitions"] = args.partition
+
+    try:
+        if args.socket:
+            response = ask(args.socket, request)
+        else:
+            query = QuotaQuery(AccountingCube.load(args.cube))
+            since, _ = query.window(request)
+            if not args.no_update:
+                today = datetime.now().date()
+                query.cube.update(request["accounts"], backfill_days=max((today - since).days, 7))
+            response = query.answer(request)
+    except (QueryError, OSError) as e:
+        print(f"quota: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(response, indent=4))
+    else:
+        print(format_response(response))
+    return 0
+
+
+def usage_report(args):
+    try:
+        if args.socket:
+            usage = ask(args.socket, {"usage": args.path})["usage"]
+        else:
+            usage = UsageScanner(args.cache or None, max_workers=args.workers).scan(args.path).to_dict()
+    except (QueryError, OSError) as e:
+        print(f"usage: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(usage, indent=4))
+    else:
+        print(format_usage(usage, n=args.top))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m slurmmonitor", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    quota = commands.add_parser("quota", help="GPU-hours by account/user/partition/day over a date range")
+    quota.add_argument("--since", type=_parse_day, help="first day (default: --days ago)")
+    quota.add_argument("--until", type=_parse_day, help="day after the last one (default: tomorrow)")
+    quota.add_argument("--days", type=int, default=7, help="window size without --since (default: 7, including today)")
+    quota.add_argument("--by", nargs="+", choices=DIMENSIONS, default=["account"],
+                       help="dimensions to group by (default: account)")
+    quota.add_argument("--account", action="append", help="limit to this account (repeatable; default: gpu_quota_projects)")
+    quota.add_argument("--user", action="append", help="limit to this user (repeatable)")
+    quota.add_argument("--partition", action="append", help="limit to this partition (repeatable)")
+    quota.add_argument("--socket", help="ask the monitor listening on this socket (main.py --query-socket)")
+    quota.add_argument("--cube", default=DEFAULT_CUBE, help=f"cube file (default: {DEFAULT_CUBE})")
+    quota.add_argument("--no-update", action="store_true", help="don't run sacct, report what the cube has")
+    quota.add_argument("--json", action="store_true", help="print JSON")
+    quota.set_defaults(func=quota_report)
+
+    usage = commands.add_parser("usage", help="bytes and inodes under a path by owner and subdirectory")
+    usage.add_argument("path")
+    usage.add_argument("--socket", help="return the monitor's latest scan (main.py --query-socket)")
+    usage.add_argument("--cache", default=DEFAULT_USAGE_CACHE,
+                       help=f"per-directory scan cache (default: {DEFAULT_USAGE_CACHE}, \"\" to disable)")
+    usage.add_argument("--workers", type=int, default=8, help="parallel directory listings (default: 8)")
+    usage.add_argument("--top", type=int, default=10, help="rows per table (default: 10)")
+    usage.add_argument("--json", action="store_true", help="print JSON")
+    usage.set_defaults(func=usage_report)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""Daily GPU-hour rollup of Slurm accounting data.
+
+AccountingCube keeps GPU-hours per (day, account, user, partition), built
+from sacct allocation rows and saved as JSON. Updates only re-fetch the days
+since the last complete one, so answering "last 30 days per user" or "since
+the milestone started" is a sum over a few hundred cells instead of a new
+sacct run. The first day fetched is kept per account, so a window reaching
+further back only fetches the days before it.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from slurmmonitor.quota import _elapsed_to_hours, _gpu_count_from_tres, _parse_sacct_time
+from slurmmonitor.slurm.command import run_or_raise
+
+logger = logging.getLogger(__name__)
+
+SACCT_FORMAT = "JobID,Account,User,Partition,Elapsed,AllocTRES,Start"
+DIMENSIONS = ("day", "account", "user", "partition")
+
+# sharding of large sacct windows, see fetch_gpu_jobs_sharded
+SHARD_HOURS = 24
+ACCOUNTS_PER_QUERY = 4
+MAX_PARALLEL_QUERIES = 4
+
+
+class GpuJob:
+    """One sacct allocation row with GPUs."""
+    __slots__ = ("job_id", "account", "user", "partition", "start", "hours", "gpus")
+
+    def __init__(self, job_id, account, user, partition, start, hours, gpus):
+        self.job_id = job_id
+        self.account = account
+        self.user = user
+        self.partition = partition
+        self.start = start
+        self.hours = hours
+        self.gpus = gpus
+
+    @property
+    def end(self):
+        return self.start + timedelta(hours=self.hours)
+
+
+def parse_sacct_gpu_jobs(sacct_output):
+    """Parse `sacct -X -P --format SACCT_FORMAT` output into GpuJobs.
+
+    Rows without an account, user, start or GPUs are skipped. `gpus` counts
+    MI250X GCD pairs (sacct's GPU count / 2), as in quota.py.
+    """
+    jobs = []
+    for line in sacct_output.splitlines():
+        if not line or line.startswith("JobID|"):
+            continue
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) < 7:
+            continue
+        job_id, account, user, partition, elapsed, alloc_tres, start = parts[:7]
+        if not account or not user:
+            continue
+        gpus = _gpu_count_from_tres(alloc_tres)
+        start = _parse_sacct_time(start)
+        if gpus <= 0 or start is None:
+            continue
+        jobs.append(GpuJob(job_id, account, user, partition, start, _elapsed_to_hours(elapsed), gpus / 2.0))
+    return jobs
+
+
+def fetch_gpu_jobs(accounts, start, end):
+    """Run sacct for GPU allocations of `accounts` active in [start, end)."""
+    cmd = (
+        f"sacct -a -X -A {','.join(accounts)} "
+        f"--starttime {start.strftime('%Y-%m-%dT%H:%M:%S')} --endtime {end.strftime('%Y-%m-%dT%H:%M:%S')} "
+        f"--format {SACCT_FORMAT} -P"
+    )
+    return parse_sacct_gpu_jobs(run_or_raise(cmd))
+
+
+def shard_window(start, end, hours=SHARD_HOURS):
+    """Split [start, end) into consecutive pieces of at most `hours`."""
+    step = timedelta(hours=hours)
+    shards = []
+    cursor = start
+    while cursor < end:
+        shards.append((cursor, min(cursor + step, end)))
+        cursor += step
+    return shards
+
+
+def fetch_gpu_jobs_sharded(accounts, start, end, shard_hours=SHARD_HOURS, accounts_per_query=ACCOUNTS_PER_QUERY,
+                           max_parallel=MAX_PARALLEL_QUERIES, fetch=fetch_gpu_jobs):
+    """fetch_gpu_jobs() for a long window and many accounts, as several
+    small sacct queries run `max_parallel` at a time.
+
+    The window is cut into `shard_hours` pieces and the accounts into batches
+    of `accounts_per_query`. sacct returns every job that was active in a
+    piece, so jobs spanning pieces come back more than once; they are merged
+    by JobID, keeping the longest elapsed (a running job's grows between
+    queries). Any failed query fails the whole fetch.
+    """
+    accounts = sorted(accounts)
+    batches = [accounts[i:i + accounts_per_query] for i in range(0, len(accounts), accounts_per_query)]
+    queries = [(batch, shard_start, shard_end)
+               for shard_start, shard_end in shard_window(start, end, shard_hours)
+               for batch in batches]
+    if len(queries) == 1:
+        return fetch(*queries[0])
+
+    def run(query):
+        started = time.monotonic()
+        jobs = fetch(*query)
+        logger.debug(f"sacct {','.join(query[0])} {query[1]} - {query[2]}: {len(jobs)} jobs, "
+                     f"{time.monotonic() - started:.1f}s")
+        return jobs
+
+    merged = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(queries))),
+                            thread_name_prefix="sacct") as pool:
+        for jobs in pool.map(run, queries):
+            for job in jobs:
+                seen = merged.get(job.job_id)
+                if seen is None or job.hours > seen.hours:
+                    merged[job.job_id] = job
+    return sorted(merged.values(), key=lambda job: (job.start, job.job_id))
+
+
+def split_by_day(start, end):
+    """Yield (date, hours) for the part of [start, end) on each calendar day."""
+    cursor = start
+    while cursor < end:
+        next_day = datetime.combine(cursor.date() + timedelta(days=1), datetime.min.time())
+        upto = min(next_day, end)
+        yield cursor.date(), (upto - cursor).total_seconds() / 3600
+        cursor = upto
+
+
+# The cube is updated from the monitor loop and queried from QueryServer
+# threads; `lock` guards the day cells, sacct runs happen outside it.
+class AccountingCube:
+    def __init__(self, path=None, fetch=fetch_gpu_jobs_sharded, clock=datetime.now):
+        self.path = path
+        self.fetch = fetch
+        self.clock = clock
+        self.lock = threading.Lock()
+        # date -> {(account, user, partition): gpu_hours}
+        self.days = {}
+        # date of the last update: earlier days won't change any more
+        self.complete_until = None
+        self.accounts = set()
+        # account -> first day fetched for it; earlier days aren't covered
+        self.first_days = {}
+        self.updated_at = None
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        cube = cls(path, **kwargs)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return cube
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable accounting cube {path}: {e}")
+            return cube
+        cube.complete_until = date.fromisoformat(record["complete_until"]) if record.get("complete_until") else None
+        cube.accounts = set(record.get("accounts", []))
+        for day, cells in record.get("days", {}).items():
+            cube.days[date.fromisoformat(day)] = {(a, u, p): hours for a, u, p, hours in cells}
+        first_days = record.get("first_days", {})
+        # written before coverage was tracked: the cube's first day
+        oldest = min(cube.days, default=cube.complete_until)
+        for account in cube.accounts:
+            first_day = first_days.get(account)
+            cube.first_days[account] = date.fromisoformat(first_day) if first_day else oldest
+        return cube
+
+    def save(self):
+        if self.path is None:
+            return
+        record = {
+            "complete_until": self.complete_until.isoformat() if self.complete_until else None,
+            "accounts": sorted(self.accounts),
+            "first_days": {account: day.isoformat() for account, day in sorted(self.first_days.items()) if day},
+        }
+        with self.lock:
+            record["days"] = {
+                day.isoformat(): [[a, u, p, round(hours, 4)] for (a, u, p), hours in cells.items()]
+                for day, cells in sorted(self.days.items())
+            }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, self.path)
+
+    def add_jobs(self, jobs, since, until, accounts):
+        """Replace the cells of `accounts` on days in [since, until) with
+        `jobs`' usage. Other accounts' cells are kept."""
+        accounts = set(accounts)
+        days = {}
+        day = since
+        while day < until:
+            cells = self.days.get(day, {})
+            days[day] = {key: hours for key, hours in cells.items() if key[0] not in accounts}
+            day += timedelta(days=1)
+        for job in jobs:
+            if job.account not in accounts:
+                continue
+            key = (job.account, job.user, job.partition)
+            for day, hours in split_by_day(job.start, job.end):
+                if since <= day < until:
+                    cells = days[day]
+                    cells[key] = cells.get(key, 0.0) + hours * job.gpus
+        with self.lock:
+            self.days.update(days)
+
+    def update(self, accounts, backfill_days=7):
+        """Fetch usage up to now: for accounts already in the cube since the
+        last complete day, for new ones (or a new cube) over the last
+        `backfill_days` days. Known `accounts` whose first fetched day is
+        later than that are backfilled up to it.
+
+        Known accounts are always brought up to date too, so moving
+        complete_until never leaves days missing for them.
+        """
+        now = self.clock()
+        today = now.date()
+        end = today + timedelta(days=1)
+        first_day = today - timedelta(days=backfill_days)
+        known = self.accounts if self.complete_until is not None else set()
+        new = set(accounts) - known
+        # (accounts, since, until) with until None for "up to now"
+        fetches = []
+        if new:
+            fetches.append((sorted(new), first_day, None))
+        backfill = {}
+        for account in set(accounts) & known:
+            covered = self.first_days.get(account)
+            if covered is not None and covered > first_day:
+                backfill.setdefault(covered, []).append(account)
+        for covered, backfill_accounts in sorted(backfill.items()):
+            fetches.append((sorted(backfill_accounts), first_day, covered))
+        if known:
+            # the day of the last update may have had usage after it
+            fetches.append((sorted(known), min(self.complete_until, today), None))
+
+        started = time.monotonic()
+        count = 0
+        for fetch_accounts, since, until in fetches:
+            fetch_end = now if until is None else datetime.combine(until, datetime.min.time())
+            jobs = self.fetch(fetch_accounts, datetime.combine(since, datetime.min.time()), fetch_end)
+            self.add_jobs(jobs, since, end if until is None else until, fetch_accounts)
+            count += len(jobs)
+        for account in new:
+            self.first_days[account] = first_day
+        for backfill_accounts in backfill.values():
+            for account in backfill_accounts:
+                self.first_days[account] = first_day
+        self.complete_until = today
+        self.accounts = known | new
+        self.updated_at = now
+        logger.info(f"Accounting cube updated ({', '.join(f'{len(a)} accounts from {s}' for a, s, _ in fetches)}; "
+                    f"{count} jobs, {time.monotonic() - started:.1f}s)")
+        self.save()
+
+    def refresh(self, accounts, max_age=300):
+        """update() unless the cube was updated in the last `max_age` seconds."""
+        if self.updated_at is None or (self.clock() - self.updated_at).total_seconds() >= max_age \
+                or not set(accounts) <= self.accounts:
+            self.update(accounts)
+
+    def query(self, since, until, by=("account",), accounts=None, users=None, partitions=None):
+        """Sum GPU-hours for days in [since, until), grouped by `by` (any of
+        DIMENSIONS). Keys are tuples, or plain values when grouping by one
+        dimension."""
+        for dimension in by:
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"unknown dimension {dimension!r}, expected one of {DIMENSIONS}")
+        totals = {}
+        days = [since + timedelta(days=i) for i in range((until - since).days)]
+        # add_jobs() swaps in new day dicts, so the ones taken here don't change
+        with self.lock:
+            cells_by_day = [(day, self.days.get(day, {})) for day in days]
+        for day, cells in cells_by_day:
+            for (account, user, partition), hours in cells.items():
+                if accounts is not None and account not in accounts:
+                    continue
+                if users is not None and user not in users:
+                    continue
+                if partitions is not None and partition not in partitions:
+                    continue
+                values = {"day": day, "account": account, "user": user, "partition": partition}
+                key = tuple(values[d] for d in by)
+                if len(by) == 1:
+                    key = key[0]
+                totals[key] = totals.get(key, 0.0) + hours
+        return totals
+
+    def series(self, account, since, until):
+        """Daily GPU-hours of `account` for days in [since, until)."""
+        by_day = self.query(since, until, by=("day",), accounts={account})
+        days = (until - since).days
+        return [by_day.get(since + timedelta(days=i), 0.0) for i in range(days)]
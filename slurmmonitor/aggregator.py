@@ -0,0 +1,90 @@
+import collections
+import time
+
+from slurmmonitor.message import Message
+
+
+# NotificationAggregator sits between the MessageTracker and post_msg.
+#
+# Messages are coalesced per topic: within a window only the latest message
+# for each topic is kept, and a topic whose latest message is what we already
+# posted for it (e.g. it flipped and flipped back) is dropped. A batch is
+# released once the oldest pending message has waited `window` seconds and
+# the posts-per-minute budget allows it; otherwise it keeps coalescing. Long
+# batches are cut at `max_lines` with a summary line for the rest.
+class NotificationAggregator:
+    def __init__(self, window=0, max_posts_per_minute=None, max_lines=None, clock=time.time):
+        self.window = window
+        self.max_posts_per_minute = max_posts_per_minute
+        self.max_lines = max_lines
+        self.clock = clock
+
+        self.pending = {}
+        self.pending_since = None
+        self.superseded = 0
+        self.posted = {}
+        self.post_times = collections.deque()
+
+    def add(self, messages, now=None):
+        now = self.clock() if now is None else now
+        for message in messages:
+            if message.topic in self.pending:
+                self.superseded += 1
+            self.pending[message.topic] = message
+            if self.pending_since is None:
+                self.pending_since = now
+
+    def _budget_available(self, now):
+        if self.max_posts_per_minute is None:
+            return True
+        while self.post_times and now - self.post_times[0] >= 60:
+            self.post_times.popleft()
+        return len(self.post_times) < self.max_posts_per_minute
+
+    def record_post(self, now=None):
+        """Count a post made outside the aggregator (e.g. the daily report)
+        against the budget."""
+        self.post_times.append(self.clock() if now is None else now)
+
+    def take_messages(self, now=None, force=False):
+        """Return the Messages to post now, or [] if nothing is due.
+
+        Summary lines (overflow, coalesced counts) are Messages with no topic.
+        """
+        now = self.clock() if now is None else now
+        if not self.pending:
+            return []
+        if not force:
+            if now - self.pending_since < self.window:
+                return []
+            if not self._budget_available(now):
+                return []
+
+        messages = [m for m in self.pending.values() if self.posted.get(m.topic) != str(m)]
+        superseded = self.superseded
+        self.pending = {}
+        self.pending_since = None
+        self.superseded = 0
+        if not messages:
+            return []
+
+        for message in messages:
+            self.posted[message.topic] = str(message)
+
+        if self.max_lines is not None and len(messages) > self.max_lines:
+            overflow = messages[self.max_lines:]
+            overflow_topics = sorted({m.topic.split(" ", 1)[0] for m in overflow})
+            messages = messages[:self.max_lines]
+            messages.append(Message(None, f"...and {len(overflow)} more updates ({', '.join(overflow_topics)})", None))
+        if superseded:
+            messages.append(Message(None, f"({superseded} intermediate updates coalesced)", None))
+
+        self.record_post(now)
+        return messages
+
+    def take(self, now=None, force=False):
+        """Return the text to post now, or None if nothing is due."""
+        messages = self.take_messages(now, force)
+        if not messages:
+            return None
+        return "\n".join(str(m) for m in messages)
@@ -1,100 +1,62 @@
+from slurmmonitor.config import index_jobs
 from slurmmonitor.message import Message
+from slurmmonitor.rules import RuleSet, free_bytes_rule, free_inodes_rule, queue_days_rule
 
 
-def _format_bytes_pair(value, threshold, op):
-    max_val = max(float(value), float(threshold))
-    units = ["B", "KB", "MB", "GB", "TB", "PB"]
-    unit_index = 0
-    while max_val >= 1000 and unit_index < len(units) - 1:
-        max_val /= 1000.0
-        unit_index += 1
-    divisor = 1000 ** unit_index
+def depends_on(*fields):
+    """Declare the snapshot fields a check reads, for incremental evaluation
+    (see Monitor.check and snapshot.snapshot_diff)."""
+    def decorate(check):
+        check.depends_on = fields
+        return check
+    return decorate
 
-    if unit_index == 0:
-        value_str = f"{int(value)} B"
-        threshold_str = f"{int(threshold)} B"
-    else:
-        value_str = f"{value / divisor:.1f} {units[unit_index]}"
-        threshold_str = f"{threshold / divisor:.1f} {units[unit_index]}"
 
-    return f"{value_str} {op} {threshold_str}"
-
-
-def _format_count_pair(value, threshold, op):
-    max_val = max(float(value), float(threshold))
-    units = ["", "K", "M", "B"]
-    unit_index = 0
-    while max_val >= 1000 and unit_index < len(units) - 1:
-        max_val /= 1000.0
-        unit_index += 1
-    divisor = 1000 ** unit_index
+@depends_on("free_bytes")
+def check_free_bytes(free_bytes_config, cluster_state):
+    return RuleSet([free_bytes_rule(free_bytes_config)]).evaluate(cluster_state)
 
-    if unit_index == 0:
-        value_str = f"{int(value)}"
-        threshold_str = f"{int(threshold)}"
-    else:
-        value_str = f"{value / divisor:.1f}{units[unit_index]}"
-        threshold_str = f"{threshold / divisor:.1f}{units[unit_index]}"
 
-    return f"{value_str} {op} {threshold_str}"
+@depends_on("free_inodes")
+def check_free_inodes(free_inodes_config, cluster_state):
+    return RuleSet([free_inodes_rule(free_inodes_config)]).evaluate(cluster_state)
 
 
-def check_free_bytes(free_bytes_config, cluster_state):
-    messages = []
-    for path, threshold in free_bytes_config.items():
-        topic = f"free_bytes {path}"
-        free_bytes = cluster_state.free_bytes[path]
-        if free_bytes < threshold:
-            details = _format_bytes_pair(free_bytes, threshold, "<")
-            messages.append(Message(
-                topic,
-                f"⚠️ Not enough free space on {path}",
-                details,
-            ))
-        else:
-            details = _format_bytes_pair(free_bytes, threshold, ">")
-            messages.append(Message(
-                topic,
-                f"✅ Sufficient free space on {path}",
-                details,
-                active=False,
-            ))
-    return messages
+@depends_on("queue_days")
+def check_queue_days(cluster_state):
+    return RuleSet([queue_days_rule()]).evaluate(cluster_state)
 
 
-def check_free_inodes(free_inodes_config, cluster_state):
+@depends_on("jobs", "job_progress")
+def check_job_throughput(job_config, cluster_state, throughput, now):
+    """Feed checkpoint progress to a ThroughputTracker and report jobs that
+    slowed down. Only running jobs with a known iteration are checked."""
     messages = []
-    for path, threshold in free_inodes_config.items():
-        topic = f"free_inodes {path}"
-        free_inodes = cluster_state.free_inodes[path]
-        if free_inodes < threshold:
-            details = _format_count_pair(free_inodes, threshold, "<")
-            messages.append(Message(
-                topic,
-                f"⚠️ Not enough free inodes on {path}",
-                details,
-            ))
+    job_progress = getattr(cluster_state, "job_progress", {})
+    for job in job_config:
+        current_job = cluster_state.jobs.get(job.name, None)
+        iteration = job_progress.get(job.name)
+        if current_job is None or not current_job.running or iteration is None:
+            continue
+        throughput.observe(job.name, current_job.job_id, iteration, now)
+        slowed_down = throughput.slowed_down(job.name, now)
+        if slowed_down is None:
+            continue
+
+        details = f"{throughput.rate(job.name, now):.0f} it/h, median {throughput.baseline(job.name, now):.0f} it/h"
+        eta = throughput.eta(job.name, job.total, now)
+        if eta is not None:
+            details += f", ETA {format_seconds(eta)}"
+        topic = f"job_slowdown {job.name}"
+        if slowed_down:
+            messages.append(Message(topic, f"🐢 {job.name} has slowed down", details))
         else:
-            details = _format_count_pair(free_inodes, threshold, ">")
-            messages.append(Message(
-                topic,
-                f"✅ Sufficient free inodes on {path}",
-                details,
-                active=False,
-            ))
-    return messages
-
-def check_queue_days(cluster_state):
-    messages = []
-    for queue, days in cluster_state.queue_days.items():
-        messages.append(Message(
-            f"queue_days_{queue}",
-            f"{queue} queue status",
-            f"{days} days"))
+            messages.append(Message(topic, f"{job.name} throughput is normal", details, active=False))
     return messages
 
 
-def check_job_status(job_config, cluster_state, prev_cluster_state):
+@depends_on("jobs", "jobs_stalled")
+def check_job_status(job_config, cluster_state, prev_cluster_state, throughput=None, now=None):
     messages = []
 
     for job in job_config:
@@ -115,22 +77,27 @@ def check_job_status(job_config, cluster_state, prev_cluster_state):
 
             text = f"{job.name} {current_job.job_id} is {running} {current_job.emoji}"
 
-            progress = get_progress(job_config, job)
+            progress = job.progress()
             time_left = format_seconds(current_job.time_left)
+            eta_note = ""
+            if throughput is not None and current_job.running:
+                eta = throughput.eta(job.name, job.total, now)
+                if eta is not None:
+                    eta_note = f", ETA {format_seconds(eta)} at current throughput"
             if last_job is None:
-                messages.append(Message(topic, text, f"New job detected in state {current_job.state}, progress {progress}, {time_left} remaining"))
+                messages.append(Message(topic, text, f"New job detected in state {current_job.state}, progress {progress}, {time_left} remaining{eta_note}"))
             elif current_job.state != last_job.state:
                 messages.append(Message(
                     topic,
                     text,
-                    f"Job changed state from {last_job.state}:{last_job.job_id} to {current_job.state}:{current_job.job_id}, progress {progress}, {time_left} remaining"))
+                    f"Job changed state from {last_job.state}:{last_job.job_id} to {current_job.state}:{current_job.job_id}, progress {progress}, {time_left} remaining{eta_note}"))
             elif current_job.job_id != last_job.job_id:
                 messages.append(Message(
                     topic,
                     text,
-                    f"Job changed id from {last_job.job_id} to {current_job.job_id}, progress {progress}, {time_left} remaining"))
+                    f"Job changed id from {last_job.job_id} to {current_job.job_id}, progress {progress}, {time_left} remaining{eta_note}"))
             else:
-                messages.append(Message(topic, text, f"In state {current_job.state}, progress {progress}, {time_left} remaining"))
+                messages.append(Message(topic, text, f"In state {current_job.state}, progress {progress}, {time_left} remaining{eta_note}"))
                 
             # Stall Check
             if current_job.running:
@@ -138,7 +105,10 @@ def check_job_status(job_config, cluster_state, prev_cluster_state):
                 # reported as stalled.
                 # TODO stall check actually is handled via job_config job entry which is confusing.
                 topic = f"job_stalled {job.name}"
-                if job.stalled():
+                # the snapshot already looked at the logfile; don't stat it twice
+                jobs_stalled = getattr(cluster_state, "jobs_stalled", None)
+                stalled = job.name in jobs_stalled if jobs_stalled is not None else job.stalled()
+                if stalled:
                     messages.append(Message(
                         topic,
                         f"{job.name} looks to be stalled",
@@ -164,10 +134,10 @@ def format_seconds(seconds):
     formatted = "%02dd%02dh%02dm%02ds" % (days, hours, minutes, seconds)
     return formatted
 
-# TODO this should probably go into the ClusterState class so we're not calling config directly from here.
 def get_progress(job_config, job_state):
-    for config in job_config:
-        if job_state.name == config.name:
-            progress = config.progress()
-            return progress
-    return ""
+    """Progress of the job config named like `job_state`. Pass a
+    config.index_jobs() index to avoid building one per call."""
+    config = index_jobs(job_config).get(job_state.name)
+    if config is None:
+        return ""
+    return config.progress()
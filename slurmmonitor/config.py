@@ -1,51 +1,84 @@
-import os
-import re
 import time
+from collections.abc import Mapping
 
+from slurmmonitor.logtail import DEFAULT_ITERATION_PATTERN, DEFAULT_THROUGHPUT_PATTERN, log_tailer
+from slurmmonitor.progress import progress_reader
+from slurmmonitor.watch import file_metadata
 
+# These are the defaults. main.py --config can override any section from a
+# JSON or TOML file, reloaded while running (see settings.py).
+
+# logfiles untouched for longer than this are considered stalled
+STALL_SECONDS = 10800  # 3 hours to allow for very slow starts
+
+
+# With `stall_factor` set, the logfile is tailed (see logtail.py) and the job
+# is stalled once its iteration number hasn't advanced for stall_factor times
+# the observed time between log lines (at least `min_stall` seconds). Until
+# the pace is known, and for jobs without it, the logfile mtime is used,
+# counted from no earlier than the start of the job run (`run`, a (job id,
+# start time) pair) when known.
 class Job:
-    def __init__(self, name, logfile=None, latest=None, total=None):
+    def __init__(self, name, logfile=None, latest=None, total=None,
+                 stall_factor=None, min_stall=600,
+                 iteration_pattern=DEFAULT_ITERATION_PATTERN,
+                 throughput_pattern=DEFAULT_THROUGHPUT_PATTERN):
         self.name = name
         self.logfile = logfile
         self.latest = latest
         self.total = total
+        self.stall_factor = stall_factor
+        self.min_stall = min_stall
+        self.iteration_pattern = iteration_pattern
+        self.throughput_pattern = throughput_pattern
 
-    def stalled(self):
+    def stalled(self, tailer=None, now=None, run=None):
         if self.logfile is None:
             return False
 
-        if not os.path.exists(self.logfile):
+        now = time.time() if now is None else now
+        started = run[1] if run is not None else 0
+        if self.stall_factor is not None:
+            state = (tailer or log_tailer).poll(
+                self.logfile, self.iteration_pattern, self.throughput_pattern, now, run=run)
+            if state is None:
+                return True
+            stalled = state.stalled(now, self.stall_factor, self.min_stall)
+            if stalled is not None:
+                return stalled
+            return now - max(state.mtime, started) > STALL_SECONDS
+
+        try:
+            mtime = file_metadata.stat(self.logfile).st_mtime
+        except OSError:
             return True
-        
-        mtime = os.path.getmtime(self.logfile)
-        return time.time() - mtime > 10800  # 3 hours to allow for very slow starts
+        return now - max(mtime, started) > STALL_SECONDS
 
-    def progress(self):
+    def progress(self, reader=None):
         if self.latest is None or self.total is None:
             return "na"
-        try:
-            with open(self.latest, "r") as f: 
-                line = f.readlines()[0]
-        except Exception as e:
+        step = (reader or progress_reader).step(self.latest)
+        if step is None:
             return "?"
-
-        groups = re.search("(\d+)$", line)
-        if not groups:
-            print("no match")
-            return "?"
-        
-        step = int(groups[0])
         progress = step / self.total * 100
         return f"{progress:2.1f}%"
 
     def __str__(self):
         return self.name
 
+def index_jobs(job_config):
+    """Job configs by name. Also accepts an already built index."""
+    if isinstance(job_config, Mapping):
+        return job_config
+    return {job.name: job for job in job_config}
+
+
 job_config = [
     #Job("7B_europa_64",
     #    logfile='/scratch/project_462000353/europa-production/logs-7B/latest.out',
     #    latest='/scratch/project_462000353/europa-checkpoints/7B_checkpoints/latest_checkpointed_iteration.txt',
     #    total=715256,
+    #    stall_factor=10,
     #),
         
 ]
@@ -57,14 +90,105 @@ users = [
     'avirtanen',
 ]
 
+# Thresholds are either a number or a (set, clear) pair: the alert is raised
+# below `set` and only cleared again once the value reaches `clear`, so a
+# path hovering around its threshold doesn't alert every minute.
 free_bytes_config = {
-    "/flash/project_462000963": 1e12,
-    "/scratch/project_462000963": 10e12,
+    "/flash/project_462000963": (1e12, 1.1e12),
+    "/scratch/project_462000963": (10e12, 11e12),
 }
 
 free_inodes_config = {
-    "/scratch/project_462000963": 1e5,
-    "/flash/project_462000963": 1e5,
+    "/scratch/project_462000963": (1e5, 1.1e5),
+    "/flash/project_462000963": (1e5, 1.1e5),
+}
+
+# Project quotas on Lustre (see lustre.py). free_bytes/free_inodes of paths
+# on Lustre report the headroom under their group's (or, with mode
+# "project", their project's) quota limit instead of the filesystem's
+# statvfs numbers. Quotas are re-read every `ttl` seconds.
+lustre_quota_config = {
+    "enabled": True,
+    "mode": "group",
+    "ttl": 300,
+    "timeout": 20,
+    "max_parallel": 4,
+}
+
+# Usage scans (see usage.py). When a free_bytes/free_inodes alert is active,
+# its path is scanned in the background (at most every `min_interval`
+# seconds) and the top owners and directories are added to the alert.
+usage_scan_config = {
+    "enabled": True,
+    "cache_path": "usage_cache.json",
+    "max_workers": 8,
+    "min_interval": 3600,
+}
+
+# Loop pacing and scheduled reports (see schedule.py). A cycle starts every
+# `interval` seconds, plus up to `jitter` seconds. `jobs` run at "daily HH:MM"
+# or "weekly <day> HH:MM" local time. Their last runs are kept in a state
+# file (main.py --schedule-state), so a report missed while the monitor was
+# down is sent once when it's back.
+schedule_config = {
+    "interval": 60,
+    "jitter": 0,
+    "jobs": {
+        "daily_report": "daily 09:00",
+        "weekly_summary": "weekly mon 09:00",
+    },
+}
+
+# Extra threshold rules (see rules.py), evaluated next to the built-in
+# free_bytes/free_inodes/queue_days rules generated from the configs above.
+# Example: warn about any project scratch below 1 TB without listing each.
+#   {"metric": "free_bytes", "keys": ["/scratch/project_*"], "threshold": 1e12,
+#    "op": "<", "topic": "low_scratch {key}", "details": "bytes",
+#    "message": "{icon} {key} is almost full"}
+rules_config = []
+
+# Notification batching (see aggregator.py). Updates are coalesced per topic
+# for `window` seconds, at most `max_posts_per_minute` posts are sent, and a
+# post lists at most `max_lines` updates before summarizing the rest.
+notification_config = {
+    "window": 120,
+    "max_posts_per_minute": 1,
+    "max_lines": 25,
+}
+
+# Where notifications go (see sinks.py). Every sink has its own queue and
+# retries; `topics` limits a sink to topic prefixes. Webhook URLs are read
+# from the named environment variable and the sink is skipped if it's unset.
+sinks_config = [
+    {"type": "webhook", "name": "slack", "url_env": "WEBHOOK_URL"},
+    {"type": "ndjson", "name": "audit", "path": "notifications.jsonl"},
+    {"type": "webhook", "name": "team", "url_env": "TEAM_WEBHOOK_URL",
+     "topics": ["job_status", "job_stalled", "daily_report"]},
+]
+
+# Flap damping for MessageTracker (see message.py). Changes must persist for
+# their dwell time (seconds) before they are posted; topics that keep
+# flapping get exponentially longer dwell times.
+tracker_config = {
+    "min_dwell": 0,
+    "dwell": {
+        "job_status": 180,
+        "job_stalled": 300,
+    },
+    "flap_window": 3600,
+    "flap_threshold": 3,
+    "flap_dwell": 300,
+    "max_dwell": 3600,
+}
+
+# Checkpoint throughput (see throughput.py). A job_slowdown message is raised
+# when iterations/hour over the last `window` seconds fall below
+# `slowdown_fraction` of the median over the previous `history` seconds.
+throughput_config = {
+    "window": 4 * 3600,
+    "history": 48 * 3600,
+    "slowdown_fraction": 0.7,
+    "min_segments": 3,
 }
 
 slurm_partitions = [
@@ -0,0 +1,166 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying; anything else non-2xx is a permanent failure
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class _Tracked:
+    def __init__(self, item, future):
+        self.item = item
+        self.future = future
+
+
+def _resolve(item, ok):
+    if isinstance(item, _Tracked):
+        item.future.set_result(ok)
+
+
+# QueuedWorker hands items to send() on a background thread.
+#
+# submit() only puts the item on a bounded queue. When the queue is full the
+# oldest undelivered item is dropped: the newest state is the one worth
+# reporting. A caller that needs to know whether an item got through passes a
+# concurrent.futures.Future, resolved with send()'s result (False if the item
+# was dropped or send() raised).
+class QueuedWorker(ABC):
+    name = "queued-worker"
+
+    def __init__(self, queue_size=100):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def submit(self, item, future=None):
+        """Queue `item` for delivery without blocking. Returns False if an
+        older item had to be dropped to make room."""
+        if future is not None:
+            item = _Tracked(item, future)
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        try:
+            _resolve(self.queue.get_nowait(), False)
+            self.queue.task_done()
+            self.dropped += 1
+            logger.warning(f"{self.name} queue full, dropped oldest message")
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            _resolve(item, False)
+            self.dropped += 1
+        return False
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been handled. Returns
+        False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout=None):
+        self.flush(timeout)
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            ok = False
+            try:
+                if item is None:
+                    return
+                ok = self.send(item.item if isinstance(item, _Tracked) else item) is not False
+            except Exception as e:
+                logger.error(f"Error in {self.name}: {e}", exc_info=True)
+            finally:
+                _resolve(item, ok)
+                self.queue.task_done()
+
+    @abstractmethod
+    def send(self, item):
+        """Deliver one item, on the worker thread. Returns False on failure."""
+
+
+# WebhookDelivery posts messages to a Slack-compatible webhook from a
+# background thread, so the monitoring loop never waits on the network.
+#
+# The worker reuses one requests.Session (keep-alive connection pool), uses
+# connect/read timeouts and retries transient failures with exponential
+# backoff, honouring Retry-After on 429.
+class WebhookDelivery(QueuedWorker):
+    name = "webhook-delivery"
+
+    def __init__(self, url, connect_timeout=5.0, read_timeout=15.0, max_retries=5,
+                 backoff=1.0, max_backoff=60.0, queue_size=100, session=None, sleep=time.sleep):
+        super().__init__(queue_size=queue_size)
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        if session is None:
+            # imported here: requests is only needed when a webhook is configured
+            import requests
+            session = requests.Session()
+        self.session = session
+        self.session.headers.update({'Content-Type': 'application/json'})
+        self.sleep = sleep
+
+    def _retry_delay(self, attempt, response=None):
+        delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+        if response is not None and response.status_code == 429:
+            try:
+                delay = max(delay, min(float(response.headers.get("Retry-After", 0)), self.max_backoff))
+            except ValueError:
+                pass
+        return delay
+
+    def send(self, text):
+        """Post `text`, retrying transient failures. Returns True on success."""
+        import requests
+
+        payload = json.dumps({'text': text})
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.post(self.url, data=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                logger.warning(f"Error posting to slack (attempt {attempt + 1}): {e}")
+            else:
+                if 200 <= response.status_code < 300:
+                    self.sent += 1
+                    return True
+                logger.warning(f"Error posting to slack (attempt {attempt + 1}): "
+                               f"{response.status_code}, {response.text}")
+                if response.status_code not in RETRY_STATUSES:
+                    break
+
+            if attempt < self.max_retries:
+                self.sleep(self._retry_delay(attempt, response))
+
+        self.failed += 1
+        logger.error(f"Giving up posting to slack: {text[:200]}")
+        return False
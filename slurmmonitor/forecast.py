@@ -0,0 +1,121 @@
+"""GPU-hour burn forecasts from a daily usage series.
+
+The series comes from the sacct rows the quota report already fetches (see
+quota.get_daily_gpu_hours_by_project), so forecasting costs no extra
+slurmdbd queries. A forecast combines an EWMA of daily burn with a damped
+linear trend; the residual spread around the trend gives the bands.
+"""
+import math
+from datetime import timedelta
+
+# z for the bands (80% two-sided, assuming roughly normal daily noise)
+BAND_Z = 1.28
+# per-day damping of the trend, so a ramp-up doesn't extrapolate forever
+TREND_DAMPING = 0.9
+# projections further out than this are reported as "beyond"
+HORIZON_DAYS = 3650
+
+
+def daily_series(jobs, end, days):
+    """Spread job GPU-hours over `days` 24h bins ending at `end`.
+
+    `jobs` yields (key, start, elapsed_hours, gpus) with `start` a datetime;
+    a job's hours are split over the bins it overlapped. Returns
+    {key: [gpu_hours per bin, oldest first]}.
+    """
+    origin = end - timedelta(days=days)
+    series = {}
+    for key, start, hours, gpus in jobs:
+        if start is None or hours <= 0 or gpus <= 0:
+            continue
+        # job span in days since origin, clipped to the window
+        job_start = (start - origin).total_seconds() / 86400
+        first = max(job_start, 0.0)
+        last = min(job_start + hours / 24.0, float(days))
+        if last <= first:
+            continue
+        bins = series.setdefault(key, [0.0] * days)
+        day = int(first)
+        while day < last and day < days:
+            overlap = min(last, day + 1) - max(first, day)
+            bins[day] += overlap * 24.0 * gpus
+            day += 1
+    return series
+
+
+def ewma(values, alpha=0.3):
+    level = None
+    for value in values:
+        level = value if level is None else alpha * value + (1 - alpha) * level
+    return level
+
+
+def linear_fit(values):
+    """Least-squares (intercept, slope) over x = 0..n-1."""
+    n = len(values)
+    if n < 2:
+        return (values[0] if values else 0.0), 0.0
+    mean_x = (n - 1) / 2.0
+    mean_y = sum(values) / n
+    sxx = sum((x - mean_x) ** 2 for x in range(n))
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    slope = sxy / sxx
+    return mean_y - slope * mean_x, slope
+
+
+class BurnForecast:
+    """Daily GPU-hour burn: EWMA level, damped trend and noise."""
+    def __init__(self, rate, slope=0.0, sigma=0.0, days=0):
+        self.rate = rate
+        self.slope = slope
+        self.sigma = sigma
+        self.days = days
+
+    @classmethod
+    def fit(cls, series, alpha=0.3):
+        if not series:
+            return None
+        intercept, slope = linear_fit(series)
+        residuals = [y - (intercept + slope * x) for x, y in enumerate(series)]
+        dof = max(len(series) - 2, 1)
+        sigma = math.sqrt(sum(r * r for r in residuals) / dof)
+        return cls(ewma(series, alpha), slope, sigma, len(series))
+
+    def burn(self, day, rate=None):
+        """Projected GPU-hours burned on day `day` (1 = tomorrow)."""
+        rate = self.rate if rate is None else rate
+        trend = self.slope * TREND_DAMPING * (1 - TREND_DAMPING ** day) / (1 - TREND_DAMPING)
+        return max(rate + trend, 0.0)
+
+    def _days_to(self, remaining, rate):
+        if remaining <= 0:
+            return 0
+        total = 0.0
+        for day in range(1, HORIZON_DAYS + 1):
+            total += self.burn(day, rate)
+            if total >= remaining:
+                return day
+        return None
+
+    def days_to(self, remaining):
+        """(early, expected, late) days until `remaining` GPU-hours are
+        burned; None where it isn't reached within HORIZON_DAYS."""
+        spread = BAND_Z * self.sigma
+        return (
+            self._days_to(remaining, self.rate + spread),
+            self._days_to(remaining, self.rate),
+            self._days_to(remaining, max(self.rate - spread, 0.0)),
+        )
+
+    def format_eta(self, remaining):
+        early, expected, late = self.days_to(remaining)
+
+        def fmt(days):
+            return f"{days}d" if days is not None else f">{HORIZON_DAYS}d"
+
+        return f"forecast ~{fmt(expected)} [{fmt(early)}-{fmt(late)}]"
+
+
+def fit_forecasts(series, alpha=0.3):
+    """{key: BurnForecast} for a {key: daily series} dict."""
+    return {key: BurnForecast.fit(values, alpha) for key, values in series.items()}
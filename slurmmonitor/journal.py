@@ -0,0 +1,87 @@
+import json
+import logging
+import os
+
+from slurmmonitor.message import Message
+
+logger = logging.getLogger(__name__)
+
+
+# TrackerJournal persists MessageTracker state as an append-only JSON lines
+# file: one entry per line, later lines for a topic win. An entry is a
+# Message plus the tracker's state for its topic: the (text, active) state
+# last reported and, for a change still waiting out its dwell time, when it
+# was first seen. A {"topic": ..., "forget": true} line drops the topic.
+# Once `compact_every` lines have been appended since the
+# last compaction, the file is rewritten with just the current state
+# (written to a temporary file and renamed, so a crash never leaves a
+# half-written journal behind).
+class TrackerJournal:
+    def __init__(self, path, compact_every=500):
+        self.path = path
+        self.compact_every = compact_every
+        self.appended = 0
+        # whether load_state() found a journal to restore
+        self.loaded = False
+
+    def load_state(self):
+        """(messages, reported, pending) as kept by MessageTracker."""
+        entries = {}
+        lines = 0
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        if entry.get("forget"):
+                            entries.pop(entry["topic"], None)
+                            continue
+                        Message.from_dict(entry)
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        # most likely a line cut short by a crash mid-write
+                        logger.warning(f"Skipping unreadable line {lines} in {self.path}")
+                        continue
+                    entries[entry["topic"]] = entry
+        except FileNotFoundError:
+            return {}, {}, {}
+        self.loaded = True
+
+        messages, reported, pending = {}, {}, {}
+        for topic, entry in entries.items():
+            message = messages[topic] = Message.from_dict(entry)
+            state = (message.text, message.active)
+            if "reported" not in entry:
+                # written before pending changes were journaled
+                reported[topic] = state
+            elif entry["reported"] is not None:
+                reported[topic] = tuple(entry["reported"])
+            if entry.get("pending_since") is not None:
+                pending[topic] = (state, entry["pending_since"])
+
+        logger.info(f"Loaded {len(messages)} tracked messages from {self.path}")
+        if lines > len(entries):
+            self.compact(entries.values())
+        return messages, reported, pending
+
+    def load(self):
+        return self.load_state()[0]
+
+    def append(self, entry, entries):
+        """Append `entry`; `entries` returns every current entry when the
+        journal is due for compaction."""
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        self.appended += 1
+        if self.appended >= self.compact_every:
+            self.compact(entries())
+
+    def compact(self, entries):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.appended = 0
@@ -0,0 +1,189 @@
+import collections
+import functools
+import logging
+import os
+import re
+import statistics
+import time
+
+from slurmmonitor.watch import file_metadata
+
+logger = logging.getLogger(__name__)
+
+# Megatron-style "iteration      100/  715256 |" and
+# "throughput per GPU (TFLOP/s/GPU): 180.2 |"
+DEFAULT_ITERATION_PATTERN = r"iteration\s+(\d+)\s*/"
+DEFAULT_THROUGHPUT_PATTERN = r"throughput[^:\n]*:\s*([\d.]+)"
+
+# On first sight of a log only its last bytes are read
+INITIAL_BYTES = 64 * 1024
+CHUNK_BYTES = 1024 * 1024
+# longest unterminated line kept between polls
+MAX_PARTIAL = 64 * 1024
+# a run whose start time moved by more than this was restarted (requeued)
+RUN_START_SLACK = 120
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(pattern):
+    return re.compile(pattern.encode() if isinstance(pattern, str) else pattern)
+
+
+class LogState:
+    """What has been learned from one logfile so far."""
+    def __init__(self, file_id):
+        self.file_id = file_id
+        self.offset = 0
+        self.partial = b""
+        self.mtime = None
+        self.bytes_read = 0
+        # (job id, start time) of the job run writing the log, if known
+        self.run = None
+        self.restart()
+
+    def restart(self):
+        """Forget the training pace, e.g. when the job was requeued and
+        starts up again writing to the same log."""
+        # last iteration number seen and when it last advanced
+        self.iteration = None
+        self.advanced_at = None
+        # iterations between consecutive log lines (log_interval)
+        self.log_interval = None
+        # recent seconds per iteration, from observed advances
+        self.step_times = collections.deque(maxlen=20)
+        self.throughput = None
+
+    @property
+    def step_time(self):
+        if not self.step_times:
+            return None
+        return statistics.median(self.step_times)
+
+    def same_run(self, run):
+        if self.run is None or run is None:
+            return True
+        job_id, started = run
+        return job_id == self.run[0] and abs(started - self.run[1]) <= RUN_START_SLACK
+
+    def stalled(self, now, stall_factor, min_stall=0):
+        """True if the iteration hasn't advanced for `stall_factor` times the
+        expected time between log lines, None until the pace is known."""
+        step_time = self.step_time
+        if self.iteration is None or step_time is None:
+            return None
+        limit = max(min_stall, stall_factor * step_time * (self.log_interval or 1))
+        return now - self.advanced_at > limit
+
+    def _update(self, iterations, throughput, now):
+        if throughput is not None:
+            self.throughput = throughput
+        if not iterations:
+            return
+        seen = iterations if self.iteration is None else [self.iteration] + iterations
+        steps = [b - a for a, b in zip(seen, seen[1:]) if b > a]
+        if steps:
+            self.log_interval = statistics.median(steps)
+
+        latest = iterations[-1]
+        if self.iteration is None or latest < self.iteration:
+            # first sighting, or the job restarted from a checkpoint
+            self.iteration = latest
+            self.advanced_at = now
+        elif latest > self.iteration:
+            self.step_times.append((now - self.advanced_at) / (latest - self.iteration))
+            self.iteration = latest
+            self.advanced_at = now
+
+
+# LogTailer follows training logs incrementally.
+#
+# It remembers a byte offset per logfile and each poll only reads bytes
+# appended since the last one, so the cost is O(new bytes) however large the
+# log gets. An unchanged file costs a single (possibly cached, see watch.py)
+# stat. A log seen for the first
+# time is read from its last INITIAL_BYTES. Truncated or replaced files
+# (new inode) are followed from the start. Given the job run writing the
+# log, a new run (another job id, or a requeue restarting the same one)
+# starts the pace over, so its startup isn't taken for a stall.
+#
+# Iteration numbers and throughput are extracted with per-job regexes whose
+# first group is the number.
+class LogTailer:
+    def __init__(self, clock=time.time, stat=None, restat=os.stat):
+        self.clock = clock
+        self.stat = stat or file_metadata.stat
+        # uncached stat to confirm a truncation: `stat` may be a cached result
+        self.restat = restat
+        self.states = {}
+
+    def poll(self, path, iteration_pattern=DEFAULT_ITERATION_PATTERN,
+             throughput_pattern=DEFAULT_THROUGHPUT_PATTERN, now=None, run=None):
+        """Read new lines of `path` and return its LogState, or None if the
+        file doesn't exist. `run` is the (job id, start time) of the job
+        writing it."""
+        now = self.clock() if now is None else now
+        try:
+            stat = self.stat(path)
+            state = self.states.get(path)
+            if state is not None and stat.st_size < state.offset:
+                stat = self.restat(path)
+        except OSError:
+            self.states.pop(path, None)
+            return None
+
+        file_id = (stat.st_dev, stat.st_ino)
+        skip_partial_line = False
+        if state is None or state.file_id != file_id or stat.st_size < state.offset:
+            first_sight = state is None
+            state = self.states[path] = LogState(file_id)
+            if first_sight and stat.st_size > INITIAL_BYTES:
+                state.offset = stat.st_size - INITIAL_BYTES
+                skip_partial_line = True
+        elif not state.same_run(run):
+            state.restart()
+        if run is not None:
+            state.run = run
+        state.mtime = stat.st_mtime
+
+        if stat.st_size == state.offset:
+            return state
+
+        iterations = []
+        throughput = None
+        iteration_re = _compile(iteration_pattern)
+        throughput_re = _compile(throughput_pattern) if throughput_pattern else None
+        try:
+            with open(path, "rb") as f:
+                f.seek(state.offset)
+                while True:
+                    chunk = f.read(CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    state.offset += len(chunk)
+                    state.bytes_read += len(chunk)
+                    data = state.partial + chunk
+                    end = data.rfind(b"\n")
+                    if end < 0:
+                        state.partial = data[-MAX_PARTIAL:]
+                        continue
+                    lines, state.partial = data[:end + 1], data[end + 1:][-MAX_PARTIAL:]
+                    if skip_partial_line:
+                        lines = lines[lines.find(b"\n") + 1:]
+                        skip_partial_line = False
+                    iterations.extend(int(m.group(1)) for m in iteration_re.finditer(lines))
+                    if throughput_re is not None:
+                        for m in throughput_re.finditer(lines):
+                            throughput = float(m.group(1))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Error tailing {path}: {e}")
+
+        first_sighting = state.iteration is None
+        state._update(iterations, throughput, now)
+        if first_sighting and state.iteration is not None:
+            # the last line was written around the file's mtime
+            state.advanced_at = min(now, stat.st_mtime)
+        return state
+
+
+# shared by all Job configs
+log_tailer = LogTailer()
@@ -1,8 +1,11 @@
+import json
 import logging
+import os
 import re
+import time
 from datetime import datetime
 
-from slurmmonitor.slurm.util import run_or_raise
+from slurmmonitor.slurm.command import run_or_raise
 
 logger = logging.getLogger(__name__)
 
@@ -67,8 +70,125 @@ def parse_lumi_allocations(text: str):
     return {"updated_at": updated_at, "projects": projects}
 
 
-def get_lumi_allocations():
+def fetch_lumi_allocations():
     """Run `lumi-allocations` and parse its output."""
     output = run_or_raise("lumi-allocations")
     return parse_lumi_allocations(output)
 
+
+# AllocationsCache keeps the parsed lumi-allocations result in memory and,
+# with a `path`, on disk across restarts.
+#
+# The data behind the tool only refreshes about daily, so it is re-run at
+# most every `max_age` seconds. A fetch only replaces the cached data if its
+# "Data updated" timestamp advanced. If the tool fails, the cached data is
+# returned as long as there is any, and the tool isn't run again for
+# `retry_interval` seconds; without cached data the failure is re-raised
+# until then.
+#
+# get() adds 'age_seconds' (time since updated_at, or None) to the result.
+class AllocationsCache:
+    def __init__(self, path=None, max_age=3600, retry_interval=300, fetch=fetch_lumi_allocations, clock=time.time):
+        self.path = path
+        self.max_age = max_age
+        self.retry_interval = retry_interval
+        self.fetch = fetch
+        self.clock = clock
+        self.data = None
+        self.checked_at = None
+        self.fetches = 0
+        # the last fetch error and when the tool may be run again
+        self.error = None
+        self.retry_at = None
+        self._loaded = False
+
+    def _load(self):
+        self._loaded = True
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as f:
+                record = json.load(f)
+            updated_at = record.get("updated_at")
+            self.data = {
+                "updated_at": datetime.fromisoformat(updated_at) if updated_at else None,
+                "projects": record["projects"],
+            }
+            self.checked_at = record["checked_at"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable lumi-allocations cache {self.path}: {e}")
+
+    def _save(self):
+        if self.path is None:
+            return
+        updated_at = self.data.get("updated_at")
+        record = {
+            "checked_at": self.checked_at,
+            "updated_at": updated_at.isoformat() if updated_at else None,
+            "projects": self.data.get("projects", {}),
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Error writing lumi-allocations cache {self.path}: {e}")
+
+    def _is_newer(self, data):
+        if self.data is None:
+            return True
+        old, new = self.data.get("updated_at"), data.get("updated_at")
+        if old is None or new is None:
+            return True
+        return new > old
+
+    def cached(self):
+        """The cached allocations (from memory or the cache file) without
+        running the tool, or None."""
+        if not self._loaded:
+            self._load()
+        return self.data
+
+    def get(self, refresh=False):
+        """Return the allocations, re-running the tool only when the cached
+        copy was checked more than `max_age` seconds ago (or `refresh`)."""
+        if not self._loaded:
+            self._load()
+
+        now = self.clock()
+        stale = self.data is None or self.checked_at is None or now - self.checked_at >= self.max_age
+        backing_off = self.retry_at is not None and now < self.retry_at
+        if refresh or (stale and not backing_off):
+            try:
+                data = self.fetch()
+                self.fetches += 1
+            except Exception as e:
+                self.error = e
+                self.retry_at = now + self.retry_interval
+                if self.data is None:
+                    raise
+                logger.warning("lumi-allocations failed, using cached data", exc_info=True)
+            else:
+                if self._is_newer(data):
+                    self.data = data
+                self.checked_at = now
+                self.error = self.retry_at = None
+                self._save()
+        elif self.data is None:
+            raise self.error
+
+        updated_at = self.data.get("updated_at")
+        age = now - updated_at.timestamp() if updated_at else None
+        return dict(self.data, age_seconds=age)
+
+
+# shared cache used by get_lumi_allocations(); main.py gives it a path
+allocations_cache = AllocationsCache()
+
+
+def get_lumi_allocations():
+    """Parsed `lumi-allocations` output, cached (see AllocationsCache)."""
+    return allocations_cache.get()
@@ -0,0 +1,180 @@
+"""Project quota headroom on Lustre, from `lfs quota`.
+
+statvfs on a Lustre path reports free space of the whole filesystem, but
+what stops jobs on LUMI is the project's quota. LustreQuotaCollector asks
+`lfs quota` for the group (or project) quota behind each configured path on
+a Lustre mount and reports the space and inodes left under the limit.
+
+Paths sharing a quota (same filesystem and group/project id) are queried
+once. Queries run in parallel with a timeout each, and results are cached
+for `ttl` seconds. A failed or timed out query falls back to the last result
+within `max_stale` seconds, and otherwise to statvfs (see snapshot.py).
+"""
+import grp
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from slurmmonitor.watch import mount_point, read_mounts
+
+logger = logging.getLogger(__name__)
+
+# `lfs quota` reports kbytes
+KILOBYTE = 1024
+
+
+class QuotaUsage:
+    """Usage and limits of one quota. Limits are None when unset."""
+    __slots__ = ("kbytes", "kbytes_limit", "files", "files_limit")
+
+    def __init__(self, kbytes, kbytes_limit, files, files_limit):
+        self.kbytes = kbytes
+        self.kbytes_limit = kbytes_limit
+        self.files = files
+        self.files_limit = files_limit
+
+    @property
+    def free_bytes(self):
+        if self.kbytes_limit is None:
+            return None
+        return max(self.kbytes_limit - self.kbytes, 0) * KILOBYTE
+
+    @property
+    def free_inodes(self):
+        if self.files_limit is None:
+            return None
+        return max(self.files_limit - self.files, 0)
+
+    def __repr__(self):
+        return (f"QuotaUsage(kbytes={self.kbytes}, kbytes_limit={self.kbytes_limit}, "
+                f"files={self.files}, files_limit={self.files_limit})")
+
+
+def _number(token):
+    # over-quota values are flagged with a trailing "*"
+    return int(token.rstrip("*"))
+
+
+def _limit(soft, hard):
+    # jobs fail at the hard limit; soft-only quotas are enforced after grace
+    for value in (hard, soft):
+        if value > 0:
+            return value
+    return None
+
+
+def parse_lfs_quota(output):
+    """Parse `lfs quota -q` output into QuotaUsage.
+
+    The line is "<filesystem> kbytes quota limit grace files quota limit
+    grace"; lfs wraps long filesystem names onto their own line, so the
+    numbers are taken from the tokens after the name wherever they are.
+    """
+    tokens = output.split()
+    if not tokens:
+        raise ValueError("empty lfs quota output")
+    numbers = tokens[1:]
+    if len(numbers) < 8:
+        raise ValueError(f"unexpected lfs quota output: {output.strip()!r}")
+    kbytes, soft, hard = (_number(t) for t in numbers[0:3])
+    files, files_soft, files_hard = (_number(t) for t in numbers[4:7])
+    return QuotaUsage(kbytes, _limit(soft, hard), files, _limit(files_soft, files_hard))
+
+
+class LustreQuotaCollector:
+    def __init__(self, command="lfs", mode="group", ttl=300, max_stale=3600, timeout=20, max_parallel=4,
+                 enabled=True, mounts=None, clock=time.monotonic):
+        self.configure(command, mode, ttl, max_stale, timeout, max_parallel, enabled)
+        self.clock = clock
+        self._mounts = mounts
+        # path -> (mount, quota id), or None when the path isn't on Lustre
+        self._targets = {}
+        # (mount, quota id) -> (time, QuotaUsage)
+        self.cache = {}
+        self.queries = 0
+
+    def configure(self, command="lfs", mode="group", ttl=300, max_stale=3600, timeout=20, max_parallel=4,
+                  enabled=True):
+        if mode not in ("group", "project"):
+            raise ValueError(f"lustre quota mode must be 'group' or 'project', got {mode!r}")
+        self.command = command
+        self.mode = mode
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.max_parallel = max_parallel
+        self.enabled = enabled
+        self.cache = {}
+
+    def _run(self, *args):
+        result = subprocess.run([self.command, *args], capture_output=True, text=True, timeout=self.timeout)
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+        return result.stdout
+
+    def _quota_id(self, path):
+        if self.mode == "project":
+            # "<projid> P <path>"
+            return self._run("project", "-d", path).split()[0]
+        gid = os.stat(path).st_gid
+        try:
+            return grp.getgrgid(gid).gr_name
+        except KeyError:
+            return str(gid)
+
+    def _target(self, path):
+        if path not in self._targets:
+            if self._mounts is None:
+                self._mounts = read_mounts()
+            mount = mount_point(path, self._mounts)
+            target = None
+            if self._mounts.get(mount) == "lustre":
+                try:
+                    target = (mount, self._quota_id(path))
+                except (OSError, subprocess.SubprocessError, IndexError) as e:
+                    logger.warning(f"No Lustre quota id for {path}, using statvfs: {e}")
+            self._targets[path] = target
+        return self._targets[path]
+
+    def _query(self, target):
+        mount, quota_id = target
+        flag = "-p" if self.mode == "project" else "-g"
+        self.queries += 1
+        return parse_lfs_quota(self._run("quota", "-q", flag, quota_id, mount))
+
+    def collect(self, paths):
+        """{path: QuotaUsage} for the `paths` on Lustre whose quota could be
+        read; other paths are left out."""
+        if not self.enabled:
+            return {}
+        targets = {path: self._target(path) for path in paths}
+        now = self.clock()
+        due = sorted({t for t in targets.values()
+                      if t is not None and (t not in self.cache or now - self.cache[t][0] >= self.ttl)})
+
+        if due:
+            def query(target):
+                try:
+                    return target, self._query(target)
+                except (OSError, ValueError, subprocess.SubprocessError) as e:
+                    logger.warning(f"lfs quota {self.mode} {target[1]} on {target[0]} failed: {e}")
+                    return target, None
+
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_parallel, len(due))),
+                                    thread_name_prefix="lfs-quota") as pool:
+                for target, usage in pool.map(query, due):
+                    if usage is not None:
+                        self.cache[target] = (now, usage)
+
+        results = {}
+        for path, target in targets.items():
+            cached = self.cache.get(target)
+            if cached is not None and now - cached[0] < self.max_stale:
+                results[path] = cached[1]
+        return results
+
+
+# used by ClusterDataSnapshot; main.py configures it from settings
+lustre_quota = LustreQuotaCollector()
@@ -1,9 +1,16 @@
+import collections
+import time
+
+
 class Message:
-    def __init__(self, topic, text, details, active=True):
+    def __init__(self, topic, text, details, active=True, hold=False):
         self.topic = topic
         self.text = text
         self.details = details
         self.active = active
+        # set by numeric checks when the value is between the set and clear
+        # thresholds; see MessageTracker.handle
+        self.hold = hold
 
     def __str__(self):
         if self.details:
@@ -13,25 +20,170 @@ class Message:
     def __repr__(self):
         return str(self)
 
+    def to_dict(self):
+        return {
+            "topic": self.topic,
+            "text": self.text,
+            "details": self.details,
+            "active": self.active,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["topic"], data["text"], data.get("details"), active=data.get("active", True))
+
 
 # MessageTracker enables us to determine which messages are new and need to be
 # reported.
+#
+# With a journal (see journal.py) the tracked messages survive restarts:
+# state is loaded on construction and every change of a topic's text, active
+# state, reported state or pending change is appended to the journal, so a
+# change still waiting out its dwell time at shutdown is reported after the
+# restart.
+#
+# Flap damping: a topic's state is its (text, active) pair. A change is only
+# reported once the new state has been seen for the topic's dwell time
+# (`min_dwell`, or the longest matching prefix in `dwell` such as
+# {"job_status": 300}); if the topic returns to the reported state first,
+# nothing is posted. Every reported change and every change that reverted
+# before being reported counts as a flap. Once a topic has `flap_threshold`
+# flaps within `flap_window` seconds, its dwell time doubles with each
+# further flap (starting from at least `flap_dwell`), up to `max_dwell`.
 class MessageTracker:
-    def __init__(self):
+    def __init__(self, journal=None, min_dwell=0, dwell=None, flap_window=3600,
+                 flap_threshold=None, flap_dwell=300, max_dwell=3600, clock=time.time):
+        self.journal = journal
+        self.min_dwell = min_dwell
+        self.dwell = dwell or {}
+        self.flap_window = flap_window
+        self.flap_threshold = flap_threshold
+        self.flap_dwell = flap_dwell
+        self.max_dwell = max_dwell
+        self.clock = clock
+
         self.messages = {}
+        # state last reported per topic, and changes waiting out their dwell
+        # time as (state, first seen)
+        self.reported = {}
+        self.pending = {}
+        if journal is not None:
+            self.messages, self.reported, self.pending = journal.load_state()
+        self.flaps = collections.defaultdict(collections.deque)
 
     def get_active_messages(self):
         return [i for i in self.messages.values() if i.active]
 
-    def handle(self, message):
+    def _flap_count(self, topic, now):
+        flaps = self.flaps[topic]
+        while flaps and now - flaps[0] > self.flap_window:
+            flaps.popleft()
+        return len(flaps)
+
+    def dwell_time(self, topic, now=None):
+        """Seconds a new state of `topic` must persist before it's reported."""
+        now = self.clock() if now is None else now
+        dwell = self.min_dwell
+        prefixes = [p for p in self.dwell if topic.startswith(p)]
+        if prefixes:
+            dwell = self.dwell[max(prefixes, key=len)]
+
+        if self.flap_threshold is not None:
+            excess = self._flap_count(topic, now) - self.flap_threshold
+            if excess >= 0:
+                dwell = min(max(dwell, self.flap_dwell) * 2 ** excess, self.max_dwell)
+        return dwell
+
+    def journal_entry(self, topic):
+        """The journal line for `topic`: its message plus tracker state."""
+        entry = self.messages[topic].to_dict()
+        reported = self.reported.get(topic)
+        entry["reported"] = list(reported) if reported is not None else None
+        pending = self.pending.get(topic)
+        entry["pending_since"] = pending[1] if pending is not None else None
+        return entry
+
+    def journal_entries(self):
+        return [self.journal_entry(topic) for topic in self.messages]
+
+    def _saved_state(self, topic):
+        """What the journal keeps of `topic`, minus details: a details-only
+        change isn't journaled."""
+        if self.journal is None or topic not in self.messages:
+            return None
+        entry = self.journal_entry(topic)
+        del entry["details"]
+        return entry
+
+    def _journal(self, topic, before):
+        if self.journal is not None and topic in self.messages and self._saved_state(topic) != before:
+            self.journal.append(self.journal_entry(topic), self.journal_entries)
+
+    def report_pending(self):
+        """Mark every pending change reported and return its messages, e.g.
+        to echo them with the rest of the first cycle after a fresh start."""
+        released = []
+        for topic in list(self.pending):
+            before = self._saved_state(topic)
+            state, _ = self.pending.pop(topic)
+            self.reported[topic] = state
+            released.append(self.messages[topic])
+            self._journal(topic, before)
+        return released
+
+    def forget(self, topic):
+        """Drop all state of `topic`, e.g. once nothing checks it anymore."""
+        if topic not in self.messages:
+            return
+        del self.messages[topic]
+        self.reported.pop(topic, None)
+        self.pending.pop(topic, None)
+        self.flaps.pop(topic, None)
+        if self.journal is not None:
+            self.journal.append({"topic": topic, "forget": True}, self.journal_entries)
+
+    def handle(self, message, now=None):
+        now = self.clock() if now is None else now
+        before = self._saved_state(message.topic)
+        result = self._handle(message, now)
+        self._journal(message.topic, before)
+        return result
+
+    def _handle(self, message, now):
         orig = self.messages.get(message.topic, None)
+
+        if message.hold:
+            # value is between the set and clear thresholds: an active
+            # condition stays active, otherwise this is the all-clear message.
+            if orig is not None and orig.active:
+                return
+            message.hold = False
+
         self.messages[message.topic] = message
 
+        state = (message.text, message.active)
         if not orig and not message.active:
             # non-active messages tend to be like 'condition cleared' and we don't
             # want to report these unless the condition was there in the first place.
+            self.reported[message.topic] = state
+            return
+
+        reported = self.reported.get(message.topic)
+        if reported == state:
+            if message.topic in self.pending:
+                # changed and changed back before it was reported
+                del self.pending[message.topic]
+                self.flaps[message.topic].append(now)
+            return
+
+        pending = self.pending.get(message.topic)
+        if pending is None or pending[0] != state:
+            pending = self.pending[message.topic] = (state, now)
+        if now - pending[1] < self.dwell_time(message.topic, now):
             return
 
-        # TODO what if the message is the same message, but the active state differs? hmm...
-        if not orig or orig.text != message.text:
-            return message
+        del self.pending[message.topic]
+        self.reported[message.topic] = state
+        if reported is not None:
+            self.flaps[message.topic].append(now)
+        return message
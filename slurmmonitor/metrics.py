@@ -0,0 +1,207 @@
+"""OpenMetrics exporter for the latest snapshot.
+
+MetricsExporter holds the most recent snapshot, GPU quota values and the
+StageTimer. MetricsServer serves them on /metrics from a daemon thread, so
+scrapes never touch slurmctld or the filesystems; they only format what the
+monitor loop already collected.
+"""
+import http.server
+import logging
+import math
+import threading
+import time
+
+from slurmmonitor.timing import HISTOGRAM_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PREFIX = "slurmmonitor"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _to_float(value):
+    # queue_days is reported as a preformatted string ("1.2", "inf")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class _Family:
+    def __init__(self, name, kind, help_text, unit=None):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.unit = unit
+        self.samples = []
+
+    def add(self, value, suffix="", **labels):
+        self.samples.append((suffix, labels, value))
+
+    def lines(self):
+        if not self.samples:
+            return []
+        out = [f"# TYPE {self.name} {self.kind}"]
+        if self.unit:
+            out.append(f"# UNIT {self.name} {self.unit}")
+        out.append(f"# HELP {self.name} {self.help_text}")
+        for suffix, labels, value in self.samples:
+            label_s = ""
+            if labels:
+                label_s = "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+            out.append(f"{self.name}{suffix}{label_s} {_format_value(value)}")
+        return out
+
+
+def render_openmetrics(snapshot=None, snapshot_time=None, quota=None, timer=None):
+    """Render the given values in OpenMetrics text format."""
+    families = []
+
+    def family(name, kind, help_text, unit=None):
+        f = _Family(f"{PREFIX}_{name}", kind, help_text, unit)
+        families.append(f)
+        return f
+
+    if snapshot is not None:
+        if snapshot_time is not None:
+            family("snapshot_timestamp_seconds", "gauge", "Time the latest snapshot was collected.", "seconds") \
+                .add(snapshot_time)
+
+        free_bytes = family("free_bytes", "gauge", "Available bytes on a monitored path.", "bytes")
+        for path, value in snapshot.free_bytes.items():
+            free_bytes.add(value, path=path)
+
+        free_inodes = family("free_inodes", "gauge", "Available inodes on a monitored path.")
+        for path, value in snapshot.free_inodes.items():
+            free_inodes.add(value, path=path)
+
+        queue_days = family("queue_days", "gauge", "Running and priority-pending work in the partition, in days of the whole partition.")
+        for partition, value in snapshot.queue_days.items():
+            queue_days.add(_to_float(value), partition=partition)
+
+        running = family("job_running", "gauge", "1 if the monitored job is running.")
+        pending = family("job_pending", "gauge", "1 if the monitored job is pending or resumable.")
+        time_left = family("job_time_left_seconds", "gauge", "Time left before the job hits its time limit.", "seconds")
+        job_id = family("job_id", "gauge", "Slurm job id currently tracked for the job name.")
+        for name, job in snapshot.jobs.items():
+            if job is None:
+                continue
+            running.add(1 if job.running else 0, job=name, state=job.state)
+            pending.add(1 if job.pending else 0, job=name, state=job.state)
+            time_left.add(job.time_left, job=name)
+            job_id.add(job.job_id, job=name)
+
+        running_count = family("job_running_count", "gauge", "Number of running jobs with the monitored name.")
+        for name, count in getattr(snapshot, "jobs_running_count", {}).items():
+            running_count.add(count, job=name)
+
+        stalled = family("job_stalled", "gauge", "1 if the running job looks stalled.")
+        for name in getattr(snapshot, "jobs_stalled", {}):
+            stalled.add(1, job=name)
+
+    if quota is not None:
+        if quota.get("updated_at") is not None:
+            family("gpu_quota_updated_timestamp_seconds", "gauge", "Time lumi-allocations data was last updated.", "seconds") \
+                .add(quota["updated_at"].timestamp())
+        used = family("gpu_quota_used_hours", "gauge", "GPU-hours used by the project.", "hours")
+        allocated = family("gpu_quota_allocated_hours", "gauge", "GPU-hours allocated to the project.", "hours")
+        weekly = family("gpu_quota_used_7d_hours", "gauge", "GPU-hours used by the project in the last 7 days.", "hours")
+        for project, values in quota.get("projects", {}).items():
+            used.add(values["gpu_used"], project=project)
+            allocated.add(values["gpu_allocated"], project=project)
+            if values.get("gpu_hours_7d") is not None:
+                weekly.add(values["gpu_hours_7d"], project=project)
+
+    if timer is not None:
+        durations = family("stage_duration_seconds", "histogram", "Duration of monitor loop stages.", "seconds")
+        for stage, h in sorted(timer.histogram_snapshot().items()):
+            for bound, count in zip(HISTOGRAM_BUCKETS, h["buckets"]):
+                durations.add(count, suffix="_bucket", stage=stage, le=_format_value(bound))
+            durations.add(h["count"], suffix="_bucket", stage=stage, le="+Inf")
+            durations.add(h["count"], suffix="_count", stage=stage)
+            durations.add(h["sum"], suffix="_sum", stage=stage)
+
+    lines = []
+    for f in families:
+        lines.extend(f.lines())
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Latest values for /metrics. Updates replace references, so the
+    server thread always sees a complete snapshot."""
+    def __init__(self, timer=None):
+        self.timer = timer
+        self.snapshot = None
+        self.snapshot_time = None
+        self.quota = None
+
+    def update_snapshot(self, snapshot, timestamp=None):
+        self.snapshot, self.snapshot_time = snapshot, timestamp or time.time()
+
+    def update_quota(self, quota):
+        self.quota = quota
+
+    def render(self):
+        snapshot, snapshot_time = self.snapshot, self.snapshot_time
+        return render_openmetrics(snapshot, snapshot_time, self.quota, self.timer)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    exporter = None
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        try:
+            body = self.exporter.render().encode("utf-8")
+        except Exception as e:
+            logger.error(f"Error rendering metrics: {e}", exc_info=True)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics: " + format % args)
+
+
+class MetricsServer:
+    def __init__(self, exporter, host="127.0.0.1", port=9105):
+        handler = type("MetricsHandler", (_Handler,), {"exporter": exporter})
+        self.httpd = http.server.ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
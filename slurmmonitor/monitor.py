@@ -0,0 +1,346 @@
+import datetime
+
+from slurmmonitor.checks import check_job_status, check_job_throughput
+from slurmmonitor.message import Message, MessageTracker
+from slurmmonitor.rules import RuleSet, builtin_rules
+from slurmmonitor.snapshot import snapshot_diff
+from slurmmonitor.timing import NULL_TIMER
+
+
+# reports Monitor can send from a schedule.JobScheduler
+SCHEDULED_REPORTS = ("daily_report", "weekly_summary")
+
+# topic kinds of the per-job checks; the rest of a topic is the job name
+JOB_TOPICS = ("job_status", "job_stalled", "job_slowdown")
+
+
+def daily_report_due(last_time, current_time):
+    """Without a scheduler, the daily report goes out on the first cycle after
+    09:00, if the previous cycle ran between 08:00 and 09:00."""
+    return last_time.hour == 8 and current_time.hour == 9
+
+
+def snapshot_record(snapshot, timestamp):
+    """Serialize a snapshot for the log.jsonl history (see replay.py)."""
+    return {
+        "timestamp": timestamp,
+        "job_state": {k: v.model_dump() for k, v in snapshot.jobs.items() if v is not None},
+        "free_bytes": dict(snapshot.free_bytes),
+        "free_inodes": dict(snapshot.free_inodes),
+        "queue_days": dict(snapshot.queue_days),
+        "job_progress": dict(getattr(snapshot, "job_progress", {})),
+    }
+
+
+class CycleResult:
+    def __init__(self, messages, posted=None, daily_report=None, weekly_summary=None):
+        # messages reported by the MessageTracker this cycle
+        self.messages = messages
+        # text handed to post(), if anything was posted
+        self.posted = posted
+        # text of the daily report, if it was sent this cycle
+        self.daily_report = daily_report
+        # text of the weekly summary, if it was sent this cycle
+        self.weekly_summary = weekly_summary
+
+
+# rule metrics whose alerts get a usage scan, and what to rank owners by
+USAGE_MEASURES = {"free_inodes": "inodes", "free_bytes": "bytes"}
+
+
+# Monitor runs the check -> MessageTracker -> post pipeline for one snapshot
+# at a time. It doesn't collect snapshots or sleep itself, so main.py can
+# drive it from the cluster and replay.py from recorded history.
+class Monitor:
+    def __init__(self, post, job_config, free_bytes_config, free_inodes_config,
+                 quota_lines=None, message_tracker=None, echo=print, timer=NULL_TIMER,
+                 aggregator=None, fanout=None, incremental=False, rules=(), throughput=None, usage=None,
+                 scheduler=None, weekly_lines=None):
+        self._post = post
+        self.timer = timer
+        self.echo = echo
+        self.job_config = job_config
+        self.free_bytes_config = free_bytes_config
+        self.free_inodes_config = free_inodes_config
+        # threshold checks: the built-in rules plus any configured ones
+        self.rules = RuleSet(builtin_rules(free_bytes_config, free_inodes_config) + list(rules))
+        # callable returning extra lines for the daily report, e.g. GPU quota
+        self.quota_lines = quota_lines
+        self.message_tracker = message_tracker or MessageTracker()
+        # journaled topics of jobs and paths no longer configured
+        self.prune_topics()
+        # optional NotificationAggregator to coalesce and rate limit posts
+        self.aggregator = aggregator
+        # optional sinks.FanOut that also receives every batch of Messages
+        self.fanout = fanout
+        # only re-run checks whose snapshot inputs changed (see check())
+        self.incremental = incremental
+        self.check_topics = {}
+        # checks to run in the next cycle even if their inputs didn't change
+        self.forced_checks = set()
+        # optional ThroughputTracker for job_slowdown messages and ETAs
+        self.throughput = throughput
+        # optional usage.UsageScans: active free_inodes/free_bytes alerts get
+        # a scan of their path and the top owners/directories in their details
+        self.usage = usage
+        # alerts given a usage report this cycle, and those posted with one
+        self.usage_attached = {}
+        # alerts restored from the journal were posted before the restart
+        self.usage_sent = {topic for topic, m in self.message_tracker.messages.items() if m.active}
+        # optional schedule.JobScheduler deciding when SCHEDULED_REPORTS are
+        # due; without one the daily report follows daily_report_due()
+        self.scheduler = scheduler
+        # callable returning the lines of the weekly summary
+        self.weekly_lines = weekly_lines
+        # report name -> (time sent, sink Futures) until every sink confirmed
+        self.report_deliveries = {}
+
+        self.snapshot = None
+        self.last_time = None
+        self.cycles = 0
+        # with restored tracker state, changes are real from the first cycle
+        self.first_run = not self.message_tracker.messages
+
+    def send(self, messages):
+        return self._send(messages)[0]
+
+    def _send(self, messages):
+        """(posted text, Futures of the sinks confirming delivery)"""
+        text = "\n".join([str(i) for i in messages])
+        futures = []
+        with self.timer.span("post"):
+            self._post(text)
+            if self.fanout is not None:
+                futures = self.fanout.dispatch(messages)
+        return text, futures
+
+    def checks(self):
+        """(name, snapshot fields read, runner) for every check, in report order.
+
+        Rules are evaluated one metric at a time, so each metric is its own
+        check for timing and incremental evaluation.
+        """
+        checks = [
+            (metric, (metric,), lambda snapshot, prev, now, metric=metric: self.rules.evaluate(snapshot, [metric]))
+            for metric in self.rules.metrics
+        ]
+        if self.throughput is not None:
+            checks.append(("job_throughput", check_job_throughput.depends_on,
+                           lambda snapshot, prev, now: check_job_throughput(self.job_config, snapshot, self.throughput, now)))
+        checks.append(("job_status", check_job_status.depends_on,
+                       lambda snapshot, prev, now: check_job_status(self.job_config, snapshot, prev, self.throughput, now)))
+        return checks
+
+    def check(self, snapshot, prev_snapshot, full=True, now=None):
+        """Run the checks and return their messages.
+
+        Unless `full`, only checks whose declared snapshot fields changed
+        since `prev_snapshot` run, plus checks with a topic still waiting out
+        its dwell time in the tracker. Skipped checks report nothing, so the
+        tracker keeps their topics' previous state.
+        """
+        diff = None
+        if not full and prev_snapshot is not None:
+            diff = snapshot_diff(prev_snapshot, snapshot)
+
+        messages = []
+        for name, fields, run in self.checks():
+            if diff is not None and not diff.touches(fields) \
+                    and not self._has_pending(name) and name not in self.forced_checks:
+                continue
+            with self.timer.span(f"check.{name}"):
+                check_messages = run(snapshot, prev_snapshot, now)
+            self.check_topics[name] = {m.topic for m in check_messages}
+            messages.extend(check_messages)
+        self.forced_checks = set()
+        if self.usage is not None:
+            # re-run until the requested scans have reported
+            self.forced_checks |= {name for name in USAGE_MEASURES if self._attach_usage(name, messages)}
+        return messages
+
+    def _attach_usage(self, check_name, messages):
+        """Add usage reports to `check_name`'s active alerts, requesting
+        scans as needed. Returns True while any report is missing."""
+        waiting = False
+        prefix = f"{check_name} "
+        for message in messages:
+            if not message.active or not message.topic.startswith(prefix):
+                continue
+            path = message.topic[len(prefix):]
+            self.usage.request(path)
+            report = self.usage.report(path)
+            if report is None:
+                waiting = True
+                continue
+            summary = report.summary(USAGE_MEASURES[check_name])
+            message.details = f"{message.details}; {summary}" if message.details else summary
+            self.usage_attached[message.topic] = message
+        return waiting
+
+    def _usage_followups(self, out_messages):
+        """Alerts to post again because their usage report arrived after
+        they were first posted. The tracker doesn't report a details-only
+        change, so without this the breakdown would only reach the daily
+        report. Each activation of an alert gets one follow-up."""
+        followups = []
+        posted = {message.topic for message in out_messages}
+        for topic, message in self.usage_attached.items():
+            if topic in posted:
+                self.usage_sent.add(topic)
+            elif topic not in self.usage_sent \
+                    and self.message_tracker.reported.get(topic) == (message.text, True):
+                self.usage_sent.add(topic)
+                followups.append(message)
+        self.usage_attached = {}
+        # an alert that cleared gets a new follow-up when it comes back
+        self.usage_sent = {topic for topic in self.usage_sent
+                           if self.message_tracker.reported.get(topic, (None, False))[1]}
+        return followups
+
+    def reconfigure(self, settings, changes):
+        """Switch to new settings.Settings between cycles. Only the checks
+        whose configuration is in `changes` (see settings.diff_settings) are
+        re-run next cycle, even in incremental mode."""
+        if "job_config" in changes:
+            self.job_config = settings.jobs
+            self.forced_checks |= {"job_status", "job_throughput"}
+        if changes.keys() & {"free_bytes_config", "free_inodes_config", "rules_config"}:
+            self.free_bytes_config = settings.free_bytes_config
+            self.free_inodes_config = settings.free_inodes_config
+            self.forced_checks |= set(self.rules.metrics) | set(settings.ruleset.metrics)
+            self.rules = settings.ruleset
+        if changes.keys() & {"job_config", "free_bytes_config", "free_inodes_config", "rules_config"}:
+            self.prune_topics()
+
+    def has_topic(self, topic):
+        """Whether a check under the current configuration can report `topic`."""
+        kind, _, name = topic.partition(" ")
+        if kind in JOB_TOPICS:
+            return any(job.name == name for job in self.job_config)
+        return self.rules.has_topic(topic)
+
+    def prune_topics(self):
+        """Make the tracker forget topics no check reports anymore, e.g. of a
+        removed job or path, so they leave the daily report."""
+        for topic in list(self.message_tracker.messages):
+            if not self.has_topic(topic):
+                self.message_tracker.forget(topic)
+
+    def _has_pending(self, check_name):
+        pending = getattr(self.message_tracker, "pending", {})
+        return any(topic in pending for topic in self.check_topics.get(check_name, ()))
+
+    def run_cycle(self, snapshot, now=None):
+        now = now or datetime.datetime.now()
+        prev_snapshot = self.snapshot
+        self.snapshot = snapshot
+
+        if self.scheduler is not None:
+            self.settle_reports()
+            # a report still being delivered isn't sent again
+            due = [name for name in self.scheduler.due(now) if name not in self.report_deliveries]
+        else:
+            due = ["daily_report"] if self.last_time is not None and daily_report_due(self.last_time, now) else []
+        daily_due = "daily_report" in due
+        # the daily report lists active messages with current details
+        full = not self.incremental or daily_due
+
+        out_messages = []
+        messages = self.check(snapshot, prev_snapshot, full=full, now=now.timestamp())
+        with self.timer.span("tracker.handle"):
+            for message in messages:
+                out_message = self.message_tracker.handle(message, now.timestamp())
+                if out_message is not None:
+                    out_messages.append(out_message)
+            if self.first_run and self.cycles == 0:
+                # what the first cycle sees is the starting state, not a
+                # change: don't let it come out of the dwell time later
+                out_messages.extend(self.message_tracker.report_pending())
+        if self.usage is not None:
+            out_messages.extend(self._usage_followups(out_messages))
+        result = CycleResult(out_messages)
+
+        if out_messages and self.first_run:
+            # Everything is "new" on the first cycle; show it locally
+            # instead of flooding the channel after each restart.
+            self.first_run = False
+            self.echo("\n".join([str(i) for i in out_messages]))
+        else:
+            batch = self._outgoing(out_messages, now)
+            if batch:
+                result.posted = self.send(batch)
+
+        # a report is only marked done once every sink confirmed delivery,
+        # so one a sink dropped or failed is sent again (see settle_reports)
+        if daily_due:
+            result.daily_report = self.daily_report(now)
+        if "weekly_summary" in due:
+            result.weekly_summary = self.weekly_summary(now)
+        self.last_time = now
+        self.cycles += 1
+
+        return result
+
+    def _report_done(self, name, now):
+        if self.scheduler is not None:
+            self.scheduler.done(name, now)
+
+    def _send_report(self, name, text, now):
+        text, futures = self._send([Message(name, text, None)])
+        if self.aggregator is not None:
+            self.aggregator.record_post(now.timestamp() if now else None)
+        self.report_deliveries[name] = (now, futures)
+        self.settle_reports()
+        return text
+
+    def settle_reports(self):
+        """Mark the reports every sink has delivered as done. A report some
+        sink failed or dropped is forgotten, so it's due again."""
+        for name, (sent_at, futures) in list(self.report_deliveries.items()):
+            if not all(future.done() for future in futures):
+                continue
+            del self.report_deliveries[name]
+            if all(future.result() for future in futures):
+                self._report_done(name, sent_at)
+            else:
+                self.echo(f"The {name} was not delivered to every sink, sending it again")
+
+    def _outgoing(self, out_messages, now):
+        if self.aggregator is None:
+            return out_messages
+        self.aggregator.add(out_messages, now.timestamp())
+        return self.aggregator.take_messages(now.timestamp())
+
+    def daily_report(self, now=None):
+        active_messages = self.message_tracker.get_active_messages()
+        daily_message = "\n".join([str(i) for i in active_messages])
+
+        if self.quota_lines is not None:
+            try:
+                with self.timer.span("daily.quota"):
+                    quota_lines = self.quota_lines()
+                if quota_lines:
+                    if daily_message:
+                        daily_message += "\n"
+                    daily_message += "\n".join(quota_lines)
+            except Exception as e:
+                self.echo(f"Error computing GPU quota messages: {e}")
+
+        return self._send_report("daily_report", "Daily Status:\n" + daily_message, now)
+
+    def weekly_summary(self, now=None):
+        """Send the weekly summary. With nothing to send it's done for the
+        week; if computing it fails it stays due and is retried next cycle."""
+        if self.weekly_lines is None:
+            self._report_done("weekly_summary", now)
+            return None
+        try:
+            with self.timer.span("weekly.summary"):
+                lines = self.weekly_lines()
+        except Exception as e:
+            self.echo(f"Error computing weekly summary: {e}")
+            return None
+        if not lines:
+            self._report_done("weekly_summary", now)
+            return None
+        return self._send_report("weekly_summary", "Weekly Summary:\n" + "\n".join(lines), now)
@@ -0,0 +1,62 @@
+import logging
+import re
+
+from slurmmonitor.watch import file_metadata
+
+logger = logging.getLogger(__name__)
+
+STEP_RE = re.compile(r"(\d+)$")
+
+
+# ProgressReader reads the step number from checkpoint tracker files such as
+# Megatron's latest_checkpointed_iteration.txt.
+#
+# The files live on Lustre, where every open is a metadata round-trip, and
+# they only change when a checkpoint is written. Results are cached by
+# (path, mtime, size): a cycle costs one stat per job, and the file is only
+# opened again after it changed. Only the first `max_bytes` are read.
+# Stats go through watch.file_metadata, which may answer from its cache.
+class ProgressReader:
+    def __init__(self, max_bytes=256, stat=None):
+        self.max_bytes = max_bytes
+        self.stat = stat or file_metadata.stat
+        # path -> ((mtime_ns, size), step)
+        self.cache = {}
+        self.reads = 0
+
+    def step(self, path):
+        """Latest step recorded in `path`, or None if it can't be read."""
+        try:
+            stat = self.stat(path)
+        except OSError:
+            self.cache.pop(path, None)
+            return None
+
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self.cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        step = self._read(path)
+        self.cache[path] = (key, step)
+        return step
+
+    def _read(self, path):
+        self.reads += 1
+        try:
+            with open(path, "rb") as f:
+                head = f.read(self.max_bytes)
+        except OSError as e:
+            logger.debug(f"Error reading {path}: {e}")
+            return None
+
+        line = head.split(b"\n", 1)[0].decode("utf-8", errors="replace")
+        match = STEP_RE.search(line)
+        if not match:
+            logger.debug(f"No step number in {path}: {line!r}")
+            return None
+        return int(match[0])
+
+
+# shared by all Job configs
+progress_reader = ProgressReader()
@@ -0,0 +1,222 @@
+"""Quota queries answered from data the monitor already holds.
+
+QuotaQuery sums GPU-hours from the accounting cube and adds the cached
+lumi-allocations numbers; it never runs sacct or lumi-allocations itself.
+QueryServer answers QuotaQuery requests on a Unix socket from a daemon
+thread, so `python -m slurmmonitor quota --socket ...` gets the monitor's
+numbers instantly instead of someone running sacct by hand.
+
+The protocol is one JSON object per line each way. A request looks like
+{"since": "2026-03-01", "until": "2026-03-08", "by": ["account", "user"],
+"accounts": ["project_x"]}; without since/until it covers the last
+`days` (default 7) calendar days including today. {"usage": "/scratch/x"}
+returns the latest usage scan of a monitored path instead (see usage.py).
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from datetime import date, datetime, timedelta
+
+from slurmmonitor.accounting import DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"{name} must be YYYY-MM-DD, got {value!r}") from None
+
+
+def _string_set(request, name):
+    values = request.get(name)
+    if values is None:
+        return None
+    if isinstance(values, str) or not all(isinstance(v, str) for v in values):
+        raise QueryError(f"{name} must be a list of strings")
+    return set(values)
+
+
+class QuotaQuery:
+    """Answers quota requests from `cube` (an AccountingCube, may be None)
+    and `allocations` (an AllocationsCache; only its cached data is read),
+    and usage requests from `usage` (a UsageScans)."""
+    def __init__(self, cube, allocations=None, projects=(), clock=datetime.now, usage=None):
+        self.cube = cube
+        self.allocations = allocations
+        self.usage = usage
+        self.projects = list(projects)
+        self.clock = clock
+
+    def window(self, request):
+        today = self.clock().date()
+        days = request.get("days", 7)
+        if not isinstance(days, int) or days < 1:
+            raise QueryError(f"days must be a positive integer, got {days!r}")
+        since = _parse_date(request["since"], "since") if request.get("since") else today - timedelta(days=days - 1)
+        until = _parse_date(request["until"], "until") if request.get("until") else today + timedelta(days=1)
+        if until <= since:
+            raise QueryError("until must be after since")
+        return since, until
+
+    def answer(self, request):
+        if not isinstance(request, dict):
+            raise QueryError("request must be a JSON object")
+        if "usage" in request:
+            return self.answer_usage(request["usage"])
+        since, until = self.window(request)
+        by = request.get("by") or ["account"]
+        if isinstance(by, str):
+            by = [by]
+        for dimension in by:
+            if dimension not in DIMENSIONS:
+                raise QueryError(f"unknown dimension {dimension!r}, expected one of {', '.join(DIMENSIONS)}")
+        accounts = _string_set(request, "accounts") or set(self.projects) or None
+
+        response = {"since": since.isoformat(), "until": until.isoformat(), "by": list(by), "rows": []}
+        if self.cube is not None:
+            totals = self.cube.query(since, until, by=tuple(by), accounts=accounts,
+                                     users=_string_set(request, "users"),
+                                     partitions=_string_set(request, "partitions"))
+            response["rows"] = rows_from_totals(totals, by)
+            response["cube_updated_at"] = self.cube.updated_at.isoformat() if self.cube.updated_at else None
+            response["complete_until"] = self.cube.complete_until.isoformat() if self.cube.complete_until else None
+
+        data = self.allocations.cached() if self.allocations is not None else None
+        if data:
+            response["allocations"] = {
+                project: {
+                    "gpu_used": values["gpu_used"],
+                    "gpu_allocated": values["gpu_allocated"],
+                    "gpu_remaining": values["gpu_allocated"] - values["gpu_used"],
+                }
+                for project, values in data.get("projects", {}).items()
+                if accounts is None or project in accounts
+            }
+            updated_at = data.get("updated_at")
+            response["allocations_updated_at"] = updated_at.isoformat() if updated_at else None
+        return response
+
+    def answer_usage(self, path):
+        if self.usage is None:
+            raise QueryError("usage scans are not enabled")
+        if not isinstance(path, str):
+            raise QueryError("usage must be a path")
+        # only reports the monitor asked for; queries never start a scan
+        report = self.usage.report(path)
+        if report is None:
+            raise QueryError(f"no usage scan of {path} yet (scans start with its free_bytes/free_inodes alert)")
+        return {"usage": report.to_dict()}
+
+
+def rows_from_totals(totals, by):
+    """Cube query totals as a list of {dimension: value, "gpu_hours": h},
+    largest first."""
+    rows = []
+    for key, hours in sorted(totals.items(), key=lambda kv: kv[1], reverse=True):
+        values = key if isinstance(key, tuple) else (key,)
+        row = {d: v.isoformat() if isinstance(v, date) else v for d, v in zip(by, values)}
+        row["gpu_hours"] = round(hours, 1)
+        rows.append(row)
+    return rows
+
+
+def format_response(response):
+    """Text rendering of a QuotaQuery response."""
+    by = response["by"]
+    lines = [f"GPU-hours {response['since']} - {response['until']} (exclusive)"]
+    rows = response["rows"]
+    if rows:
+        keys = [" ".join(str(row[d]) for d in by) for row in rows]
+        width = max(len(k) for k in keys + [" ".join(by), "total"])
+        lines.append(f"{' '.join(by):<{width}}  GPUh")
+        for key, row in zip(keys, rows):
+            lines.append(f"{key:<{width}}  {row['gpu_hours']:,.0f}")
+        lines.append(f"{'total':<{width}}  {sum(row['gpu_hours'] for row in rows):,.0f}")
+    else:
+        lines.append("no GPU usage in range")
+
+    allocations = response.get("allocations")
+    if allocations:
+        lines.append(f"Allocations (updated {response.get('allocations_updated_at') or 'unknown'}):")
+        for project, values in sorted(allocations.items()):
+            lines.append(f"  {project}: {values['gpu_used']:,}/{values['gpu_allocated']:,} GPUh used, "
+                         f"{values['gpu_remaining']:,} left")
+    return "\n".join(lines)
+
+
+def format_usage(usage, n=10):
+    """Text rendering of a UsageReport.to_dict()."""
+    lines = [f"Usage under {usage['root']}: {usage['total_bytes'] / 1e9:,.1f} GB, {usage['total_inodes']:,} inodes "
+             f"({usage['dirs']:,} dirs, {usage['reused']:,} unchanged since the last scan)"]
+    for title, totals in (("owner", usage["by_owner"]), ("directory", usage["by_subdir"])):
+        largest = sorted(totals.items(), key=lambda kv: kv[1]["inodes"], reverse=True)[:n]
+        width = max([len(title)] + [len(name) for name, _ in largest])
+        lines.append(f"{title:<{width}}  {'inodes':>12}  {'GB':>10}")
+        for name, values in largest:
+            lines.append(f"{name:<{width}}  {values['inodes']:>12,}  {values['bytes'] / 1e9:>10,.1f}")
+    return "\n".join(lines)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    query = None
+
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_BYTES)
+        try:
+            response = self.query.answer(json.loads(line))
+        except (QueryError, ValueError) as e:
+            response = {"error": str(e)}
+        except Exception as e:
+            logger.exception("quota query failed")
+            response = {"error": f"internal error: {e}"}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class QueryServer:
+    def __init__(self, query, path):
+        self.path = path
+        if os.path.exists(path):
+            # left behind by an earlier run; bind() would fail otherwise
+            os.unlink(path)
+        handler = type("QueryHandler", (_Handler,), {"query": query})
+        self.server = socketserver.ThreadingUnixStreamServer(path, handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="query-server", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def ask(path, request, timeout=10):
+    """Send one request to a QueryServer; raises QueryError on an error
+    response and OSError if the server can't be reached."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            response = json.loads(f.readline())
+    if "error" in response:
+        raise QueryError(response["error"])
+    return response
@@ -1,9 +1,12 @@
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 import re
+import time
 
+from slurmmonitor.forecast import daily_series, fit_forecasts
 from slurmmonitor.lumi.allocations import get_lumi_allocations
-from slurmmonitor.slurm.util import run_or_raise
+from slurmmonitor.slurm.command import run_or_raise
 
 logger = logging.getLogger(__name__)
 
@@ -61,53 +64,91 @@ def _configured_milestones(cfg: dict) -> list[dict]:
     return []
 
 
-def _select_milestone(cfg: dict, baseline: datetime, used: int, allocated: int):
+@dataclass(frozen=True)
+class Milestone:
+    """A validated milestone. The target is `target_gpuh`, or
+    `target_fraction` of `target_base_gpuh` (the allocation if None)."""
+    name: str
+    kind: str | None
+    date: datetime
+    target_label: str | None
+    target_fraction: float | None = None
+    target_base_gpuh: float | None = None
+    target_gpuh: float | None = None
+
+    def target_used(self, allocated: int) -> float:
+        if self.target_gpuh is not None:
+            return self.target_gpuh
+        base = allocated if self.target_base_gpuh is None else self.target_base_gpuh
+        return float(base) * self.target_fraction
+
+
+@dataclass(frozen=True)
+class QuotaProject:
+    """A gpu_quota_projects entry with parsed dates and milestones."""
+    start: datetime
+    end: datetime | None
+    milestones: tuple[Milestone, ...]
+
+
+def _compile_milestone(cfg: dict, milestone: dict) -> Milestone:
+    target_mode = milestone.get("target_mode", milestone.get("target"))
+    target_pct = milestone.get("target_pct", milestone.get("target_percent"))
+    target_gpuh = milestone.get("target_gpuh")
+    target_base_gpuh = milestone.get("target_base_gpuh")
+    milestone_date = _parse_date(milestone["date"])
+    common = {"name": milestone.get("name") or "milestone", "kind": milestone.get("kind"), "date": milestone_date}
+
+    if target_mode == "linear":
+        if not cfg.get("end"):
+            raise ValueError("linear milestone requires project end")
+        start = _parse_date(cfg["start"])
+        end = _parse_date(cfg["end"])
+        total_seconds = (end - start).total_seconds()
+        if total_seconds <= 0:
+            raise ValueError("project end must be after start for linear milestone")
+        elapsed_seconds = (_clamp(milestone_date, start, end) - start).total_seconds()
+        return Milestone(**common, target_label=None, target_fraction=elapsed_seconds / total_seconds,
+                         target_base_gpuh=target_base_gpuh)
+    if target_pct is not None:
+        target_pct = float(target_pct)
+        if target_pct < 0 or target_pct > 100:
+            raise ValueError("milestone target_pct must be between 0 and 100")
+        return Milestone(**common, target_label=_pct(target_pct), target_fraction=target_pct / 100.0,
+                         target_base_gpuh=target_base_gpuh)
+    if target_gpuh is None:
+        raise ValueError("milestone missing target_pct or target_gpuh")
+    if float(target_gpuh) < 0:
+        raise ValueError("milestone target_gpuh must be non-negative")
+    return Milestone(**common, target_label=None, target_gpuh=float(target_gpuh))
+
+
+def compile_quota_project(cfg: dict) -> QuotaProject:
+    """Parse and validate a gpu_quota_projects entry. Raises ValueError (or
+    KeyError for a missing start/date) on invalid config."""
+    return QuotaProject(
+        start=_parse_date(cfg["start"]),
+        end=_parse_date(cfg["end"]) if cfg.get("end") else None,
+        milestones=tuple(_compile_milestone(cfg, m) for m in _configured_milestones(cfg)),
+    )
+
+
+def _select_milestone(cfg, baseline: datetime, used: int, allocated: int):
+    # raw config dicts are compiled on every call; settings.py hands over
+    # QuotaProjects compiled once at load time
+    milestones = cfg.milestones if isinstance(cfg, QuotaProject) else compile_quota_project(cfg).milestones
     candidates = []
-    for milestone in _configured_milestones(cfg):
-        target_mode = milestone.get("target_mode", milestone.get("target"))
-        target_pct = milestone.get("target_pct", milestone.get("target_percent"))
-        target_gpuh = milestone.get("target_gpuh")
-        target_base_gpuh = milestone.get("target_base_gpuh", allocated)
-        milestone_date = _parse_date(milestone["date"])
-        deadline = datetime.combine(milestone_date.date(), baseline.time())
+    for milestone in milestones:
+        deadline = datetime.combine(milestone.date.date(), baseline.time())
         if baseline >= deadline:
             continue
-
-        if target_mode == "linear":
-            if not cfg.get("end"):
-                raise ValueError("linear milestone requires project end")
-            start_date = _parse_date(cfg["start"])
-            end_date = _parse_date(cfg["end"])
-            start = datetime.combine(start_date.date(), baseline.time())
-            end = datetime.combine(end_date.date(), baseline.time())
-            total_seconds = (end - start).total_seconds()
-            if total_seconds <= 0:
-                raise ValueError("project end must be after start for linear milestone")
-            elapsed_seconds = (_clamp(deadline, start, end) - start).total_seconds()
-            target_ratio = elapsed_seconds / total_seconds
-            target_used = float(target_base_gpuh) * target_ratio
-            target_label = None
-        elif target_pct is not None:
-            target_pct = float(target_pct)
-            if target_pct < 0 or target_pct > 100:
-                raise ValueError("milestone target_pct must be between 0 and 100")
-            target_used = float(target_base_gpuh) * target_pct / 100.0
-            target_label = _pct(target_pct)
-        else:
-            if target_gpuh is None:
-                raise ValueError("milestone missing target_pct or target_gpuh")
-            target_used = float(target_gpuh)
-            if target_used < 0:
-                raise ValueError("milestone target_gpuh must be non-negative")
-            target_label = None
-
         candidates.append({
-            "name": milestone.get("name") or "milestone",
-            "kind": milestone.get("kind"),
-            "date": milestone_date,
+            "name": milestone.name,
+            "kind": milestone.kind,
+            "date": milestone.date,
             "deadline": deadline,
-            "target_label": target_label,
-            "target_used": target_used,
+            "target_label": milestone.target_label,
+            "target_used": milestone.target_used(allocated),
         })
 
     if not candidates:
@@ -120,7 +161,7 @@ def _select_milestone(cfg: dict, baseline: datetime, used: int, allocated: int):
     return candidates[0]
 
 
-def _format_milestone_message(milestone: dict, used: int, weekly_val, baseline: datetime) -> str:
+def _format_milestone_message(milestone: dict, used: int, weekly_val, baseline: datetime, forecast=None) -> str:
     target_used = milestone["target_used"]
     target_label = milestone["target_label"]
     label = milestone["name"]
@@ -163,6 +204,8 @@ def _format_milestone_message(milestone: dict, used: int, weekly_val, baseline:
             eta_days = int(round(remaining / daily_rate)) if daily_rate > 0 else None
             if eta_days is not None:
                 msg += f", ETA ~{eta_days}d/{days_remaining}d"
+    if forecast is not None and days_remaining > 0:
+        msg += f", {forecast.format_eta(remaining)}"
 
     return msg
 
@@ -191,15 +234,43 @@ def _gpu_count_from_tres(alloc_tres: str) -> int:
         return 0
     return int(m.group(1))
 
-def get_weekly_gpu_hours_by_project(projects: list[str]) -> dict[str, int]:
-    """Return GPU-hours used in the last 7 days for each project (account).
+# The daily report, the weekly usage printout and the metrics update all
+# need the same week of sacct rows; reuse them for this many seconds so a
+# report costs one slurmdbd query.
+SACCT_CACHE_SECONDS = 300
+_sacct_cache: dict = {}
 
-    Uses sacct to gather elapsed time and allocated GPUs, then computes
-    GPU-hours as ElapsedHours * GPUCount / 2 (LUMI MI250X has 2 GCDs).
-    """
-    if not projects:
-        return {}
 
+def clear_sacct_cache():
+    _sacct_cache.clear()
+
+
+# Optional accounting.AccountingCube (set by main.py). When set, weekly and
+# daily usage are summed from its daily cells instead of a sacct run; the
+# last 7 days then means the 7 complete calendar days before today, so
+# weekly / 7 is a full day's burn rate.
+accounting_cube = None
+# days of cube history burn forecasts are fitted over (sacct: the last week)
+CUBE_FORECAST_DAYS = 28
+
+
+def _cube_query(projects: list[str], by):
+    accounting_cube.refresh(projects, max_age=SACCT_CACHE_SECONDS)
+    today = datetime.now().date()
+    return accounting_cube.query(today - timedelta(days=7), today, by=by, accounts=set(projects))
+
+
+def _weekly_sacct_output(projects: list[str]) -> str:
+    key = tuple(sorted(projects))
+    cached = _sacct_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < SACCT_CACHE_SECONDS:
+        return cached[1]
+    out = _fetch_weekly_sacct_output(projects)
+    _sacct_cache[key] = (time.monotonic(), out)
+    return out
+
+
+def _fetch_weekly_sacct_output(projects: list[str]) -> str:
     now = datetime.now()
     start_dt = now - timedelta(days=7)
     start_s = start_dt.strftime("%Y-%m-%dT%H:%M:%S")
@@ -209,10 +280,27 @@ def get_weekly_gpu_hours_by_project(projects: list[str]) -> dict[str, int]:
         f"sacct -a -A {','.join(projects)} --starttime {start_s} --endtime {end_s} "
         "--format Account,User,Elapsed,AllocTRES,Start -P"
     )
-    out = run_or_raise(cmd)
+    return run_or_raise(cmd)
+
+
+def _parse_sacct_time(value: str):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # "Unknown", "None" for jobs that never started
+        return None
+
+
+def iter_sacct_gpu_jobs(sacct_output: str):
+    """Yield (account, user, start, elapsed_hours, gpus) for each GPU job row
+    in `sacct -P` output.
 
-    totals: dict[str, float] = {}
-    for line in out.splitlines():
+    Rows are expected in `Account|User|Elapsed|AllocTRES|Start` order; rows
+    without an account, user or GPUs are skipped. `start` is None when the
+    row has no usable Start. `gpus` counts MI250X GCD pairs, i.e. sacct's
+    GPU count divided by 2.
+    """
+    for line in sacct_output.splitlines():
         if not line or line.startswith("Account|"):
             continue
         parts = line.split("|")
@@ -228,10 +316,36 @@ def get_weekly_gpu_hours_by_project(projects: list[str]) -> dict[str, int]:
         gpus = _gpu_count_from_tres(alloc_tres)
         if gpus <= 0:
             continue
-        hours = _elapsed_to_hours(elapsed)
+        start = _parse_sacct_time(parts[4].strip()) if len(parts) > 4 else None
         # LUMI MI250X: sacct reports GPUs counting both GCDs, divide by 2
-        gpu_hours = hours * (gpus / 2.0)
-        totals[account] = totals.get(account, 0.0) + gpu_hours
+        yield account, user, start, _elapsed_to_hours(elapsed), gpus / 2.0
+
+
+def iter_sacct_gpu_hours(sacct_output: str):
+    """Yield (account, user, gpu_hours) for each GPU job row in `sacct -P` output.
+
+    Rows are expected in `Account|User|Elapsed|AllocTRES|...` order; rows
+    without an account, user or GPUs are skipped.
+    """
+    for account, user, _, hours, gpus in iter_sacct_gpu_jobs(sacct_output):
+        yield account, user, hours * gpus
+
+
+def get_weekly_gpu_hours_by_project(projects: list[str]) -> dict[str, int]:
+    """Return GPU-hours used in the last 7 days for each project (account).
+
+    Uses sacct to gather elapsed time and allocated GPUs, then computes
+    GPU-hours as ElapsedHours * GPUCount / 2 (LUMI MI250X has 2 GCDs).
+    """
+    if not projects:
+        return {}
+
+    if accounting_cube is not None:
+        totals = _cube_query(projects, ("account",))
+    else:
+        totals: dict[str, float] = {}
+        for account, _, gpu_hours in iter_sacct_gpu_hours(_weekly_sacct_output(projects)):
+            totals[account] = totals.get(account, 0.0) + gpu_hours
 
     # Round to nearest integer GPUh for reporting
     return {k: int(round(v)) for k, v in totals.items()}
@@ -249,43 +363,75 @@ def get_weekly_gpu_hours_by_user(projects: list[str]) -> dict[str, dict[str, int
     if not projects:
         return {}
 
-    now = datetime.now()
-    start_dt = now - timedelta(days=7)
-    start_s = start_dt.strftime("%Y-%m-%dT%H:%M:%S")
-    end_s = now.strftime("%Y-%m-%dT%H:%M:%S")
-
-    cmd = (
-        f"sacct -a -A {','.join(projects)} --starttime {start_s} --endtime {end_s} "
-        "--format Account,User,Elapsed,AllocTRES,Start -P"
-    )
-    out = run_or_raise(cmd)
-
     totals: dict[str, dict[str, float]] = {}
-    for line in out.splitlines():
-        if not line or line.startswith("Account|"):
-            continue
-        parts = line.split("|")
-        if len(parts) < 4:
-            continue
-        account = parts[0].strip()
-        user = parts[1].strip()
-        elapsed = parts[2].strip()
-        alloc_tres = parts[3].strip()
-        if not account or not user:
-            continue
-
-        gpus = _gpu_count_from_tres(alloc_tres)
-        if gpus <= 0:
-            continue
-        hours = _elapsed_to_hours(elapsed)
-        gpu_hours = hours * (gpus / 2.0)
-        by_user = totals.setdefault(account, {})
-        by_user[user] = by_user.get(user, 0.0) + gpu_hours
+    if accounting_cube is not None:
+        for (account, user), gpu_hours in _cube_query(projects, ("account", "user")).items():
+            totals.setdefault(account, {})[user] = gpu_hours
+    else:
+        for account, user, gpu_hours in iter_sacct_gpu_hours(_weekly_sacct_output(projects)):
+            by_user = totals.setdefault(account, {})
+            by_user[user] = by_user.get(user, 0.0) + gpu_hours
 
     # Round to nearest integer GPUh for reporting
     return {proj: {u: int(round(v)) for u, v in by_user.items()} for proj, by_user in totals.items()}
 
 
+def get_daily_gpu_hours_by_project(projects: list[str], days: int = 7) -> dict[str, list[float]]:
+    """Return each project's GPU-hours per 24h over the last `days` days,
+    oldest first, from the same (cached) sacct rows as the weekly totals.
+    Jobs are spread over the days they ran.
+
+    From the accounting cube, the series is per calendar day and ends
+    yesterday: today's partial day would read as a drop in usage. It starts
+    no earlier than the cube's first day.
+    """
+    if not projects:
+        return {}
+    if accounting_cube is not None:
+        accounting_cube.refresh(projects, max_age=SACCT_CACHE_SECONDS)
+        today = datetime.now().date()
+        since = max(today - timedelta(days=days), min(accounting_cube.days, default=today))
+        series = {p: accounting_cube.series(p, since, today) for p in projects}
+        return {p: values for p, values in series.items() if any(values)}
+    out = _weekly_sacct_output(projects)
+    jobs = ((account, start, hours, gpus) for account, _, start, hours, gpus in iter_sacct_gpu_jobs(out))
+    return daily_series(jobs, datetime.now(), days)
+
+
+def get_gpu_forecasts(projects: list[str]) -> dict:
+    """Return {project: forecast.BurnForecast} for projects with usage."""
+    days = CUBE_FORECAST_DAYS if accounting_cube is not None else 7
+    return fit_forecasts(get_daily_gpu_hours_by_project(projects, days))
+
+
+def get_gpu_quota_values(projects_cfg: dict) -> dict:
+    """Return the raw numbers behind the quota report, for metrics export.
+
+    Returns a dict: { 'updated_at': datetime|None, 'projects': { name: {
+    'gpu_used': int, 'gpu_allocated': int, 'gpu_hours_7d': int|None } } }
+    """
+    data = get_lumi_allocations()
+    allocations = data.get("projects", {})
+
+    weekly_by_project: dict[str, int] = {}
+    try:
+        weekly_by_project = get_weekly_gpu_hours_by_project(list(projects_cfg.keys()))
+    except Exception as e:
+        logger.warning(f"Unable to compute weekly GPU-hours via sacct: {e}")
+
+    projects = {}
+    for project in projects_cfg:
+        alloc_info = allocations.get(project)
+        if not alloc_info:
+            continue
+        projects[project] = {
+            "gpu_used": int(alloc_info.get("gpu_used") or 0),
+            "gpu_allocated": int(alloc_info.get("gpu_allocated") or 0),
+            "gpu_hours_7d": weekly_by_project.get(project),
+        }
+    return {"updated_at": data.get("updated_at"), "projects": projects}
+
+
 def compute_gpu_quota_messages(projects_cfg: dict):
     """Compute daily GPU quota status lines for the provided projects.
 
@@ -310,11 +456,22 @@ def compute_gpu_quota_messages(projects_cfg: dict):
     except Exception as e:
         logger.warning(f"Unable to compute weekly GPU-hours via sacct: {e}")
 
+    # Burn forecasts from the same sacct rows (no extra query)
+    forecasts: dict = {}
+    if weekly_by_project:
+        try:
+            forecasts = get_gpu_forecasts(list(projects_cfg.keys()))
+        except Exception as e:
+            logger.warning(f"Unable to forecast GPU-hour burn: {e}")
+
     lines = []
     for project, cfg in projects_cfg.items():
         try:
-            start_date = _parse_date(cfg["start"])  # YYYY-MM-DD (date-only)
-            end_date = _parse_date(cfg["end"]) if cfg.get("end") else None  # YYYY-MM-DD (date-only)
+            if isinstance(cfg, QuotaProject):
+                start_date, end_date = cfg.start, cfg.end
+            else:
+                start_date = _parse_date(cfg["start"])  # YYYY-MM-DD (date-only)
+                end_date = _parse_date(cfg["end"]) if cfg.get("end") else None  # YYYY-MM-DD (date-only)
         except Exception as e:
             lines.append(f"GPU quota {project}: invalid start/end dates in config ({e})")
             continue
@@ -393,6 +550,9 @@ def compute_gpu_quota_messages(projects_cfg: dict):
                 eta_days = int(round(remaining / daily_rate)) if daily_rate > 0 else None
                 if eta_days is not None and days_remaining is not None and days_remaining > 0:
                     msg += f", ETA ~{eta_days}d/{days_remaining}d"
+            forecast = forecasts.get(project)
+            if show_overall_projection and forecast is not None and remaining > 0:
+                msg += f", {forecast.format_eta(remaining)}"
         if updated_at:
             age = now_real - updated_at
             if age > timedelta(hours=24):
@@ -404,6 +564,6 @@ def compute_gpu_quota_messages(projects_cfg: dict):
         if milestone_error:
             lines.append(f"  milestone: invalid config ({milestone_error})")
         if milestone:
-            lines.append(_format_milestone_message(milestone, used, weekly_val, baseline))
+            lines.append(_format_milestone_message(milestone, used, weekly_val, baseline, forecasts.get(project)))
 
     return lines
@@ -0,0 +1,249 @@
+"""Replay recorded snapshots through the check/MessageTracker/post pipeline.
+
+    python -m slurmmonitor.replay log.jsonl [--json] [--show-posts]
+
+Records are the lines main.py appends to log.jsonl (see
+monitor.snapshot_record); hand-written fixtures in the same format work too.
+Time is virtual: each record is processed at its own timestamp with no
+sleeping, so months of history replay in seconds. Nothing is sent anywhere;
+posts are collected and summarized.
+"""
+import argparse
+import collections
+import datetime
+import json
+import time
+
+from slurmmonitor import config
+from slurmmonitor.aggregator import NotificationAggregator
+from slurmmonitor.config import Job
+from slurmmonitor.message import MessageTracker
+from slurmmonitor.monitor import Monitor
+from slurmmonitor.slurm.util import JobState
+from slurmmonitor.throughput import ThroughputTracker
+from slurmmonitor.timing import StageTimer, percentile
+
+
+class VirtualClock:
+    def __init__(self, timestamp=0.0):
+        self.timestamp = timestamp
+
+    def time(self):
+        return self.timestamp
+
+    def now(self):
+        return datetime.datetime.fromtimestamp(self.timestamp)
+
+    def advance_to(self, timestamp):
+        self.timestamp = timestamp
+
+
+class RecordedSnapshot:
+    """Stands in for ClusterDataSnapshot when replaying history."""
+    def __init__(self, jobs=None, free_bytes=None, free_inodes=None, queue_days=None, job_progress=None):
+        self.jobs = jobs or {}
+        self.job_progress = job_progress or {}
+        self.free_bytes = free_bytes or {}
+        self.free_inodes = free_inodes or {}
+        self.queue_days = queue_days or {}
+
+    @classmethod
+    def from_record(cls, record):
+        jobs = {name: JobState(**data) for name, data in record.get("job_state", {}).items()}
+        return cls(
+            jobs=jobs,
+            free_bytes=record.get("free_bytes"),
+            free_inodes=record.get("free_inodes"),
+            queue_days=record.get("queue_days"),
+            job_progress=record.get("job_progress"),
+        )
+
+
+def read_records(filename):
+    with open(filename, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def last_record(filename, block_size=1 << 16):
+    """The last record in `filename`, or None if it has none. Reads
+    backwards from the end, so it's cheap on long histories."""
+    with open(filename, "rb") as f:
+        end = f.seek(0, 2)
+        tail = b""
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            tail = f.read(end - start) + tail
+            end = start
+            lines = tail.strip().splitlines()
+            # the first line may be cut off unless the whole file is read
+            if len(lines) > 1 or (lines and end == 0):
+                return json.loads(lines[-1])
+    return None
+
+
+def _recorded_thresholds(records, field, thresholds):
+    # only check paths that were recorded in every snapshot
+    return {
+        path: threshold for path, threshold in thresholds.items()
+        if all(path in record.get(field, {}) for record in records)
+    }
+
+
+class ReplayReport:
+    def __init__(self):
+        self.iterations = 0
+        self.latencies = []
+        self.messages = 0
+        self.messages_by_topic = collections.Counter()
+        self.posts = []
+        self.daily_reports = []
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.wall_time = 0.0
+        self.timer = StageTimer(window=None)
+
+    def summary(self):
+        latencies_ms = [i * 1000 for i in self.latencies]
+        simulated = 0.0
+        if self.first_timestamp is not None:
+            simulated = self.last_timestamp - self.first_timestamp
+        return {
+            "iterations": self.iterations,
+            "wall_time_s": self.wall_time,
+            "simulated_days": simulated / 86400,
+            "latency_ms": {
+                "mean": sum(latencies_ms) / len(latencies_ms) if latencies_ms else None,
+                "p50": percentile(latencies_ms, 50),
+                "p95": percentile(latencies_ms, 95),
+                "max": max(latencies_ms) if latencies_ms else None,
+            },
+            "messages": self.messages,
+            "messages_by_topic": dict(self.messages_by_topic.most_common()),
+            "posts": len(self.posts),
+            "daily_reports": [datetime.datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+                              for ts, _ in self.daily_reports],
+            "stages_ms": {
+                stage: {k: v * 1000 if k != "count" else v for k, v in s.items()}
+                for stage, s in self.timer.stats().items()
+            },
+        }
+
+
+def replay(records, job_config=None, free_bytes_config=None, free_inodes_config=None,
+           quota_lines=None, message_tracker=None, aggregator=None, incremental=False, rules=(), throughput=None):
+    """Feed `records` through a Monitor on a virtual clock and return a ReplayReport."""
+    records = sorted(records, key=lambda record: record["timestamp"])
+
+    if job_config is None:
+        # recorded jobs have no log/checkpoint files to look at, so stall and
+        # progress checks are neutral.
+        names = sorted({name for record in records for name in record.get("job_state", {})})
+        job_config = [Job(name) for name in names]
+    if free_bytes_config is None:
+        free_bytes_config = _recorded_thresholds(records, "free_bytes", config.free_bytes_config)
+    if free_inodes_config is None:
+        free_inodes_config = _recorded_thresholds(records, "free_inodes", config.free_inodes_config)
+
+    clock = VirtualClock()
+    report = ReplayReport()
+
+    def post(text):
+        report.posts.append((clock.time(), text))
+
+    monitor = Monitor(
+        post,
+        job_config,
+        free_bytes_config,
+        free_inodes_config,
+        quota_lines=quota_lines,
+        message_tracker=message_tracker,
+        echo=lambda text: None,
+        timer=report.timer,
+        aggregator=aggregator,
+        incremental=incremental,
+        rules=rules,
+        throughput=throughput,
+    )
+
+    wall_start = time.perf_counter()
+    for record in records:
+        clock.advance_to(record["timestamp"])
+        snapshot = RecordedSnapshot.from_record(record)
+
+        start = time.perf_counter()
+        result = monitor.run_cycle(snapshot, now=clock.now())
+        report.latencies.append(time.perf_counter() - start)
+
+        report.iterations += 1
+        report.messages += len(result.messages)
+        report.messages_by_topic.update(message.topic for message in result.messages)
+        if result.daily_report is not None:
+            report.daily_reports.append((clock.time(), result.daily_report))
+        if report.first_timestamp is None:
+            report.first_timestamp = clock.time()
+        report.last_timestamp = clock.time()
+    report.wall_time = time.perf_counter() - wall_start
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="log.jsonl or recorded fixture file")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument("--show-posts", action="store_true", help="print every post with its virtual timestamp")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="batch posts through a NotificationAggregator using config.notification_config")
+    parser.add_argument("--damping", action="store_true",
+                        help="apply flap damping using config.tracker_config")
+    parser.add_argument("--throughput", action="store_true",
+                        help="report job slowdowns using config.throughput_config")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-run checks whose snapshot inputs changed")
+    args = parser.parse_args(argv)
+
+    message_tracker = None
+    if args.damping:
+        message_tracker = MessageTracker(**config.tracker_config)
+
+    aggregator = None
+    if args.coalesce:
+        aggregator = NotificationAggregator(**config.notification_config)
+
+    report = replay(list(read_records(args.file)), message_tracker=message_tracker,
+                    aggregator=aggregator, incremental=args.incremental,
+                    rules=config.rules_config,
+                    throughput=ThroughputTracker(**config.throughput_config) if args.throughput else None)
+
+    if args.show_posts:
+        for ts, text in report.posts:
+            print(f"--- {datetime.datetime.fromtimestamp(ts).isoformat(timespec='seconds')}")
+            print(text)
+
+    summary = report.summary()
+    if args.json:
+        print(json.dumps(summary, indent=4))
+        return
+
+    latency = summary["latency_ms"]
+    print(f"iterations: {summary['iterations']} ({summary['simulated_days']:.1f} days in {summary['wall_time_s']:.2f}s)")
+    if latency["mean"] is not None:
+        print(f"latency ms: mean {latency['mean']:.3f} p50 {latency['p50']:.3f} "
+              f"p95 {latency['p95']:.3f} max {latency['max']:.3f}")
+    print(f"messages: {summary['messages']}, posts: {summary['posts']}")
+    for topic, count in summary["messages_by_topic"].items():
+        print(f"  {topic}: {count}")
+    print(f"daily reports: {len(summary['daily_reports'])}")
+    for ts in summary["daily_reports"]:
+        print(f"  {ts}")
+    print("stages:")
+    for line in report.timer.format_stats().splitlines():
+        print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
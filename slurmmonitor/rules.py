@@ -0,0 +1,330 @@
+import fnmatch
+import logging
+import operator
+import re
+import string
+
+from slurmmonitor.message import Message
+
+logger = logging.getLogger(__name__)
+
+
+# Threshold checks as data.
+#
+# A rule is a dict:
+#
+#   {
+#       "metric": "free_bytes",          # snapshot field: {key: value}
+#       "thresholds": {"/scratch/x": (10e12, 11e12)},   # per key, or
+#       "keys": ["/scratch/*"], "threshold": 10e12,     # patterns + one value
+#       "op": "<",                       # alert while `value op set`
+#       "severity": "warning",           # info, warning or critical
+#       "topic": "{metric} {key}",
+#       "message": "{icon} Not enough free space on {key}",
+#       "ok_message": "✅ Sufficient free space on {key}",
+#       "details": "bytes",              # formatter name or template
+#   }
+#
+# Thresholds are a number or a (set, clear) pair, see split_threshold().
+# A rule without "op" is informational and reports the value every cycle.
+# Templates can use {key}, {metric}, {value}, {threshold}, {severity}, {icon}.
+#
+# RuleSet compiles rules once: rules are grouped by metric and explicit keys
+# are indexed, so evaluating a metric is a single pass over its keys no
+# matter how many rules there are. Pattern matches are cached per key.
+
+OPS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# operator shown in the details of the recovered ("ok") message
+OK_OPS = {"<": ">", "<=": ">", ">": "<", ">=": "<"}
+
+SEVERITY_ICONS = {
+    "info": "ℹ️",
+    "warning": "⚠️",
+    "critical": "🚨",
+}
+
+
+def format_bytes_pair(value, threshold, op):
+    max_val = max(float(value), float(threshold))
+    units = ["B", "KB", "MB", "GB", "TB", "PB"]
+    unit_index = 0
+    while max_val >= 1000 and unit_index < len(units) - 1:
+        max_val /= 1000.0
+        unit_index += 1
+    divisor = 1000 ** unit_index
+
+    if unit_index == 0:
+        value_str = f"{int(value)} B"
+        threshold_str = f"{int(threshold)} B"
+    else:
+        value_str = f"{value / divisor:.1f} {units[unit_index]}"
+        threshold_str = f"{threshold / divisor:.1f} {units[unit_index]}"
+
+    return f"{value_str} {op} {threshold_str}"
+
+
+def format_count_pair(value, threshold, op):
+    max_val = max(float(value), float(threshold))
+    units = ["", "K", "M", "B"]
+    unit_index = 0
+    while max_val >= 1000 and unit_index < len(units) - 1:
+        max_val /= 1000.0
+        unit_index += 1
+    divisor = 1000 ** unit_index
+
+    if unit_index == 0:
+        value_str = f"{int(value)}"
+        threshold_str = f"{int(threshold)}"
+    else:
+        value_str = f"{value / divisor:.1f}{units[unit_index]}"
+        threshold_str = f"{threshold / divisor:.1f}{units[unit_index]}"
+
+    return f"{value_str} {op} {threshold_str}"
+
+
+def format_plain_pair(value, threshold, op):
+    return f"{value} {op} {threshold}"
+
+
+FORMATTERS = {
+    "bytes": format_bytes_pair,
+    "count": format_count_pair,
+    "plain": format_plain_pair,
+}
+
+
+def split_threshold(threshold, op="<"):
+    """Split a configured threshold into (set, clear) values.
+
+    A plain number is used for both. With a (set, clear) pair the alert is
+    raised when `value op set` and only cleared again once the value is past
+    `clear`; `clear` is never on the alerting side of `set`.
+    """
+    if isinstance(threshold, (tuple, list)):
+        set_threshold, clear_threshold = threshold
+        if op in ("<", "<="):
+            return set_threshold, max(set_threshold, clear_threshold)
+        return set_threshold, min(set_threshold, clear_threshold)
+    return threshold, threshold
+
+
+class Rule:
+    """One compiled rule. See the module comment for the spec format."""
+    def __init__(self, spec):
+        spec = dict(spec)
+        try:
+            self.metric = spec.pop("metric")
+        except KeyError:
+            raise ValueError(f"rule without metric: {spec!r}") from None
+        self.name = spec.pop("name", self.metric)
+        self.op = spec.pop("op", None)
+        if self.op is not None and self.op not in OPS:
+            raise ValueError(f"rule {self.name}: unknown op {self.op!r}")
+        self.severity = spec.pop("severity", "warning")
+        if self.severity not in SEVERITY_ICONS:
+            raise ValueError(f"rule {self.name}: unknown severity {self.severity!r}")
+        self.topic = spec.pop("topic", "{metric} {key}")
+        self.message = spec.pop("message", "{icon} {metric} on {key}")
+        self.ok_message = spec.pop("ok_message", "✅ {metric} on {key}")
+        details = spec.pop("details", "plain")
+        self.formatter = FORMATTERS.get(details)
+        self.details = None if self.formatter is not None else details
+
+        thresholds = spec.pop("thresholds", None)
+        threshold = spec.pop("threshold", None)
+        keys = spec.pop("keys", None)
+        if spec:
+            raise ValueError(f"rule {self.name}: unknown fields {sorted(spec)}")
+        if thresholds is not None and (keys is not None or threshold is not None):
+            raise ValueError(f"rule {self.name}: use either thresholds or keys/threshold")
+        if self.op is not None and thresholds is None and threshold is None:
+            raise ValueError(f"rule {self.name}: op {self.op!r} needs a threshold")
+
+        if thresholds is not None:
+            self.thresholds = {key: split_threshold(t, self.op) for key, t in thresholds.items()}
+            self.patterns = []
+        else:
+            keys = ["*"] if keys is None else list(keys)
+            pair = split_threshold(threshold, self.op)
+            self.thresholds = {key: pair for key in keys if not _is_pattern(key)}
+            self.patterns = [key for key in keys if _is_pattern(key)]
+            self.pattern_threshold = pair
+        self._topic_re = self._compile_topic()
+
+    def _compile_topic(self):
+        """A regex matching the topics of this rule, capturing the key."""
+        fixed = {"metric": self.metric, "severity": self.severity, "icon": SEVERITY_ICONS[self.severity]}
+        parts = []
+        has_key = False
+        for literal, field, _, _ in string.Formatter().parse(self.topic):
+            parts.append(re.escape(literal))
+            if field is None:
+                continue
+            if field in fixed:
+                parts.append(re.escape(fixed[field]))
+            elif field == "key":
+                parts.append("(?P=key)" if has_key else "(?P<key>.+)")
+                has_key = True
+            else:
+                parts.append(".+")
+        return re.compile("".join(parts))
+
+    def has_topic(self, topic):
+        """Whether evaluate() can report `topic` for one of this rule's keys."""
+        match = self._topic_re.fullmatch(topic)
+        if match is None:
+            return False
+        key = match.groupdict().get("key")
+        if key is None:
+            return True
+        return key in self.thresholds or any(fnmatch.fnmatchcase(key, pattern) for pattern in self.patterns)
+
+    def evaluate(self, key, value, set_threshold, clear_threshold):
+        fields = {
+            "key": key,
+            "metric": self.metric,
+            "value": value,
+            "threshold": set_threshold,
+            "severity": self.severity,
+            "icon": SEVERITY_ICONS[self.severity],
+        }
+        topic = self.topic.format(**fields)
+        if self.op is None:
+            return Message(topic, self.message.format(**fields), self._details(fields, None))
+
+        compare = OPS[self.op]
+        if compare(value, set_threshold):
+            return Message(topic, self.message.format(**fields), self._details(fields, self.op))
+        return Message(
+            topic,
+            self.ok_message.format(**fields),
+            self._details(fields, OK_OPS[self.op]),
+            active=False,
+            hold=compare(value, clear_threshold),
+        )
+
+    def _details(self, fields, op):
+        if self.formatter is not None:
+            return self.formatter(fields["value"], fields["threshold"], op)
+        return self.details.format(**fields)
+
+
+def _is_pattern(key):
+    return any(c in key for c in "*?[")
+
+
+class RuleSet:
+    """Rules compiled into per-metric indexes.
+
+    `metrics` lists the metrics with rules in first-seen order; evaluate()
+    returns messages in rule order for explicit keys, then pattern matches
+    in snapshot order.
+    """
+    def __init__(self, specs):
+        self.rules = [spec if isinstance(spec, Rule) else Rule(spec) for spec in specs]
+        self.metrics = []
+        # metric -> [(key, [(rule, set, clear), ...])] in config order
+        self.keyed = {}
+        # metric -> [rule with patterns]
+        self.patterned = {}
+        # (metric, key) -> [(rule, set, clear)] from pattern rules
+        self._matches = {}
+        # (metric, key) of configured keys missing from the snapshot
+        self._missing = set()
+
+        indexes = {}
+        for rule in self.rules:
+            if rule.metric not in indexes:
+                self.metrics.append(rule.metric)
+                indexes[rule.metric] = {}
+                self.patterned[rule.metric] = []
+            index = indexes[rule.metric]
+            for key, (set_threshold, clear_threshold) in rule.thresholds.items():
+                index.setdefault(key, []).append((rule, set_threshold, clear_threshold))
+            if rule.patterns:
+                self.patterned[rule.metric].append(rule)
+        self.keyed = {metric: list(index.items()) for metric, index in indexes.items()}
+
+    def _pattern_matches(self, metric, key):
+        cache_key = (metric, key)
+        matches = self._matches.get(cache_key)
+        if matches is None:
+            matches = []
+            for rule in self.patterned[metric]:
+                if any(fnmatch.fnmatchcase(key, pattern) for pattern in rule.patterns):
+                    matches.append((rule, *rule.pattern_threshold))
+            self._matches[cache_key] = matches
+        return matches
+
+    def evaluate(self, snapshot, metrics=None):
+        """Evaluate the rules for `metrics` (default: all) against the
+        {key: value} fields of `snapshot`. Configured keys missing from the
+        snapshot are skipped, with a warning when they go missing."""
+        messages = []
+        for metric in self.metrics if metrics is None else metrics:
+            column = getattr(snapshot, metric, None) or {}
+            for key, evaluators in self.keyed.get(metric, ()):
+                if key not in column:
+                    if (metric, key) not in self._missing:
+                        self._missing.add((metric, key))
+                        logger.warning(f"No {metric} value for {key} in the snapshot, not checking it")
+                    continue
+                self._missing.discard((metric, key))
+                value = column[key]
+                for rule, set_threshold, clear_threshold in evaluators:
+                    messages.append(rule.evaluate(key, value, set_threshold, clear_threshold))
+            if self.patterned.get(metric):
+                for key, value in column.items():
+                    for rule, set_threshold, clear_threshold in self._pattern_matches(metric, key):
+                        messages.append(rule.evaluate(key, value, set_threshold, clear_threshold))
+        return messages
+
+    def has_topic(self, topic):
+        return any(rule.has_topic(topic) for rule in self.rules)
+
+
+def free_bytes_rule(free_bytes_config):
+    return {
+        "metric": "free_bytes",
+        "thresholds": free_bytes_config,
+        "op": "<",
+        "message": "{icon} Not enough free space on {key}",
+        "ok_message": "✅ Sufficient free space on {key}",
+        "details": "bytes",
+    }
+
+
+def free_inodes_rule(free_inodes_config):
+    return {
+        "metric": "free_inodes",
+        "thresholds": free_inodes_config,
+        "op": "<",
+        "message": "{icon} Not enough free inodes on {key}",
+        "ok_message": "✅ Sufficient free inodes on {key}",
+        "details": "count",
+    }
+
+
+def queue_days_rule():
+    return {
+        "metric": "queue_days",
+        "severity": "info",
+        "topic": "queue_days_{key}",
+        "message": "{key} queue status",
+        "details": "{value} days",
+    }
+
+
+def builtin_rules(free_bytes_config, free_inodes_config):
+    """The original threshold checks, as rules."""
+    return [
+        queue_days_rule(),
+        free_bytes_rule(free_bytes_config),
+        free_inodes_rule(free_inodes_config),
+    ]
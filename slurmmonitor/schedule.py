@@ -0,0 +1,135 @@
+"""Loop timing and calendar jobs.
+
+FixedRateTicker paces the monitor loop on the monotonic clock. Ticks are at
+start + k * period no matter how long a cycle took, so the loop doesn't drift
+by the collection time. A cycle that overruns a whole tick skips that tick
+(counted in `skipped`) instead of running cycles back to back to catch up.
+
+JobScheduler runs cron-like jobs ("daily 09:00", "weekly mon 09:00") off the
+wall clock. A job is due once its scheduled time has passed since its last
+run, however the loop's cycles fall around it, and the last runs are saved
+to a state file. A job missed while the monitor was down or failing runs
+once on the next cycle; several missed runs are coalesced into one.
+"""
+import json
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+SCHEDULE_RE = re.compile(r"^(daily|weekly (mon|tue|wed|thu|fri|sat|sun)) ([01]?\d|2[0-3]):([0-5]\d)$")
+
+
+class FixedRateTicker:
+    def __init__(self, period, jitter=0.0, clock=time.monotonic, sleep=time.sleep, uniform=random.uniform):
+        self.period = period
+        # up to this many seconds are added to each sleep, so several
+        # monitors don't hit slurmctld at the same instant
+        self.jitter = jitter
+        self.clock = clock
+        self.sleep = sleep
+        self.uniform = uniform
+        self.next_tick = clock() + period
+        self.skipped = 0
+
+    def wait(self):
+        """Sleep until the next tick. Returns the number of ticks skipped
+        because the last cycle overran them."""
+        now = self.clock()
+        if now < self.next_tick:
+            delay = self.next_tick - now
+            if self.jitter:
+                delay += self.uniform(0, self.jitter)
+            self.sleep(delay)
+            self.next_tick += self.period
+            return 0
+        # late: start right away, and drop the ticks that passed entirely
+        missed = int((now - self.next_tick) // self.period)
+        self.next_tick += (missed + 1) * self.period
+        self.skipped += missed
+        return missed
+
+
+class Schedule:
+    """A "daily HH:MM" or "weekly <day> HH:MM" spec, in local time."""
+    def __init__(self, spec):
+        match = SCHEDULE_RE.match(spec.strip().lower())
+        if match is None:
+            raise ValueError(f"invalid schedule {spec!r}, expected 'daily HH:MM' or 'weekly mon HH:MM'")
+        self.spec = spec
+        self.weekday = WEEKDAYS.index(match.group(2)) if match.group(2) else None
+        self.hour = int(match.group(3))
+        self.minute = int(match.group(4))
+
+    def previous(self, now):
+        """The latest scheduled time at or before `now`."""
+        at = now.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if self.weekday is None:
+            return at if at <= now else at - timedelta(days=1)
+        at -= timedelta(days=(at.weekday() - self.weekday) % 7)
+        return at if at <= now else at - timedelta(days=7)
+
+    def __repr__(self):
+        return f"Schedule({self.spec!r})"
+
+
+class JobScheduler:
+    def __init__(self, schedules, state_path=None, clock=datetime.now):
+        # name -> Schedule
+        self.schedules = {name: Schedule(spec) for name, spec in schedules.items()}
+        self.state_path = state_path
+        self.clock = clock
+        # name -> datetime of the last run
+        self.last_run = {}
+        self._load()
+
+    def _load(self):
+        if self.state_path is None:
+            return
+        try:
+            with open(self.state_path) as f:
+                record = json.load(f)
+            self.last_run = {name: datetime.fromisoformat(value) for name, value in record.items()}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable scheduler state {self.state_path}: {e}")
+
+    def _save(self):
+        if self.state_path is None:
+            return
+        tmp_path = self.state_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({name: value.isoformat() for name, value in self.last_run.items()}, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning(f"Error writing scheduler state {self.state_path}: {e}")
+
+    def due(self, now=None):
+        """Names of the jobs to run now, in schedule order.
+
+        A job never seen before is only due from its next scheduled time on,
+        so a fresh start doesn't send every report at once.
+        """
+        now = now or self.clock()
+        due = []
+        for name, schedule in self.schedules.items():
+            last = self.last_run.get(name)
+            if last is None:
+                self.last_run[name] = now
+                self._save()
+                continue
+            if schedule.previous(now) > last:
+                due.append(name)
+        return due
+
+    def done(self, name, now=None):
+        """Record a run of `name`; it's due again at its next scheduled time."""
+        self.last_run[name] = now or self.clock()
+        self._save()
@@ -0,0 +1,309 @@
+"""Monitor configuration loaded from a data file, with hot reload.
+
+config.py holds the defaults. A JSON or TOML file (main.py --config) can
+override any of its sections:
+
+    users = ["alice"]
+    slurm_partitions = ["standard-g"]
+
+    [free_bytes_config]
+    "/scratch/project_x" = [10e12, 11e12]
+
+    [[job_config]]
+    name = "7B"
+    logfile = "/scratch/project_x/logs/latest.out"
+    stall_factor = 10
+
+    [gpu_quota_projects.project_x]
+    start = "2026-05-29"
+    milestone = { name = "checkpoint", date = "2026-08-02", target_pct = 40.0 }
+
+load_settings() validates everything up front and returns a frozen Settings:
+jobs become Job objects indexed by name, threshold paths are normalized and
+deduplicated, rules are compiled into a RuleSet and quota projects get their
+dates and milestones parsed once. SettingsWatcher re-reads the file when it
+changes; a file that fails validation is logged and the running settings
+are kept.
+"""
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+from slurmmonitor import config
+from slurmmonitor.config import Job
+from slurmmonitor.lustre import LustreQuotaCollector
+from slurmmonitor.monitor import SCHEDULED_REPORTS
+from slurmmonitor.quota import compile_quota_project
+from slurmmonitor.rules import RuleSet, builtin_rules
+from slurmmonitor.schedule import Schedule
+from slurmmonitor.watch import file_metadata
+
+logger = logging.getLogger(__name__)
+
+# sections a data file may set; each defaults to the config.py value
+SECTIONS = (
+    "job_config", "users", "free_bytes_config", "free_inodes_config", "rules_config",
+    "slurm_partitions", "gpu_quota_projects", "notification_config", "tracker_config",
+    "sinks_config", "throughput_config", "lustre_quota_config", "usage_scan_config",
+    "schedule_config",
+)
+TABLE_SECTIONS = ("free_bytes_config", "free_inodes_config", "gpu_quota_projects", "notification_config",
+                  "tracker_config", "throughput_config", "lustre_quota_config", "usage_scan_config",
+                  "schedule_config")
+# sections read when main.py starts; changing them needs a restart
+RESTART_SECTIONS = ("notification_config", "tracker_config", "sinks_config", "throughput_config",
+                    "lustre_quota_config", "usage_scan_config", "schedule_config")
+
+JOB_FIELDS = ("name", "logfile", "latest", "total", "stall_factor", "min_stall",
+              "iteration_pattern", "throughput_pattern")
+
+
+class SettingsError(ValueError):
+    pass
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _job_spec(job):
+    return tuple(getattr(job, name) for name in JOB_FIELDS)
+
+
+@dataclass(frozen=True)
+class Settings:
+    jobs: tuple
+    users: tuple
+    free_bytes_config: MappingProxyType
+    free_inodes_config: MappingProxyType
+    rules_config: tuple
+    slurm_partitions: tuple
+    gpu_quota_projects: MappingProxyType
+    notification_config: MappingProxyType
+    tracker_config: MappingProxyType
+    sinks_config: tuple
+    throughput_config: MappingProxyType
+    lustre_quota_config: MappingProxyType
+    usage_scan_config: MappingProxyType
+    schedule_config: MappingProxyType
+    # derived at load time
+    jobs_by_name: MappingProxyType = field(repr=False)
+    ruleset: RuleSet = field(repr=False, compare=False)
+    source: str | None = field(default=None, compare=False)
+
+    def to_dict(self):
+        """Section values by their config.py names."""
+        return {name: getattr(self, "jobs" if name == "job_config" else name) for name in SECTIONS}
+
+
+def _compile_jobs(specs):
+    jobs = []
+    for i, spec in enumerate(specs):
+        if isinstance(spec, Job):
+            jobs.append(spec)
+            continue
+        if not isinstance(spec, dict) or not spec.get("name"):
+            raise SettingsError(f"job_config[{i}]: expected a table with a name")
+        unknown = set(spec) - set(JOB_FIELDS)
+        if unknown:
+            raise SettingsError(f"job_config[{i}]: unknown keys {sorted(unknown)}")
+        jobs.append(Job(**spec))
+    names = [job.name for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise SettingsError(f"job_config: duplicate job names {duplicates}")
+    return tuple(jobs)
+
+
+def _compile_thresholds(section, thresholds):
+    compiled = {}
+    for path, threshold in thresholds.items():
+        normalized = os.path.normpath(path)
+        if isinstance(threshold, list):
+            threshold = tuple(threshold)
+        if normalized in compiled and compiled[normalized] != threshold:
+            raise SettingsError(f"{section}: {path} listed twice with different thresholds")
+        compiled[normalized] = threshold
+    return compiled
+
+
+def compile_settings(sections, source=None):
+    """Validate `sections` (SECTIONS names, missing ones from config.py) into
+    Settings. Raises SettingsError."""
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        raise SettingsError(f"unknown settings {sorted(unknown)}, expected some of {', '.join(SECTIONS)}")
+    values = {name: sections.get(name, getattr(config, name)) for name in SECTIONS}
+    for name, value in values.items():
+        expected = dict if name in TABLE_SECTIONS else (list, tuple)
+        if not isinstance(value, expected):
+            raise SettingsError(f"{name}: expected {'a table' if expected is dict else 'a list'}")
+
+    jobs = _compile_jobs(values["job_config"])
+    free_bytes = _compile_thresholds("free_bytes_config", values["free_bytes_config"])
+    free_inodes = _compile_thresholds("free_inodes_config", values["free_inodes_config"])
+    rules = [dict(rule) for rule in values["rules_config"]]
+    try:
+        ruleset = RuleSet(builtin_rules(free_bytes, free_inodes) + rules)
+    except ValueError as e:
+        raise SettingsError(f"rules_config: {e}") from None
+
+    try:
+        LustreQuotaCollector(**values["lustre_quota_config"])
+    except (TypeError, ValueError) as e:
+        raise SettingsError(f"lustre_quota_config: {e}") from None
+
+    jobs_schedule = values["schedule_config"].get("jobs", {})
+    if not isinstance(jobs_schedule, dict):
+        raise SettingsError("schedule_config.jobs: expected a table")
+    unknown = set(jobs_schedule) - set(SCHEDULED_REPORTS)
+    if unknown:
+        raise SettingsError(f"schedule_config: unknown jobs {sorted(unknown)}, expected some of "
+                            f"{', '.join(SCHEDULED_REPORTS)}")
+    for name, spec in jobs_schedule.items():
+        try:
+            Schedule(spec)
+        except (AttributeError, ValueError) as e:
+            raise SettingsError(f"schedule_config.jobs.{name}: {e}") from None
+
+    projects = {}
+    for name, cfg in values["gpu_quota_projects"].items():
+        try:
+            projects[name] = compile_quota_project(cfg)
+        except (KeyError, TypeError, ValueError) as e:
+            raise SettingsError(f"gpu_quota_projects.{name}: {e}") from None
+
+    return Settings(
+        jobs=jobs,
+        users=tuple(dict.fromkeys(values["users"])),
+        free_bytes_config=MappingProxyType(free_bytes),
+        free_inodes_config=MappingProxyType(free_inodes),
+        rules_config=_freeze(rules),
+        slurm_partitions=tuple(dict.fromkeys(values["slurm_partitions"])),
+        gpu_quota_projects=MappingProxyType(projects),
+        notification_config=_freeze(values["notification_config"]),
+        tracker_config=_freeze(values["tracker_config"]),
+        sinks_config=_freeze(values["sinks_config"]),
+        throughput_config=_freeze(values["throughput_config"]),
+        lustre_quota_config=_freeze(values["lustre_quota_config"]),
+        usage_scan_config=_freeze(values["usage_scan_config"]),
+        schedule_config=_freeze(values["schedule_config"]),
+        jobs_by_name=MappingProxyType({job.name: job for job in jobs}),
+        ruleset=ruleset,
+        source=source,
+    )
+
+
+def read_settings_file(path):
+    """Sections from a .json or .toml file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        if path.endswith(".toml"):
+            import tomllib
+            return tomllib.loads(data.decode())
+        return json.loads(data)
+    except ValueError as e:
+        raise SettingsError(str(e)) from None
+
+
+def load_settings(path=None):
+    """Settings from `path`, or from config.py alone without one."""
+    if path is None:
+        return compile_settings({})
+    try:
+        return compile_settings(read_settings_file(path), source=path)
+    except SettingsError as e:
+        raise SettingsError(f"{path}: {e}") from None
+
+
+def _keyed(section, values):
+    if section == "job_config":
+        return {job.name: _job_spec(job) for job in values}
+    if isinstance(values, MappingProxyType):
+        return dict(values)
+    return None
+
+
+def diff_settings(old, new):
+    """{section: summary} for every section that differs, where the summary
+    is {"added": [...], "removed": [...], "changed": [...]} for keyed
+    sections (jobs by name, paths, projects) and True otherwise."""
+    changes = {}
+    old_values, new_values = old.to_dict(), new.to_dict()
+    for section in SECTIONS:
+        a, b = old_values[section], new_values[section]
+        keyed_a, keyed_b = _keyed(section, a), _keyed(section, b)
+        if keyed_a is None:
+            if a != b:
+                changes[section] = True
+            continue
+        summary = {
+            "added": sorted(keyed_b.keys() - keyed_a.keys()),
+            "removed": sorted(keyed_a.keys() - keyed_b.keys()),
+            "changed": sorted(k for k in keyed_a.keys() & keyed_b.keys() if keyed_a[k] != keyed_b[k]),
+        }
+        if any(summary.values()):
+            changes[section] = summary
+    return changes
+
+
+def format_changes(changes):
+    parts = []
+    for section, summary in changes.items():
+        if summary is True:
+            parts.append(section)
+            continue
+        details = ", ".join(f"{kind} {', '.join(map(str, keys))}" for kind, keys in summary.items() if keys)
+        parts.append(f"{section} ({details})")
+    return "; ".join(parts)
+
+
+# SettingsWatcher re-reads the settings file when its mtime or size changes.
+# poll() is called between monitor cycles, so the swap is atomic as far as
+# the loop is concerned: a cycle sees either the old or the new settings.
+class SettingsWatcher:
+    def __init__(self, path, stat=None, clock=time.monotonic):
+        self.path = path
+        # file_metadata avoids the stat while inotify reports no change
+        self._stat = stat or file_metadata.stat
+        self.clock = clock
+        self._signature = self._file_signature()
+        self.current = load_settings(path)
+
+    def _file_signature(self):
+        try:
+            st = self._stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def poll(self):
+        """(settings, changes) after a successful reload, else None."""
+        signature = self._file_signature()
+        if signature == self._signature or signature is None:
+            return None
+        self._signature = signature
+
+        started = self.clock()
+        try:
+            settings = load_settings(self.path)
+        except (OSError, SettingsError) as e:
+            logger.error(f"Not reloading settings: {e}")
+            return None
+        changes = diff_settings(self.current, settings)
+        self.current = settings
+        elapsed_ms = (self.clock() - started) * 1000
+        if changes:
+            logger.info(f"Reloaded {self.path} in {elapsed_ms:.1f}ms: {format_changes(changes)}")
+        restart = [section for section in RESTART_SECTIONS if section in changes]
+        if restart:
+            logger.warning(f"Changes to {', '.join(restart)} take effect after a restart")
+        return settings, changes
@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+
+from slurmmonitor.delivery import QueuedWorker, WebhookDelivery
+
+logger = logging.getLogger(__name__)
+
+
+# A sink receives batches of Messages from FanOut. Each sink has its own
+# bounded queue and worker thread, so a slow or failing sink never delays the
+# other sinks or the monitoring loop.
+#
+# `topics` is an optional list of topic prefixes the sink wants, e.g.
+# ["job_status", "job_stalled"]. Messages without a topic (aggregator
+# summaries) go to every sink that receives anything else from the batch.
+#
+# submit() may return a Future resolved with whether the batch was delivered.
+class Sink(ABC):
+    def __init__(self, name, topics=None):
+        self.name = name
+        self.topics = topics
+
+    def accepts(self, topic):
+        if self.topics is None or topic is None:
+            return True
+        return any(topic.startswith(prefix) for prefix in self.topics)
+
+    def filter(self, messages):
+        selected = [m for m in messages if self.accepts(m.topic)]
+        if all(m.topic is None for m in selected):
+            return []
+        return selected
+
+    @abstractmethod
+    def submit(self, messages):
+        """Queue `messages` for delivery without blocking."""
+
+    def start(self):
+        return self
+
+    def stop(self, timeout=None):
+        pass
+
+
+class WebhookSink(Sink):
+    """Posts the batch as one Slack message through a WebhookDelivery."""
+    def __init__(self, name, url, topics=None, **delivery_kwargs):
+        super().__init__(name, topics)
+        self.delivery = WebhookDelivery(url, **delivery_kwargs)
+        self.delivery.name = f"sink-{name}"
+
+    def submit(self, messages):
+        future = Future()
+        self.delivery.submit("\n".join(str(m) for m in messages), future)
+        return future
+
+    def start(self):
+        self.delivery.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.delivery.stop(timeout)
+
+
+class NdjsonWriter(QueuedWorker):
+    def __init__(self, path, max_retries=3, backoff=1.0, queue_size=1000, sleep=time.sleep):
+        super().__init__(queue_size=queue_size)
+        self.path = path
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sleep = sleep
+
+    def send(self, records):
+        text = "".join(json.dumps(record) + "\n" for record in records)
+        for attempt in range(self.max_retries + 1):
+            try:
+                with open(self.path, "a") as f:
+                    f.write(text)
+                self.sent += 1
+                return True
+            except OSError as e:
+                logger.warning(f"Error writing {self.path} (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    self.sleep(self.backoff * (2 ** attempt))
+        self.failed += 1
+        return False
+
+
+class NdjsonSink(Sink):
+    """Appends one JSON line per message to a local audit file."""
+    def __init__(self, name, path, topics=None, clock=time.time, **writer_kwargs):
+        super().__init__(name, topics)
+        self.clock = clock
+        self.writer = NdjsonWriter(path, **writer_kwargs)
+        self.writer.name = f"sink-{name}"
+
+    def submit(self, messages):
+        timestamp = self.clock()
+        future = Future()
+        self.writer.submit([dict(m.to_dict(), timestamp=timestamp) for m in messages], future)
+        return future
+
+    def start(self):
+        self.writer.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.writer.stop(timeout)
+
+
+class FanOut:
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def start(self):
+        for sink in self.sinks:
+            sink.start()
+        return self
+
+    def stop(self, timeout=None):
+        for sink in self.sinks:
+            sink.stop(timeout)
+
+    def dispatch(self, messages):
+        """Hand each sink the messages it wants. Never blocks. Returns the
+        Futures of the sinks that report delivery."""
+        futures = []
+        for sink in self.sinks:
+            selected = sink.filter(messages)
+            if selected:
+                future = sink.submit(selected)
+                if future is not None:
+                    futures.append(future)
+        return futures
+
+
+def build_sinks(sinks_config, environ=os.environ):
+    """Create sinks from config.sinks_config entries.
+
+    Webhook URLs are read from the environment variable named by `url_env`;
+    webhook sinks whose variable is unset are skipped with a warning.
+    """
+    sinks = []
+    for cfg in sinks_config:
+        cfg = dict(cfg)
+        kind = cfg.pop("type")
+        name = cfg.pop("name", kind)
+        if kind == "webhook":
+            url_env = cfg.pop("url_env", "WEBHOOK_URL")
+            url = environ.get(url_env)
+            if not url:
+                logger.warning(f"{url_env} is not set; not posting to sink {name}")
+                continue
+            sinks.append(WebhookSink(name, url, **cfg))
+        elif kind == "ndjson":
+            sinks.append(NdjsonSink(name, **cfg))
+        else:
+            raise ValueError(f"unknown sink type {kind!r} for sink {name}")
+    return sinks
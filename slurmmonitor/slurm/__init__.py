@@ -1 +0,0 @@
-from . import util
\ No newline at end of file
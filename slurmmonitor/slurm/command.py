@@ -0,0 +1,16 @@
+import logging
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+# kept apart from util.py so sacct/lumi-allocations callers don't import
+# pydantic for the squeue models
+def run_or_raise(command):
+    logger.debug(f"Running: {command}")
+    status, output = subprocess.getstatusoutput(command)
+    if status != 0:
+        raise subprocess.CalledProcessError(status, command, output)
+    logger.debug(f"Command returned {status}")
+
+    return output
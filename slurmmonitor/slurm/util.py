@@ -1,9 +1,10 @@
 import re
-import subprocess
 from datetime import datetime
 from pydantic import BaseModel, validator
 import logging
 
+from slurmmonitor.slurm.command import run_or_raise
+
 logger = logging.getLogger(__name__)
 
 
@@ -112,16 +113,6 @@ class JobState(BaseModel):
     def check_pending(cls, v, values):
         return values.get('state') in STATUS_PENDING
 
-def run_or_raise(command):
-    logger.debug(f"Running: {command}")
-    status, output = subprocess.getstatusoutput(command)
-    if status != 0:
-        raise subprocess.CalledProcessError(status, command, output)
-    logger.debug(f"Command returned {status}")
-
-    return output
-    
-
 # squeue -o '%i %T %j %M %L %V'
 #JOBID STATE NAME TIME TIME_LEFT SUBMIT_TIME
 # 4970726 RUNNING mmlu 12:09:46 1-11:50:14 2023-11-20T19:21:14
@@ -184,8 +175,17 @@ def get_queue_days(queue="standard-g"):
     command = f"squeue -p {queue} -o '%D %b %l %T %R'"
     output = run_or_raise(command)
 
+    node_days = parse_queue_node_days(output)
+    return f"{node_days / node_count:.1f}"
+
+
+# squeue -p standard-g -o '%D %b %l %T %R'
+#NODES TRES_PER_NODE TIME_LIMIT STATE NODELIST(REASON)
+# 1 gres/gpu:8 1-00:00:00 PENDING (Priority)
+# 1 gres/gpu:mi250:8 12:00:00 RUNNING nid000001
+def parse_queue_node_days(squeue_output):
     node_days = 0
-    for line in output.split("\n"):
+    for line in squeue_output.split("\n"):
         # count jobs that are not scheduled for priority reasons only.
         if '(Priority)' not in line and 'RUNNING' not in line:
             continue
@@ -198,4 +198,4 @@ def get_queue_days(queue="standard-g"):
         days = parse_time(time_left) / 86400
         node_days += nodes * days
 
-    return f"{node_days / node_count:.1f}"
+    return node_days
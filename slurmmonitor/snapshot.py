@@ -2,12 +2,15 @@ import os
 import collections
 import logging
 import time
+from slurmmonitor.lustre import lustre_quota
+from slurmmonitor.progress import progress_reader
 from slurmmonitor.slurm import util
+from slurmmonitor.timing import NULL_TIMER
 
 logger = logging.getLogger(__name__)
 
 
-from slurmmonitor.config import job_config, free_bytes_config, free_inodes_config, slurm_partitions, users
+from slurmmonitor.config import index_jobs, job_config, free_bytes_config, free_inodes_config, slurm_partitions, users
 
 
 def get_statvfs(path):
@@ -31,28 +34,120 @@ def get_free_inodes(path):
     stats = get_statvfs(path)
     return stats.f_favail
 
+def _job_key(job):
+    # time_running/time_left tick every cycle; only identity and state matter
+    # to the checks' verdicts.
+    if job is None:
+        return None
+    return (job.job_id, job.state)
+
+
+# snapshot fields and how to reduce each value before comparing
+DIFF_FIELDS = {
+    "jobs": _job_key,
+    "jobs_stalled": bool,
+    "job_progress": None,
+    "free_bytes": None,
+    "free_inodes": None,
+    "queue_days": None,
+}
+
+
+class SnapshotDiff:
+    """Keys that changed per snapshot field, e.g. {"free_bytes": {"/scratch/x"}}."""
+    def __init__(self, changed):
+        self.changed = changed
+
+    def touches(self, fields):
+        # fields that weren't compared count as changed
+        return any(field not in self.changed or self.changed[field] for field in fields)
+
+    def __bool__(self):
+        return any(self.changed.values())
+
+    def __repr__(self):
+        return f"SnapshotDiff({ {k: sorted(v) for k, v in self.changed.items() if v} })"
+
+
+def snapshot_diff(prev, current):
+    """Compare two snapshots (ClusterDataSnapshot or anything with the same
+    dict attributes). A field missing from either side counts as empty."""
+    changed = {}
+    for field, key in DIFF_FIELDS.items():
+        old = getattr(prev, field, None) or {}
+        new = getattr(current, field, None) or {}
+        keys = set()
+        for name in old.keys() | new.keys():
+            a, b = old.get(name), new.get(name)
+            if key is not None:
+                a, b = key(a), key(b)
+            if a != b or (name in old) != (name in new):
+                keys.add(name)
+        changed[field] = keys
+    return SnapshotDiff(changed)
+
+
 class ClusterDataSnapshot:
-    def __init__(self):
-        jobs, jobs_running_count, jobs_stalled = self._get_job_status(job_config, users)
+    def __init__(self, timer=NULL_TIMER, settings=None):
+        self.timer = timer
+        # settings.Settings to collect for; config.py's values without
+        if settings is not None:
+            jobs_cfg, users_cfg = settings.jobs_by_name, settings.users
+            inodes_cfg, bytes_cfg = settings.free_inodes_config, settings.free_bytes_config
+            partitions = settings.slurm_partitions
+        else:
+            jobs_cfg, users_cfg = job_config, users
+            inodes_cfg, bytes_cfg, partitions = free_inodes_config, free_bytes_config, slurm_partitions
+
+        jobs, jobs_running_count, jobs_stalled, job_progress = self._get_job_status(jobs_cfg, users_cfg)
         self.jobs = jobs
         self.jobs_running_count = jobs_running_count
         self.jobs_stalled = jobs_stalled
-
-        self.free_inodes = {path: get_free_inodes(path) for path in free_inodes_config}
-        self.free_bytes = {path: get_free_bytes(path) for path in free_bytes_config}
-
-        self.queue_days = {partition: util.get_queue_days(partition) for partition in slurm_partitions}
+        self.job_progress = job_progress
+
+        # project quota headroom on Lustre, statvfs for everything else
+        with timer.span("collect.lfs_quota"):
+            quotas = lustre_quota.collect(list(dict.fromkeys([*inodes_cfg, *bytes_cfg])))
+
+        self.free_inodes = {}
+        for path in inodes_cfg:
+            with timer.span(f"collect.free_inodes {path}"):
+                quota = quotas.get(path)
+                if quota is not None and quota.free_inodes is not None:
+                    self.free_inodes[path] = quota.free_inodes
+                else:
+                    self.free_inodes[path] = get_free_inodes(path)
+        self.free_bytes = {}
+        for path in bytes_cfg:
+            with timer.span(f"collect.free_bytes {path}"):
+                quota = quotas.get(path)
+                if quota is not None and quota.free_bytes is not None:
+                    self.free_bytes[path] = quota.free_bytes
+                else:
+                    self.free_bytes[path] = get_free_bytes(path)
+
+        self.queue_days = {}
+        for partition in partitions:
+            with timer.span(f"collect.queue_days {partition}"):
+                self.queue_days[partition] = util.get_queue_days(partition)
     
+    def diff(self, prev):
+        return snapshot_diff(prev, self)
+
     def _get_job_status(self, job_config, users):
         jobs = {}
         jobs_running_count = collections.defaultdict(int)
         jobs_stalled = {}
+        job_progress = {}
+
+        configs = index_jobs(job_config)
 
-        configs = {job.name: job for job in job_config}
+        with self.timer.span("collect.squeue"):
+            job_states = util.get_job_state(users)
 
-        for job in util.get_job_state(users):
+        for job in job_states:
             # check for only the job names we're interested in.
-            if job.name not in configs.keys():
+            if job.name not in configs:
                 continue
     
             # names are not guaranteed unique, so let's look for duplicates here that might throw our monitoring off.
@@ -68,11 +163,23 @@ class ClusterDataSnapshot:
                 jobs[job.name] = job
 
             # check if job is stalled (only running jobs can be stalled!)
-            if job.running and configs[job.name].stalled():
-                jobs_stalled[job.name] = True
-        logger.debug(f"ClusterDataSnapshot: {jobs=}, {jobs_running_count=}, {jobs_stalled=}")
-
-        return jobs, jobs_running_count, jobs_stalled
+            if job.running:
+                with self.timer.span(f"collect.stalled {job.name}"):
+                    now = time.time()
+                    # a requeued job keeps its id but starts over
+                    if configs[job.name].stalled(now=now, run=(job.job_id, now - job.time_running)):
+                        jobs_stalled[job.name] = True
+
+                # latest checkpointed iteration, for throughput tracking
+                latest = configs[job.name].latest
+                if latest is not None:
+                    with self.timer.span(f"collect.progress {job.name}"):
+                        step = progress_reader.step(latest)
+                    if step is not None:
+                        job_progress[job.name] = step
+        logger.debug(f"ClusterDataSnapshot: {jobs=}, {jobs_running_count=}, {jobs_stalled=}, {job_progress=}")
+
+        return jobs, jobs_running_count, jobs_stalled, job_progress
 
 
     def _get_job_stalls(self, job_config):
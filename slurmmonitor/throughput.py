@@ -0,0 +1,96 @@
+import collections
+import statistics
+
+
+class JobThroughput:
+    """Checkpointed iterations of one job name over time."""
+    def __init__(self):
+        self.job_id = None
+        self.iteration = None
+        self.changed_at = None
+        # (end time, iterations, seconds) between consecutive checkpoints
+        self.segments = collections.deque()
+
+    def observe(self, job_id, iteration, now):
+        if self.job_id != job_id or self.iteration is None or iteration < self.iteration:
+            # new or requeued job: don't count the time it spent queued
+            self.job_id = job_id
+            self.iteration = iteration
+            self.changed_at = now
+            return
+        if iteration > self.iteration:
+            self.segments.append((now, iteration - self.iteration, now - self.changed_at))
+            self.iteration = iteration
+            self.changed_at = now
+
+    def prune(self, before):
+        while self.segments and self.segments[0][0] < before:
+            self.segments.popleft()
+
+
+def _rate(segments):
+    seconds = sum(s[2] for s in segments)
+    if seconds <= 0:
+        return None
+    return sum(s[1] for s in segments) / seconds * 3600
+
+
+# ThroughputTracker follows checkpoint progress (the iteration in Job.latest,
+# collected into snapshot.job_progress) and reports iterations per hour.
+#
+# Each checkpoint change closes a segment. The current rate is over the
+# segments that ended within the last `window` seconds (or the latest one);
+# the baseline is the median rate of older segments in the last `history`
+# seconds. A job is slow when the current rate drops below
+# `slowdown_fraction` of the baseline, e.g. after a requeue onto slower
+# nodes. Segments never span a job id change, so queue time isn't counted.
+class ThroughputTracker:
+    def __init__(self, window=4 * 3600, history=48 * 3600, slowdown_fraction=0.7, min_segments=3):
+        self.window = window
+        self.history = history
+        self.slowdown_fraction = slowdown_fraction
+        self.min_segments = min_segments
+        self.jobs = collections.defaultdict(JobThroughput)
+
+    def observe(self, name, job_id, iteration, now):
+        job = self.jobs[name]
+        job.observe(job_id, iteration, now)
+        job.prune(now - self.history)
+
+    def _split(self, name, now):
+        job = self.jobs.get(name)
+        if job is None or not job.segments:
+            return [], []
+        cutoff = now - self.window
+        recent = [s for s in job.segments if s[0] >= cutoff] or [job.segments[-1]]
+        older = [s for s in job.segments if s[0] < cutoff and s is not recent[0]]
+        return recent, older
+
+    def rate(self, name, now):
+        """Current iterations per hour, or None before two checkpoints."""
+        recent, _ = self._split(name, now)
+        return _rate(recent) if recent else None
+
+    def baseline(self, name, now):
+        """Median iterations per hour before the current window, or None
+        until `min_segments` older segments are known."""
+        _, older = self._split(name, now)
+        rates = [_rate([s]) for s in older if s[2] > 0]
+        if len(rates) < self.min_segments:
+            return None
+        return statistics.median(rates)
+
+    def slowed_down(self, name, now):
+        """True/False, or None while there isn't enough history."""
+        rate, baseline = self.rate(name, now), self.baseline(name, now)
+        if rate is None or baseline is None:
+            return None
+        return rate < self.slowdown_fraction * baseline
+
+    def eta(self, name, total, now):
+        """Seconds until iteration `total` at the current rate, or None."""
+        job = self.jobs.get(name)
+        rate = self.rate(name, now)
+        if job is None or total is None or not rate:
+            return None
+        return max(0, total - job.iteration) / rate * 3600
@@ -0,0 +1,129 @@
+import collections
+import contextlib
+import math
+import threading
+import time
+
+# upper bounds (seconds) of the cumulative stage duration histograms
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (pct in 0-100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# StageTimer records how long each named stage of a monitoring cycle takes.
+# It keeps the last `window` samples per stage for rolling p50/p95/max, and
+# the per-cycle totals since the last start_cycle() for the history log.
+#
+# It also keeps cumulative histograms (see HISTOGRAM_BUCKETS) that never
+# reset, for the metrics exporter, which reads them from its own thread.
+#
+# Stage names are "<kind>.<what>", e.g. "collect.squeue",
+# "collect.free_bytes /scratch/project_x", "check.job_status", "post".
+class StageTimer:
+    def __init__(self, window=1440, clock=time.perf_counter):
+        self.clock = clock
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self.histograms = {}
+        self.cycle = {}
+        self.cycle_start = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record(stage, self.clock() - start)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+            self.cycle[stage] = self.cycle.get(stage, 0.0) + seconds
+
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = {
+                    "buckets": [0] * len(HISTOGRAM_BUCKETS),
+                    "count": 0,
+                    "sum": 0.0,
+                }
+            for i, bound in enumerate(HISTOGRAM_BUCKETS):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+
+    def histogram_snapshot(self):
+        """Copy of the cumulative histograms: {stage: {"buckets", "count", "sum"}}."""
+        with self._lock:
+            return {
+                stage: {"buckets": list(h["buckets"]), "count": h["count"], "sum": h["sum"]}
+                for stage, h in self.histograms.items()
+            }
+
+    def start_cycle(self):
+        self.cycle = {}
+        self.cycle_start = self.clock()
+
+    def cycle_total(self):
+        if self.cycle_start is None:
+            return 0.0
+        return self.clock() - self.cycle_start
+
+    def cycle_timings(self):
+        """Milliseconds per stage for the current cycle, for the history log."""
+        timings = {stage: round(seconds * 1000, 1) for stage, seconds in self.cycle.items()}
+        timings["total"] = round(self.cycle_total() * 1000, 1)
+        return timings
+
+    def format_cycle(self, limit=5):
+        """Compact one-line summary of the slowest stages this cycle."""
+        slowest = sorted(self.cycle.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        parts = [f"{stage}={seconds:.2f}s" for stage, seconds in slowest]
+        return f"cycle {self.cycle_total():.2f}s: " + " ".join(parts)
+
+    def stats(self):
+        """Rolling p50/p95/max in seconds per stage."""
+        return {
+            stage: {
+                "count": len(samples),
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "max": max(samples),
+            }
+            for stage, samples in self.samples.items() if samples
+        }
+
+    def format_stats(self):
+        lines = []
+        for stage, s in sorted(self.stats().items(), key=lambda kv: kv[1]["p95"], reverse=True):
+            lines.append(f"{stage}: p50 {s['p50'] * 1000:.1f}ms p95 {s['p95'] * 1000:.1f}ms "
+                         f"max {s['max'] * 1000:.1f}ms (n={s['count']})")
+        return "\n".join(lines)
+
+
+class NullTimer:
+    """Drop-in for StageTimer when nothing should be recorded."""
+    @contextlib.contextmanager
+    def span(self, stage):
+        yield
+
+    def record(self, stage, seconds):
+        pass
+
+    def histogram_snapshot(self):
+        return {}
+
+    def start_cycle(self):
+        pass
+
+
+NULL_TIMER = NullTimer()
@@ -0,0 +1,245 @@
+"""Who is using the space and inodes under a monitored path.
+
+UsageScanner walks a directory tree with a pool of os.scandir workers, one
+directory level at a time, and attributes allocated bytes and inodes to
+file owners and to the top-level subdirectories of the root. It never
+follows symlinks or crosses into other filesystems.
+
+Every directory's own entries are summarized in a record keyed by its
+path. Records are saved to `cache_path` and reused on the next scan when
+the directory's mtime hasn't changed, so a rescan stats each directory
+but only lists the ones where files were created, removed or renamed.
+Sizes of files that only grew are taken from the old record until their
+directory changes.
+
+UsageScans runs scans on a background worker so a free_inodes alert can ask
+for one without holding up the monitor loop; Monitor attaches the latest
+report to the alert and the query server returns it.
+"""
+import functools
+import json
+import logging
+import os
+import pwd
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from slurmmonitor.delivery import QueuedWorker
+
+logger = logging.getLogger(__name__)
+
+# st_blocks is in 512-byte units regardless of the filesystem block size
+BLOCK_BYTES = 512
+ROOT_FILES = "."
+
+
+@functools.lru_cache(maxsize=None)
+def _owner_name(uid):
+    try:
+        return pwd.getpwuid(int(uid)).pw_name
+    except (KeyError, ValueError):
+        return str(uid)
+
+
+def _add(totals, key, nbytes, inodes):
+    entry = totals.get(key)
+    if entry is None:
+        totals[key] = [nbytes, inodes]
+    else:
+        entry[0] += nbytes
+        entry[1] += inodes
+
+
+class UsageReport:
+    def __init__(self, root, by_owner, by_subdir, dirs, reused, errors, seconds, finished_at):
+        self.root = root
+        # {name: [bytes, inodes]}
+        self.by_owner = by_owner
+        self.by_subdir = by_subdir
+        self.dirs = dirs
+        self.reused = reused
+        self.errors = errors
+        self.seconds = seconds
+        self.finished_at = finished_at
+
+    @property
+    def total_bytes(self):
+        return sum(v[0] for v in self.by_owner.values())
+
+    @property
+    def total_inodes(self):
+        return sum(v[1] for v in self.by_owner.values())
+
+    def top(self, totals, measure="inodes", n=3):
+        """[(name, value, fraction)] of the `n` largest in `totals`."""
+        index = 1 if measure == "inodes" else 0
+        total = sum(v[index] for v in totals.values()) or 1
+        largest = sorted(totals.items(), key=lambda kv: kv[1][index], reverse=True)[:n]
+        return [(name, values[index], values[index] / total) for name, values in largest]
+
+    def summary(self, measure="inodes", n=3):
+        def fmt(totals):
+            return ", ".join(f"{name} {fraction:.0%}" for name, _, fraction in self.top(totals, measure, n))
+
+        return f"top {measure} owners: {fmt(self.by_owner)}; dirs: {fmt(self.by_subdir)}"
+
+    def to_dict(self):
+        return {
+            "root": self.root,
+            "by_owner": {k: {"bytes": v[0], "inodes": v[1]} for k, v in self.by_owner.items()},
+            "by_subdir": {k: {"bytes": v[0], "inodes": v[1]} for k, v in self.by_subdir.items()},
+            "total_bytes": self.total_bytes,
+            "total_inodes": self.total_inodes,
+            "dirs": self.dirs,
+            "reused": self.reused,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "finished_at": self.finished_at,
+        }
+
+
+class UsageScanner:
+    def __init__(self, cache_path=None, max_workers=8, clock=time.time):
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+        self.clock = clock
+        # root -> {directory: record}
+        self.records = {}
+        self._loaded = False
+
+    def _load(self):
+        self._loaded = True
+        if self.cache_path is None:
+            return
+        try:
+            with open(self.cache_path) as f:
+                self.records = json.load(f)["roots"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable usage cache {self.cache_path}: {e}")
+
+    def _save(self):
+        if self.cache_path is None:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"roots": self.records}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Error writing usage cache {self.cache_path}: {e}")
+
+    @staticmethod
+    def _scan_dir(path, dev, old):
+        """(record, reused) for one directory's own entries."""
+        st = os.lstat(path)
+        if old is not None and old["mtime_ns"] == st.st_mtime_ns:
+            return old, True
+        # mtime is read before listing: a change during the scan shows up
+        # as a new mtime next time
+        files = {}
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    est = entry.stat(follow_symlinks=False)
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if est.st_dev == dev:
+                        subdirs.append(entry.name)
+                    continue
+                _add(files, str(est.st_uid), est.st_blocks * BLOCK_BYTES, 1)
+        record = {
+            "mtime_ns": st.st_mtime_ns,
+            "uid": str(st.st_uid),
+            "bytes": st.st_blocks * BLOCK_BYTES,
+            "files": files,
+            "subdirs": subdirs,
+        }
+        return record, False
+
+    def scan(self, root):
+        """Walk `root` and return a UsageReport."""
+        if not self._loaded:
+            self._load()
+        root = os.path.abspath(root)
+        started = time.monotonic()
+        old_records = self.records.get(root, {})
+        records = {}
+        by_uid, by_subdir = {}, {}
+        reused = errors = 0
+        dev = os.lstat(root).st_dev
+
+        def scan_one(item):
+            path, top = item
+            try:
+                record, was_reused = self._scan_dir(path, dev, old_records.get(path))
+            except OSError as e:
+                logger.debug(f"usage scan: skipping {path}: {e}")
+                return path, top, None, False
+            return path, top, record, was_reused
+
+        level = [(root, ROOT_FILES)]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="usage-scan") as pool:
+            while level:
+                next_level = []
+                for path, top, record, was_reused in pool.map(scan_one, level):
+                    if record is None:
+                        errors += 1
+                        continue
+                    records[path] = record
+                    reused += was_reused
+                    if path != root:
+                        _add(by_uid, record["uid"], record["bytes"], 1)
+                        _add(by_subdir, top, record["bytes"], 1)
+                    for uid, (nbytes, inodes) in record["files"].items():
+                        _add(by_uid, uid, nbytes, inodes)
+                        _add(by_subdir, top, nbytes, inodes)
+                    for name in record["subdirs"]:
+                        next_level.append((os.path.join(path, name), name if path == root else top))
+                level = next_level
+
+        self.records[root] = records
+        self._save()
+        by_owner = {}
+        for uid, (nbytes, inodes) in by_uid.items():
+            _add(by_owner, _owner_name(uid), nbytes, inodes)
+        report = UsageReport(root, by_owner, by_subdir, len(records), reused, errors,
+                             time.monotonic() - started, self.clock())
+        logger.info(f"Scanned {root}: {report.dirs} dirs ({reused} unchanged), {report.total_inodes} inodes, "
+                    f"{report.seconds:.1f}s")
+        return report
+
+
+# UsageScans scans requested paths one at a time on a background thread and
+# keeps the latest report per path. A path is rescanned at most every
+# `min_interval` seconds, however often it's requested.
+class UsageScans(QueuedWorker):
+    name = "usage-scan"
+
+    def __init__(self, scanner, min_interval=3600, queue_size=20, clock=time.time):
+        super().__init__(queue_size=queue_size)
+        self.scanner = scanner
+        self.min_interval = min_interval
+        self.clock = clock
+        self.reports = {}
+        self.requested = {}
+
+    def request(self, path):
+        """Queue a scan of `path` unless one is queued or recent."""
+        now = self.clock()
+        last = self.requested.get(path)
+        if last is not None and now - last < self.min_interval:
+            return False
+        self.requested[path] = now
+        self.submit(path)
+        return True
+
+    def send(self, path):
+        self.reports[path] = self.scanner.scan(path)
+
+    def report(self, path):
+        return self.reports.get(path)
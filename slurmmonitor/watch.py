@@ -0,0 +1,256 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+# inotify only reports changes made through the local kernel. On Lustre and
+# NFS other nodes write the files, so those are always polled.
+WATCHABLE_FILESYSTEMS = {"ext2", "ext3", "ext4", "xfs", "btrfs", "tmpfs", "overlay", "zfs"}
+
+
+def _unescape_mount_path(path):
+    # /proc/mounts escapes space, tab, newline and backslash as octal
+    return path.replace("\\040", " ").replace("\\011", "\t").replace("\\012", "\n").replace("\\134", "\\")
+
+
+def read_mounts(mounts_file="/proc/self/mounts"):
+    """{mount point: filesystem type}, or {} if it can't be read."""
+    mounts = {}
+    try:
+        with open(mounts_file) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3:
+                    mounts[_unescape_mount_path(fields[1])] = fields[2]
+    except OSError:
+        pass
+    return mounts
+
+
+def mount_point(path, mounts):
+    """The mount holding `path`: the longest matching mount point."""
+    path = os.path.realpath(path)
+    best = None
+    for mount in mounts:
+        prefix = mount.rstrip("/") + "/"
+        if path == mount or path.startswith(prefix) or mount == "/":
+            if best is None or len(mount) > len(best):
+                best = mount
+    return best
+
+
+def filesystem_type(path, mounts):
+    """Type of the filesystem holding `path`."""
+    return mounts.get(mount_point(path, mounts))
+
+
+class InotifyWatcher:
+    """Watches directories with inotify through ctypes. Events are drained
+    without blocking by read_changes(), so no thread is needed."""
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        try:
+            self._add_watch = libc.inotify_add_watch
+        except AttributeError:
+            raise OSError(errno.ENOSYS, "inotify is not available") from None
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._add_watch.restype = ctypes.c_int
+
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self.fd = fd
+        # watch descriptor -> directory, and back
+        self.dirs = {}
+        self.watches = {}
+
+    def add(self, directory):
+        """Watch `directory`. Raises OSError if it can't be watched."""
+        if directory in self.watches:
+            return
+        wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), directory)
+        self.dirs[wd] = directory
+        self.watches[directory] = wd
+
+    def watching(self, directory):
+        return directory in self.watches
+
+    def read_changes(self):
+        """Paths changed since the last call. A directory in the result means
+        everything in it may have changed; None means everything."""
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                directory = self.dirs.get(wd)
+                if directory is None:
+                    continue
+                if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                    del self.dirs[wd]
+                    self.watches.pop(directory, None)
+                    changed.add(directory)
+                elif name:
+                    changed.add(os.path.join(directory, os.fsdecode(name)))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Entry:
+    __slots__ = ("result", "error", "time", "watched")
+
+    def __init__(self, result, error, time, watched):
+        self.result = result
+        self.error = error
+        self.time = time
+        self.watched = watched
+
+
+# FileMetadataCache is a drop-in for os.stat that avoids repeating metadata
+# round-trips on shared filesystems.
+#
+# Without a watcher every call stats the file, like os.stat; with poll_ttl
+# set, results are reused for that many seconds. With a watcher, files on
+# WATCHABLE_FILESYSTEMS get their directory watched and their cached result
+# (including "doesn't exist") is reused until an event invalidates it, or
+# max_age passes as a safety net. Other files fall back to polling.
+class FileMetadataCache:
+    def __init__(self, watcher=None, poll_ttl=0, max_age=300, mounts=None, clock=time.monotonic):
+        self.watcher = watcher
+        self.poll_ttl = poll_ttl
+        self.max_age = max_age
+        self.clock = clock
+        self.entries = {}
+        self.stats = 0
+        self._mounts = mounts
+        self._watchable = {}
+
+    def configure(self, watcher=None, poll_ttl=0, max_age=300):
+        if self.watcher is not None:
+            self.watcher.close()
+        self.watcher = watcher
+        self.poll_ttl = poll_ttl
+        self.max_age = max_age
+        self.entries = {}
+        self._watchable = {}
+
+    def _drain_events(self):
+        changed = self.watcher.read_changes()
+        if changed is None:
+            self.entries = {}
+            return
+        for path in changed:
+            self.entries.pop(path, None)
+            if path in self._watchable:
+                # the directory itself went away
+                self._watchable.pop(path, None)
+                prefix = path.rstrip("/") + "/"
+                for cached in [p for p in self.entries if p.startswith(prefix)]:
+                    del self.entries[cached]
+
+    def _watch(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        watched = self._watchable.get(directory)
+        if watched is not None and (not watched or self.watcher.watching(directory)):
+            return watched
+        if self._mounts is None:
+            self._mounts = read_mounts()
+        watched = False
+        if filesystem_type(directory, self._mounts) in WATCHABLE_FILESYSTEMS:
+            try:
+                self.watcher.add(directory)
+                watched = True
+            except OSError as e:
+                logger.debug(f"Not watching {directory}: {e}")
+        self._watchable[directory] = watched
+        return watched
+
+    def stat(self, path):
+        """os.stat(path), cached. Raises OSError like os.stat."""
+        now = self.clock()
+        if self.watcher is not None:
+            self._drain_events()
+
+        entry = self.entries.get(path)
+        if entry is not None:
+            ttl = self.max_age if entry.watched else self.poll_ttl
+            if now - entry.time < ttl:
+                if entry.error is not None:
+                    raise entry.error
+                return entry.result
+
+        watched = self.watcher is not None and self._watch(path)
+        self.stats += 1
+        try:
+            result, error = os.stat(path), None
+        except OSError as e:
+            result, error = None, e
+        self.entries[path] = _Entry(result, error, now, watched)
+        if error is not None:
+            raise error
+        return result
+
+    def exists(self, path):
+        try:
+            self.stat(path)
+        except OSError:
+            return False
+        return True
+
+
+def make_watcher(mode):
+    """InotifyWatcher for mode "auto" when available, else None (polling)."""
+    if mode != "auto":
+        return None
+    try:
+        return InotifyWatcher()
+    except OSError as e:
+        logger.warning(f"inotify not available, polling file metadata: {e}")
+        return None
+
+
+# shared by ProgressReader, LogTailer and Job.stalled; main.py configures it
+file_metadata = FileMetadataCache()
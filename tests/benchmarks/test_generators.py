@@ -0,0 +1,43 @@
+from benchmarks import generators
+from benchmarks.run import compare_reports, run_benchmarks
+from slurmmonitor.lumi.allocations import parse_lumi_allocations
+from slurmmonitor.quota import iter_sacct_gpu_hours
+from slurmmonitor.slurm.util import parse_job_state, parse_queue_node_days
+
+
+def test_generated_squeue_jobs_parse():
+    jobs = parse_job_state(generators.generate_squeue_jobs(50))
+    assert len(jobs) == 50
+
+
+def test_generated_squeue_queue_parses():
+    assert parse_queue_node_days(generators.generate_squeue_queue(50)) > 0
+
+
+def test_generated_sacct_parses():
+    projects = generators.generate_project_names(3)
+    rows = list(iter_sacct_gpu_hours(generators.generate_sacct(50, projects)))
+    assert rows
+    assert {account for account, _, _ in rows} <= set(projects)
+
+
+def test_generated_lumi_allocations_parse():
+    data = parse_lumi_allocations(generators.generate_lumi_allocations(20))
+    assert data["updated_at"] == generators.BASE_TIME
+    assert len(data["projects"]) == 20
+
+
+def test_generators_are_deterministic():
+    assert generators.generate_sacct(20, ["p"], seed=1) == generators.generate_sacct(20, ["p"], seed=1)
+    assert generators.generate_sacct(20, ["p"], seed=1) != generators.generate_sacct(20, ["p"], seed=2)
+
+
+def test_run_benchmarks_report_and_compare():
+    report = run_benchmarks(["queue_days", "weekly_gpu_hours_by_user"], [10], min_time=0)
+    result = report["results"]["queue_days"]["10"]
+    assert result["repeats"] == 1
+    assert result["min_s"] > 0
+
+    lines = compare_reports(report, report)
+    assert len(lines) == 2
+    assert "(1.00x)" in lines[0]
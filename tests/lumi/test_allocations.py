@@ -1,6 +1,8 @@
 from datetime import datetime
 
-from slurmmonitor.lumi.allocations import parse_lumi_allocations
+import pytest
+
+from slurmmonitor.lumi.allocations import AllocationsCache, parse_lumi_allocations
 
 
 SAMPLE = "> lumi-allocations\n" \
@@ -26,3 +28,90 @@ def test_parse_lumi_allocations_basic():
     p963 = projects["project_462000963"]
     assert p963["gpu_used"] == 125_563
     assert p963["gpu_allocated"] == 1_500_000
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_allocations_cache_refetches_after_max_age(tmp_path):
+    results = [
+        {"updated_at": datetime(2026, 1, 1, 6), "projects": {"project_1": {"gpu_used": 1, "gpu_allocated": 10}}},
+        # same dataset again: keep the cached copy
+        {"updated_at": datetime(2026, 1, 1, 6), "projects": {}},
+        {"updated_at": datetime(2026, 1, 2, 6), "projects": {"project_1": {"gpu_used": 5, "gpu_allocated": 10}}},
+    ]
+    clock = FakeClock(datetime(2026, 1, 1, 8).timestamp())
+    cache = AllocationsCache(str(tmp_path / "alloc.json"), max_age=3600, fetch=lambda: results.pop(0), clock=clock)
+
+    data = cache.get()
+    assert data["projects"]["project_1"]["gpu_used"] == 1
+    assert data["age_seconds"] == 2 * 3600
+    cache.get()
+    assert cache.fetches == 1
+
+    clock.now += 3600
+    assert cache.get()["projects"]["project_1"]["gpu_used"] == 1
+    assert cache.fetches == 2
+
+    clock.now += 3600
+    assert cache.get()["projects"]["project_1"]["gpu_used"] == 5
+
+
+def test_allocations_cache_survives_restart_and_failures(tmp_path):
+    path = str(tmp_path / "alloc.json")
+    clock = FakeClock(datetime(2026, 1, 1, 8).timestamp())
+    data = {"updated_at": datetime(2026, 1, 1, 6), "projects": {"project_1": {"gpu_used": 1, "gpu_allocated": 10}}}
+    AllocationsCache(path, fetch=lambda: data, clock=clock).get()
+
+    def fail():
+        raise RuntimeError("lumi-allocations: command not found")
+
+    restarted = AllocationsCache(path, fetch=fail, clock=clock)
+    assert restarted.get()["updated_at"] == datetime(2026, 1, 1, 6)
+    assert restarted.fetches == 0
+
+    clock.now += 7200
+    assert restarted.get()["projects"] == data["projects"]
+
+    with pytest.raises(RuntimeError):
+        AllocationsCache(str(tmp_path / "other.json"), fetch=fail, clock=clock).get()
+
+
+def test_allocations_cache_backs_off_after_failure(tmp_path):
+    clock = FakeClock(datetime(2026, 1, 1, 8).timestamp())
+    data = {"updated_at": datetime(2026, 1, 1, 6), "projects": {}}
+    calls = []
+
+    def fetch():
+        calls.append(clock.now)
+        if len(calls) in (1, 2, 3):
+            raise RuntimeError("lumi-allocations: timed out")
+        return data
+
+    cache = AllocationsCache(max_age=3600, retry_interval=300, fetch=fetch, clock=clock)
+    with pytest.raises(RuntimeError):
+        cache.get()
+    # the tool isn't run again until the retry interval passed
+    with pytest.raises(RuntimeError):
+        cache.get()
+    assert len(calls) == 1
+    clock.now += 300
+    with pytest.raises(RuntimeError):
+        cache.get()
+    assert len(calls) == 2
+
+    # with cached data, failures fall back to it, also without re-running
+    cache.data, cache.checked_at = data, clock.now - 3600
+    clock.now += 300
+    assert cache.get()["projects"] == {}
+    assert cache.get()["projects"] == {}
+    assert len(calls) == 3
+    clock.now += 300
+    cache.get()
+    assert len(calls) == 4
+    assert cache.checked_at == clock.now
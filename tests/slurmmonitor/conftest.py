@@ -0,0 +1,11 @@
+import pytest
+
+from slurmmonitor import quota
+
+
+@pytest.fixture(autouse=True)
+def clear_sacct_cache():
+    # sacct output is cached per process; tests fake it with different rows
+    quota.clear_sacct_cache()
+    yield
+    quota.clear_sacct_cache()
@@ -0,0 +1,243 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from slurmmonitor import __main__ as cli
+from slurmmonitor import quota
+from slurmmonitor.accounting import (
+    AccountingCube, GpuJob, fetch_gpu_jobs_sharded, parse_sacct_gpu_jobs, shard_window, split_by_day,
+)
+
+SACCT = """JobID|Account|User|Partition|Elapsed|AllocTRES|Start
+1|project_a|alice|standard-g|10:00:00|cpu=8,gres/gpu=8,node=1|2026-03-09T20:00:00
+2|project_a|bob|small-g|02:00:00|cpu=8,gres/gpu=2,node=1|2026-03-10T01:00:00
+3|project_b|carol|standard-g|01:00:00|cpu=8,node=1|2026-03-10T01:00:00
+4|project_b|carol|standard-g|1-00:00:00|cpu=8,gres/gpu=4,node=1|Unknown
+"""
+
+
+def job(account, user, start, hours, gpus=1.0, partition="standard-g", job_id="1"):
+    return GpuJob(job_id, account, user, partition, start, hours, gpus)
+
+
+def test_parse_skips_cpu_only_and_unstarted_jobs():
+    jobs = parse_sacct_gpu_jobs(SACCT)
+    assert [(j.job_id, j.account, j.user, j.partition, j.hours, j.gpus) for j in jobs] == [
+        ("1", "project_a", "alice", "standard-g", 10.0, 4.0),
+        ("2", "project_a", "bob", "small-g", 2.0, 1.0),
+    ]
+    assert jobs[0].end == datetime(2026, 3, 10, 6)
+
+
+def test_split_by_day():
+    assert list(split_by_day(datetime(2026, 3, 9, 20), datetime(2026, 3, 11, 2))) == [
+        (date(2026, 3, 9), 4.0), (date(2026, 3, 10), 24.0), (date(2026, 3, 11), 2.0),
+    ]
+
+
+def test_query_groups_and_filters():
+    cube = AccountingCube()
+    cube.add_jobs(parse_sacct_gpu_jobs(SACCT), date(2026, 3, 9), date(2026, 3, 11), ["project_a", "project_b"])
+
+    assert cube.query(date(2026, 3, 9), date(2026, 3, 11)) == {"project_a": pytest.approx(42.0)}
+    assert cube.query(date(2026, 3, 9), date(2026, 3, 11), by=("day",)) == {
+        date(2026, 3, 9): pytest.approx(16.0), date(2026, 3, 10): pytest.approx(26.0),
+    }
+    assert cube.query(date(2026, 3, 10), date(2026, 3, 11), by=("user", "partition")) == {
+        ("alice", "standard-g"): pytest.approx(24.0), ("bob", "small-g"): pytest.approx(2.0),
+    }
+    assert cube.query(date(2026, 3, 9), date(2026, 3, 11), by=("user",), partitions={"small-g"}) == {
+        "bob": pytest.approx(2.0),
+    }
+    assert cube.series("project_a", date(2026, 3, 8), date(2026, 3, 11)) == [0.0, 16.0, 26.0]
+    with pytest.raises(ValueError):
+        cube.query(date(2026, 3, 9), date(2026, 3, 11), by=("node",))
+
+
+def test_update_only_refetches_since_last_complete_day(tmp_path):
+    now = [datetime(2026, 3, 10, 12)]
+    calls = []
+
+    def fetch(accounts, start, end):
+        calls.append((accounts, start, end))
+        if start.date() == date(2026, 3, 3):
+            return [job("project_a", "alice", datetime(2026, 3, 5), 10.0)]
+        return [job("project_a", "alice", datetime(2026, 3, 10, 20), 10.0)]
+
+    path = str(tmp_path / "cube.json")
+    cube = AccountingCube(path, fetch=fetch, clock=lambda: now[0])
+    cube.update(["project_a"])
+    assert calls[-1][1:] == (datetime(2026, 3, 3), datetime(2026, 3, 10, 12))
+
+    now[0] = datetime(2026, 3, 11, 8)
+    cube = AccountingCube.load(path, fetch=fetch, clock=lambda: now[0])
+    assert cube.complete_until == date(2026, 3, 10)
+    cube.update(["project_a"])
+    # the last update's day is fetched again, older days are kept
+    assert calls[-1][1] == datetime(2026, 3, 10)
+    assert cube.query(date(2026, 3, 1), date(2026, 3, 12), by=("day",)) == {
+        date(2026, 3, 5): pytest.approx(10.0),
+        date(2026, 3, 10): pytest.approx(4.0),
+        date(2026, 3, 11): pytest.approx(6.0),
+    }
+
+    # a new account is backfilled on its own, known ones keep their history
+    cube.update(["project_b"])
+    assert [call[:2] for call in calls[-2:]] == [
+        (["project_b"], datetime(2026, 3, 4)),
+        (["project_a"], datetime(2026, 3, 11)),
+    ]
+    assert cube.query(date(2026, 3, 1), date(2026, 3, 12)) == {"project_a": pytest.approx(20.0)}
+
+    with open(path) as f:
+        assert json.load(f)["accounts"] == ["project_a", "project_b"]
+
+
+def test_update_backfills_known_account(tmp_path):
+    now = datetime(2026, 3, 10, 12)
+    calls = []
+
+    def fetch(accounts, start, end):
+        calls.append((accounts, start, end))
+        return [job("project_a", "alice", datetime(2026, 2, 1), 10.0), job("project_a", "alice", now, 1.0)]
+
+    path = str(tmp_path / "cube.json")
+    AccountingCube(path, fetch=fetch, clock=lambda: now).update(["project_a"])
+    cube = AccountingCube.load(path, fetch=fetch, clock=lambda: now)
+    assert cube.first_days == {"project_a": date(2026, 3, 3)}
+
+    # a query further back than the cube fetches just the missing days
+    cube.update(["project_a"], backfill_days=40)
+    assert calls[1:] == [
+        (["project_a"], datetime(2026, 1, 29), datetime(2026, 3, 3)),
+        (["project_a"], datetime(2026, 3, 10), now),
+    ]
+    assert cube.query(date(2026, 1, 29), date(2026, 3, 11)) == {"project_a": pytest.approx(11.0)}
+    assert cube.first_days == {"project_a": date(2026, 1, 29)}
+
+    cube.update(["project_a"], backfill_days=40)
+    assert calls[-1][1] == datetime(2026, 3, 10)
+
+
+def test_refresh_reuses_recent_update():
+    now = [datetime(2026, 3, 10, 12)]
+    calls = []
+    cube = AccountingCube(fetch=lambda *args: calls.append(args) or [], clock=lambda: now[0])
+    cube.refresh(["project_a"])
+    cube.refresh(["project_a"])
+    assert len(calls) == 1
+    now[0] = datetime(2026, 3, 10, 12, 10)
+    cube.refresh(["project_a"])
+    assert len(calls) == 2
+
+
+def test_weekly_quota_uses_cube(monkeypatch):
+    now = datetime.now()
+    today = datetime(now.year, now.month, now.day)
+    yesterday = today - timedelta(days=1)
+    jobs = [
+        job("project_a", "alice", yesterday, 3.0, gpus=2.0),
+        job("project_a", "bob", today - timedelta(days=7), 1.0),
+        job("project_b", "carol", yesterday, 5.0),
+        # the 7 complete days before today: today's partial usage is left out
+        job("project_a", "alice", today, 5.0),
+    ]
+    cube = AccountingCube(fetch=lambda accounts, start, end: jobs)
+    monkeypatch.setattr(quota, "accounting_cube", cube)
+    monkeypatch.setattr(quota, "_fetch_weekly_sacct_output", lambda projects: pytest.fail("sacct should not run"))
+
+    assert quota.get_weekly_gpu_hours_by_project(["project_a"]) == {"project_a": 7}
+    assert quota.get_weekly_gpu_hours_by_user(["project_a", "project_b"]) == {
+        "project_a": {"alice": 6, "bob": 1}, "project_b": {"carol": 5},
+    }
+
+
+def test_daily_series_from_cube_ends_yesterday(monkeypatch):
+    now = datetime.now()
+    today = datetime(now.year, now.month, now.day)
+    yesterday = today - timedelta(days=1)
+    jobs = [job("project_a", "alice", yesterday, 3.0, gpus=2.0), job("project_a", "bob", today, 1.0)]
+    cube = AccountingCube(fetch=lambda accounts, start, end: jobs)
+    monkeypatch.setattr(quota, "accounting_cube", cube)
+
+    # today's partial day is left out
+    assert quota.get_daily_gpu_hours_by_project(["project_a"], days=3) == {"project_a": [0.0, 0.0, 6.0]}
+    # no zeros from before the cube's history
+    assert quota.get_daily_gpu_hours_by_project(["project_a"], days=28) == {"project_a": [0.0] * 6 + [6.0]}
+
+
+def test_cli_reports_from_cube(tmp_path, capsys):
+    path = str(tmp_path / "cube.json")
+    cube = AccountingCube(path)
+    cube.add_jobs(parse_sacct_gpu_jobs(SACCT), date(2026, 3, 9), date(2026, 3, 11), ["project_a", "project_b"])
+    cube.save()
+
+    cli.main(["quota", "--cube", path, "--no-update", "--account", "project_a",
+              "--since", "2026-03-09", "--until", "2026-03-11", "--by", "user"])
+    out = capsys.readouterr().out
+    assert "GPU-hours 2026-03-09 - 2026-03-11" in out
+    assert "alice  40" in out
+    assert "total  42" in out
+
+    cli.main(["quota", "--cube", path, "--no-update", "--account", "project_a",
+              "--since", "2026-03-10", "--until", "2026-03-11", "--by", "day", "partition", "--json"])
+    report = json.loads(capsys.readouterr().out)
+    assert report["rows"] == [
+        {"day": "2026-03-10", "partition": "standard-g", "gpu_hours": 24.0},
+        {"day": "2026-03-10", "partition": "small-g", "gpu_hours": 2.0},
+    ]
+
+
+def test_shard_window():
+    assert shard_window(datetime(2026, 3, 9, 12), datetime(2026, 3, 11), hours=24) == [
+        (datetime(2026, 3, 9, 12), datetime(2026, 3, 10, 12)),
+        (datetime(2026, 3, 10, 12), datetime(2026, 3, 11)),
+    ]
+
+
+def test_sharded_fetch_batches_accounts_and_dedupes_by_job_id():
+    queries = []
+    long_job = job("project_a", "alice", datetime(2026, 3, 9, 20), 10.0, job_id="7")
+
+    def fetch(accounts, start, end):
+        queries.append((tuple(accounts), start, end))
+        jobs = [job(accounts[0], "bob", start, 1.0, job_id=f"{accounts[0]}-{start:%d}")]
+        if "project_a" in accounts and start <= long_job.start < end:
+            jobs.append(long_job)
+        elif "project_a" in accounts and start < long_job.end:
+            # seen again from the next shard, queried a bit later
+            jobs.append(job("project_a", "alice", long_job.start, 10.5, job_id="7"))
+        return jobs
+
+    jobs = fetch_gpu_jobs_sharded(["project_c", "project_a", "project_b"], datetime(2026, 3, 9),
+                                  datetime(2026, 3, 11), accounts_per_query=2, max_parallel=3, fetch=fetch)
+    assert sorted(queries) == [
+        (("project_a", "project_b"), datetime(2026, 3, 9), datetime(2026, 3, 10)),
+        (("project_a", "project_b"), datetime(2026, 3, 10), datetime(2026, 3, 11)),
+        (("project_c",), datetime(2026, 3, 9), datetime(2026, 3, 10)),
+        (("project_c",), datetime(2026, 3, 10), datetime(2026, 3, 11)),
+    ]
+    assert [(j.job_id, j.hours) for j in jobs] == [
+        ("project_a-09", 1.0), ("project_c-09", 1.0), ("7", 10.5), ("project_a-10", 1.0), ("project_c-10", 1.0),
+    ]
+
+
+def test_sharded_fetch_fails_if_any_query_fails():
+    def fetch(accounts, start, end):
+        if start.day == 10:
+            raise RuntimeError("slurmdbd timeout")
+        return []
+
+    with pytest.raises(RuntimeError):
+        fetch_gpu_jobs_sharded(["project_a"], datetime(2026, 3, 9), datetime(2026, 3, 12), fetch=fetch)
+
+
+def test_add_jobs_keeps_other_accounts():
+    cube = AccountingCube()
+    cube.add_jobs([job("a", "alice", datetime(2026, 3, 9), 2.0), job("b", "bob", datetime(2026, 3, 9), 3.0)],
+                  date(2026, 3, 9), date(2026, 3, 10), ["a", "b"])
+    cube.add_jobs([job("c", "carol", datetime(2026, 3, 9), 1.0)], date(2026, 3, 3), date(2026, 3, 11), ["c"])
+    assert cube.query(date(2026, 3, 1), date(2026, 3, 11)) == {
+        "a": pytest.approx(2.0), "b": pytest.approx(3.0), "c": pytest.approx(1.0),
+    }
@@ -0,0 +1,59 @@
+from slurmmonitor.aggregator import NotificationAggregator
+from slurmmonitor.message import Message
+
+
+def msg(topic, text, active=True):
+    return Message(topic, text, None, active=active)
+
+
+def test_no_window_posts_immediately():
+    aggregator = NotificationAggregator()
+    aggregator.add([msg("a", "a broke"), msg("b", "b broke")], now=0)
+    assert aggregator.take(now=0) == "a broke\nb broke"
+    assert aggregator.take(now=0) is None
+
+
+def test_window_coalesces_latest_per_topic():
+    aggregator = NotificationAggregator(window=120)
+    aggregator.add([msg("job_status x", "x is queued")], now=0)
+    assert aggregator.take(now=60) is None
+    aggregator.add([msg("job_status x", "x is running"), msg("free_bytes /p", "low space")], now=60)
+    assert aggregator.take(now=120) == "x is running\nlow space\n(1 intermediate updates coalesced)"
+
+
+def test_flip_back_to_posted_state_is_dropped():
+    aggregator = NotificationAggregator(window=60)
+    aggregator.add([msg("t", "ok")], now=0)
+    assert aggregator.take(now=60) == "ok"
+
+    aggregator.add([msg("t", "broken")], now=100)
+    aggregator.add([msg("t", "ok")], now=130)
+    assert aggregator.take(now=160) is None
+    assert aggregator.pending == {}
+
+
+def test_rate_limit_defers_and_keeps_coalescing():
+    aggregator = NotificationAggregator(max_posts_per_minute=1)
+    aggregator.add([msg("t", "one")], now=0)
+    assert aggregator.take(now=0) == "one"
+
+    aggregator.add([msg("t", "two")], now=10)
+    assert aggregator.take(now=10) is None
+    aggregator.add([msg("t", "three")], now=30)
+    assert aggregator.take(now=30) is None
+    assert aggregator.take(now=60) == "three\n(1 intermediate updates coalesced)"
+
+
+def test_external_posts_count_against_budget():
+    aggregator = NotificationAggregator(max_posts_per_minute=1)
+    aggregator.record_post(now=0)
+    aggregator.add([msg("t", "one")], now=1)
+    assert aggregator.take(now=1) is None
+    assert aggregator.take(now=1, force=True) == "one"
+
+
+def test_overflow_is_summarised():
+    aggregator = NotificationAggregator(max_lines=2)
+    aggregator.add([msg(f"free_bytes /p{i}", f"p{i} low") for i in range(3)]
+                   + [msg("job_status x", "x queued")], now=0)
+    assert aggregator.take(now=0) == "p0 low\np1 low\n...and 2 more updates (free_bytes, job_status)"
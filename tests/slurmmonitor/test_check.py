@@ -265,5 +265,27 @@ def test_check_job_status_stalled_job_unstalled():
     assert messages[1].active == False
     assert "log: /tmp/log.txt" in messages[1].details
 
+def test_check_free_bytes_set_and_clear_thresholds():
+    free_bytes_config = {"/path": (60, 80)}
+
+    below = check_free_bytes(free_bytes_config, MockClusterState(free_bytes={"/path": 50}))[0]
+    assert below.active
+    assert below.details == "50 B < 60 B"
+
+    between = check_free_bytes(free_bytes_config, MockClusterState(free_bytes={"/path": 70}))[0]
+    assert not between.active
+    assert between.hold
+
+    above = check_free_bytes(free_bytes_config, MockClusterState(free_bytes={"/path": 90}))[0]
+    assert not above.active
+    assert not above.hold
+
+
+def test_check_free_inodes_set_and_clear_thresholds():
+    messages = check_free_inodes({"/path": (600, 800)}, MockClusterState(free_inodes={"/path": 700}))
+    assert messages[0].hold
+    assert messages[0].details == "700 > 600"
+
+
 if __name__ == "__main__":
     pytest.main()
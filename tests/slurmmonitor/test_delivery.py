@@ -0,0 +1,164 @@
+import http.server
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from slurmmonitor.delivery import QueuedWorker, WebhookDelivery
+
+
+# Stand-in for the Slack webhook: answers with the scripted statuses in order
+# (200 once they run out) and records every request body.
+class StandInWebhook:
+    def __init__(self, statuses=None, delay=0.0, headers=None):
+        self.statuses = list(statuses or [])
+        self.delay = delay
+        self.headers = headers or {}
+        self.bodies = []
+        self.connections = set()
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                stand_in.bodies.append(json.loads(self.rfile.read(length)))
+                stand_in.connections.add(self.client_address)
+                if stand_in.delay:
+                    time.sleep(stand_in.delay)
+                status = stand_in.statuses.pop(0) if stand_in.statuses else 200
+                body = b"ok" if status == 200 else b"error"
+                self.send_response(status)
+                for key, value in stand_in.headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/hook"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def make_webhook():
+    servers = []
+
+    def make(**kwargs):
+        server = StandInWebhook(**kwargs)
+        servers.append(server)
+        return server
+    yield make
+    for server in servers:
+        server.close()
+
+
+def test_send_posts_json_payload(make_webhook):
+    webhook = make_webhook()
+    delivery = WebhookDelivery(webhook.url)
+    assert delivery.send("hello")
+    assert webhook.bodies == [{"text": "hello"}]
+    assert delivery.sent == 1
+
+
+def test_send_reuses_connection(make_webhook):
+    webhook = make_webhook()
+    delivery = WebhookDelivery(webhook.url)
+    for i in range(3):
+        assert delivery.send(f"message {i}")
+    assert len(webhook.connections) == 1
+
+
+def test_send_retries_transient_errors_with_backoff(make_webhook):
+    webhook = make_webhook(statuses=[500, 503])
+    sleeps = []
+    delivery = WebhookDelivery(webhook.url, backoff=0.5, sleep=sleeps.append)
+    assert delivery.send("hello")
+    assert len(webhook.bodies) == 3
+    assert sleeps == [0.5, 1.0]
+
+
+def test_send_honours_retry_after(make_webhook):
+    webhook = make_webhook(statuses=[429], headers={"Retry-After": "7"})
+    sleeps = []
+    delivery = WebhookDelivery(webhook.url, backoff=0.5, sleep=sleeps.append)
+    assert delivery.send("hello")
+    assert sleeps == [7.0]
+
+
+def test_send_gives_up_on_permanent_error(make_webhook):
+    webhook = make_webhook(statuses=[404])
+    sleeps = []
+    delivery = WebhookDelivery(webhook.url, sleep=sleeps.append)
+    assert not delivery.send("hello")
+    assert len(webhook.bodies) == 1
+    assert sleeps == []
+    assert delivery.failed == 1
+
+
+def test_send_times_out_and_retries(make_webhook):
+    webhook = make_webhook(statuses=[200, 200], delay=0.5)
+    sleeps = []
+    delivery = WebhookDelivery(webhook.url, read_timeout=0.1, max_retries=1, sleep=sleeps.append)
+    start = time.monotonic()
+    assert not delivery.send("hello")
+    assert time.monotonic() - start < 2
+    assert len(sleeps) == 1
+
+
+def test_submit_does_not_block_on_slow_endpoint(make_webhook):
+    webhook = make_webhook(delay=0.3)
+    delivery = WebhookDelivery(webhook.url).start()
+    try:
+        start = time.monotonic()
+        for i in range(3):
+            delivery.submit(f"message {i}")
+        assert time.monotonic() - start < 0.1
+        assert delivery.flush(timeout=5)
+        assert [b["text"] for b in webhook.bodies] == ["message 0", "message 1", "message 2"]
+    finally:
+        delivery.stop(timeout=5)
+
+
+def test_submit_drops_oldest_when_queue_full():
+    delivery = WebhookDelivery("http://127.0.0.1:9/unused", queue_size=2)
+    assert delivery.submit("a")
+    assert delivery.submit("b")
+    assert not delivery.submit("c")
+    assert delivery.dropped == 1
+    assert [delivery.queue.get_nowait(), delivery.queue.get_nowait()] == ["b", "c"]
+
+
+def test_future_reports_delivery(make_webhook):
+    webhook = make_webhook(statuses=[400])
+    delivery = WebhookDelivery(webhook.url, queue_size=1)
+    dropped, failed, delivered = Future(), Future(), Future()
+    delivery.submit("a", dropped)
+    delivery.submit("b", failed)
+    assert dropped.result(timeout=0) is False
+    delivery.start()
+    try:
+        assert failed.result(timeout=5) is False
+        delivery.submit("c", delivered)
+        assert delivered.result(timeout=5) is True
+    finally:
+        delivery.stop(timeout=5)
+
+
+def test_worker_without_send_fails_on_creation():
+    class Incomplete(QueuedWorker):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
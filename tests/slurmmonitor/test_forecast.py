@@ -0,0 +1,71 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from slurmmonitor import quota
+from slurmmonitor.forecast import HORIZON_DAYS, BurnForecast, daily_series, linear_fit
+
+
+def test_daily_series_spreads_jobs_over_days():
+    end = datetime(2026, 1, 8)
+    jobs = [
+        # 36h from the middle of day 5: 12h on day 5, 24h on day 6
+        ("p", datetime(2026, 1, 6, 12), 36.0, 2),
+        # started before the window, 24h of it inside
+        ("p", datetime(2025, 12, 31), 48.0, 1),
+        ("q", None, 10.0, 1),
+    ]
+    assert daily_series(jobs, end, 7) == {"p": [24.0, 0.0, 0.0, 0.0, 0.0, 24.0, 48.0]}
+
+
+def test_fit_constant_and_trending_series():
+    flat = BurnForecast.fit([100.0] * 7)
+    assert flat.rate == pytest.approx(100.0)
+    assert flat.slope == pytest.approx(0.0)
+    assert flat.days_to(1000) == (10, 10, 10)
+
+    assert linear_fit([1.0, 2.0, 3.0]) == (pytest.approx(1.0), pytest.approx(1.0))
+    ramp = BurnForecast.fit([100.0, 200.0, 300.0, 400.0])
+    assert ramp.slope == pytest.approx(100.0)
+    # growing burn gets there sooner than the EWMA level alone
+    assert ramp.days_to(10_000)[1] < 10_000 / ramp.rate
+
+
+def test_noisy_series_has_bands():
+    forecast = BurnForecast.fit([0.0, 200.0, 0.0, 200.0, 0.0, 200.0, 0.0, 200.0])
+    early, expected, late = forecast.days_to(5000)
+    assert early < expected < late
+    assert BurnForecast(0.0).format_eta(100) == f"forecast ~>{HORIZON_DAYS}d [>{HORIZON_DAYS}d->{HORIZON_DAYS}d]"
+
+
+def test_quota_report_shares_one_sacct_query(monkeypatch):
+    now = datetime.now()
+    calls = []
+    rows = "Account|User|Elapsed|AllocTRES|Start\n" + "".join(
+        f"p|alice|12:00:00|gres/gpu=200|{(now - timedelta(days=7 - d)).strftime('%Y-%m-%dT%H:%M:%S')}\n"
+        for d in range(7)
+    )
+
+    def fake_run(cmd):
+        calls.append(cmd)
+        return rows
+
+    monkeypatch.setattr(quota, "run_or_raise", fake_run)
+    monkeypatch.setattr(quota, "get_lumi_allocations", lambda: {
+        "updated_at": now,
+        "projects": {"p": {"gpu_used": 100_000, "gpu_allocated": 1_000_000}},
+    })
+    cfg = {"p": {
+        "start": (now - timedelta(days=100)).strftime("%Y-%m-%d"),
+        "end": (now + timedelta(days=300)).strftime("%Y-%m-%d"),
+    }}
+
+    line = quota.compute_gpu_quota_messages(cfg)[0]
+    assert quota.get_weekly_gpu_hours_by_user(["p"]) == {"p": {"alice": 8400}}
+    assert len(calls) == 1
+
+    # 1200 GPUh a day, 900K to go
+    assert "ETA ~750d/300d" in line
+    # a flat series: the forecast agrees with the 7-day average
+    assert re.search(r"forecast ~75[01]d \[75[01]d-75[01]d\]", line)
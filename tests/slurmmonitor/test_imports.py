@@ -0,0 +1,25 @@
+import pytest
+
+from benchmarks.run import measure_import
+
+# seconds, well above what these take now; a heavy module imported at the
+# top level again shows up here
+IMPORT_BUDGETS = {
+    "main": 0.6,
+    "slurmmonitor.__main__": 0.3,
+}
+
+# imported only on the paths that use them
+LAZY = {
+    "main": ["requests", "dotenv", "http.server", "socketserver", "cProfile", "slurmmonitor.usage",
+             "slurmmonitor.accounting"],
+    # quota/usage reports don't parse squeue output
+    "slurmmonitor.__main__": ["requests", "dotenv", "pydantic", "http.server"],
+}
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_import_budget(module):
+    seconds, loaded = measure_import(module)
+    assert not set(LAZY[module]) & set(loaded)
+    assert seconds < IMPORT_BUDGETS[module]
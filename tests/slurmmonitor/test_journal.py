@@ -0,0 +1,91 @@
+from slurmmonitor.journal import TrackerJournal
+from slurmmonitor.message import Message, MessageTracker
+
+
+def test_tracker_state_survives_restart(tmp_path):
+    path = str(tmp_path / "state.jsonl")
+    tracker = MessageTracker(journal=TrackerJournal(path))
+    tracker.handle(Message("free_bytes /p", "⚠️ low", "1 B < 2 B"))
+    tracker.handle(Message("job_status x", "x is running", "progress 1%"))
+
+    restarted = MessageTracker(journal=TrackerJournal(path))
+    assert sorted(restarted.messages) == ["free_bytes /p", "job_status x"]
+    assert str(restarted.messages["free_bytes /p"]) == "⚠️ low (1 B < 2 B)"
+
+    # unchanged text isn't reported again after the restart
+    assert restarted.handle(Message("free_bytes /p", "⚠️ low", "1 B < 3 B")) is None
+    assert restarted.handle(Message("job_status x", "x is queued", None)) is not None
+
+
+def test_only_text_or_active_changes_are_journaled(tmp_path):
+    path = tmp_path / "state.jsonl"
+    tracker = MessageTracker(journal=TrackerJournal(str(path)))
+    tracker.handle(Message("t", "text", "details 1"))
+    tracker.handle(Message("t", "text", "details 2"))
+    tracker.handle(Message("t", "text", "details 3", active=False))
+    assert len(path.read_text().splitlines()) == 2
+
+
+def test_journal_compacts(tmp_path):
+    path = tmp_path / "state.jsonl"
+    tracker = MessageTracker(journal=TrackerJournal(str(path), compact_every=3))
+    for i in range(5):
+        tracker.handle(Message("t", f"text {i}", None))
+    # compacted to one line after the third append, then two more appends
+    assert len(path.read_text().splitlines()) == 3
+
+    restarted = MessageTracker(journal=TrackerJournal(str(path)))
+    assert restarted.messages["t"].text == "text 4"
+    # loading compacts redundant lines away
+    assert len(path.read_text().splitlines()) == 1
+
+
+def test_journal_skips_truncated_line(tmp_path):
+    path = tmp_path / "state.jsonl"
+    path.write_text('{"topic": "a", "text": "A", "details": null, "active": true}\n{"topic": "b", "te')
+    messages = TrackerJournal(str(path)).load()
+    assert list(messages) == ["a"]
+
+
+def test_missing_journal_starts_empty(tmp_path):
+    journal = TrackerJournal(str(tmp_path / "missing.jsonl"))
+    tracker = MessageTracker(journal=journal)
+    assert tracker.messages == {}
+    assert not journal.loaded
+
+
+def test_pending_change_survives_restart(tmp_path):
+    path = str(tmp_path / "state.jsonl")
+
+    def run(message, now):
+        # a fresh tracker per run, as with main.py --once
+        tracker = MessageTracker(journal=TrackerJournal(path), dwell={"job_status": 180})
+        return tracker.handle(message, now=now)
+
+    assert run(Message("job_status 7B", "7B is running", None), now=0) is None
+    assert run(Message("job_status 7B", "7B is running", None), now=200).text == "7B is running"
+    assert run(Message("job_status 7B", "7B FAILED", None), now=300) is None
+    assert run(Message("job_status 7B", "7B FAILED", None), now=400) is None
+    assert run(Message("job_status 7B", "7B FAILED", None), now=480).text == "7B FAILED"
+    assert run(Message("job_status 7B", "7B FAILED", None), now=600) is None
+
+
+def test_journal_without_tracker_state_counts_as_reported(tmp_path):
+    path = tmp_path / "state.jsonl"
+    path.write_text('{"topic": "t", "text": "low", "details": null, "active": true}\n')
+    tracker = MessageTracker(journal=TrackerJournal(str(path)))
+    assert tracker.reported == {"t": ("low", True)}
+    assert tracker.pending == {}
+
+
+def test_forgotten_topic_stays_forgotten(tmp_path):
+    path = str(tmp_path / "state.jsonl")
+    tracker = MessageTracker(journal=TrackerJournal(path))
+    tracker.handle(Message("free_bytes /old", "low", None), now=0)
+    tracker.handle(Message("free_bytes /new", "low", None), now=0)
+    tracker.forget("free_bytes /old")
+    assert set(tracker.messages) == {"free_bytes /new"}
+
+    restarted = MessageTracker(journal=TrackerJournal(path))
+    assert set(restarted.messages) == {"free_bytes /new"}
+    assert set(restarted.reported) == {"free_bytes /new"}
@@ -0,0 +1,132 @@
+import os
+from types import SimpleNamespace
+
+from slurmmonitor import logtail
+from slurmmonitor.config import Job
+from slurmmonitor.logtail import LogTailer
+
+
+def line(iteration, throughput=150.0):
+    return (f" iteration {iteration:>8}/  715256 | consumed samples: {iteration * 512} | "
+            f"throughput per GPU (TFLOP/s/GPU): {throughput} | loss: 2.1\n")
+
+
+def test_reads_only_appended_bytes(tmp_path):
+    path = tmp_path / "train.out"
+    path.write_text(line(10) + line(20))
+    tailer = LogTailer()
+
+    state = tailer.poll(str(path), now=1000)
+    assert state.iteration == 20
+    assert state.log_interval == 10
+    assert state.throughput == 150.0
+    read = state.bytes_read
+
+    assert tailer.poll(str(path), now=1060).bytes_read == read
+
+    with open(path, "a") as f:
+        f.write(line(30, 120.5) + " iteration 40/ 7")
+    state = tailer.poll(str(path), now=1120)
+    assert state.bytes_read == os.path.getsize(path)
+    assert state.iteration == 30
+    assert state.throughput == 120.5
+
+    # the partial line is completed on the next poll
+    with open(path, "a") as f:
+        f.write("15256 | throughput per GPU (TFLOP/s/GPU): 110.0\n")
+    assert tailer.poll(str(path), now=1180).iteration == 40
+
+
+def test_large_log_is_read_from_its_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(logtail, "INITIAL_BYTES", 1000)
+    path = tmp_path / "train.out"
+    path.write_text("".join(line(i) for i in range(1, 2001)))
+
+    state = LogTailer().poll(str(path), now=1000)
+    assert state.iteration == 2000
+    assert state.bytes_read == 1000
+
+
+def test_truncated_log_is_followed_from_start(tmp_path):
+    path = tmp_path / "train.out"
+    path.write_text(line(100) + line(110) + line(120))
+    tailer = LogTailer()
+    tailer.poll(str(path), now=1000)
+
+    path.write_text(line(5))
+    assert tailer.poll(str(path), now=1060).iteration == 5
+
+
+def test_stall_uses_observed_step_time(tmp_path):
+    path = tmp_path / "train.out"
+    path.write_text(line(10))
+    tailer = LogTailer()
+    tailer.poll(str(path), now=1000)
+    assert tailer.poll(str(path), now=1000).stalled(1000, stall_factor=5) is None
+
+    # 10 iterations every 60s: 6s per iteration, a log line per minute
+    for i, now in enumerate([1060, 1120, 1180], start=2):
+        with open(path, "a") as f:
+            f.write(line(i * 10))
+        state = tailer.poll(str(path), now=now)
+    assert state.step_time == 6.0
+
+    # still logging, but only warnings
+    with open(path, "a") as f:
+        f.write("NCCL WARN Call to recv failed\n" * 100)
+    assert not tailer.poll(str(path), now=1400).stalled(1400, stall_factor=5)
+    assert tailer.poll(str(path), now=1490).stalled(1490, stall_factor=5)
+    assert not tailer.poll(str(path), now=1490).stalled(1490, stall_factor=5, min_stall=600)
+
+
+def test_job_stalled_with_log_tailing(tmp_path):
+    path = tmp_path / "train.out"
+    path.write_text(line(10))
+    os.utime(path, (1000, 1000))
+    job = Job("train", logfile=str(path), stall_factor=5, min_stall=0)
+    tailer = LogTailer()
+
+    # pace unknown: falls back to the mtime rule
+    assert not job.stalled(tailer, now=1100)
+    assert job.stalled(tailer, now=1000 + 4 * 3600)
+
+    assert Job("train", logfile=str(tmp_path / "missing"), stall_factor=5).stalled(tailer, now=1000)
+    assert not Job("train").stalled(tailer)
+
+
+def test_requeued_job_starts_its_pace_over(tmp_path):
+    path = tmp_path / "train.out"
+    path.write_text(line(10))
+    tailer = LogTailer()
+    job = Job("train", logfile=str(path), stall_factor=5, min_stall=0)
+    for i, now in enumerate([1000, 1060, 1120], start=1):
+        with open(path, "a") as f:
+            f.write(line(10 + i * 10))
+        assert not job.stalled(tailer, now=now, run=(7, 0))
+    assert job.stalled(tailer, now=2000, run=(7, 0))
+
+    # requeued at 5000 under the same id, still starting up an hour later
+    os.utime(path, (1120, 1120))
+    assert not job.stalled(tailer, now=8600, run=(7, 5000))
+    assert tailer.states[str(path)].iteration is None
+    assert job.stalled(tailer, now=5000 + 4 * 3600, run=(7, 5000))
+
+
+def test_truncation_is_confirmed_with_a_fresh_stat(tmp_path):
+    path = tmp_path / "train.out"
+    path.write_text(line(10))
+    cached = [os.stat(path)]
+    tailer = LogTailer(stat=lambda p: cached[0])
+    tailer.poll(str(path), now=1000)
+
+    with open(path, "a") as f:
+        f.write(line(20))
+    cached[0] = os.stat(path)
+    state = tailer.poll(str(path), now=1060)
+    read = state.bytes_read
+
+    # a stale cached stat isn't taken for a truncation
+    st = cached[0]
+    cached[0] = SimpleNamespace(st_dev=st.st_dev, st_ino=st.st_ino, st_size=0, st_mtime=st.st_mtime)
+    assert tailer.poll(str(path), now=1120) is state
+    assert state.bytes_read == read
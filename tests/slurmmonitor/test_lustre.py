@@ -0,0 +1,111 @@
+import grp
+import json
+import os
+
+import pytest
+
+from slurmmonitor import snapshot
+from slurmmonitor.lustre import LustreQuotaCollector, QuotaUsage, parse_lfs_quota
+
+FAKE_LFS = os.path.join(os.path.dirname(__file__), "data", "fake_lfs")
+
+
+def test_parse_lfs_quota():
+    usage = parse_lfs_quota("/scratch 1000 2000 3000 - 10 0 100 -\n")
+    assert (usage.kbytes, usage.kbytes_limit, usage.files, usage.files_limit) == (1000, 3000, 10, 100)
+    assert usage.free_bytes == 2000 * 1024
+    assert usage.free_inodes == 90
+
+    # wrapped filesystem name, over quota, soft limit only
+    usage = parse_lfs_quota("/pfs/lustrep1/scratch\n    5000* 4000 0 6d 10 0 0 -\n")
+    assert usage.free_bytes == 0
+    assert usage.files_limit is None and usage.free_inodes is None
+
+    with pytest.raises(ValueError):
+        parse_lfs_quota("/scratch 1000 2000\n")
+
+
+@pytest.fixture
+def lustre(tmp_path, monkeypatch):
+    """Two project dirs on a fake Lustre mount, quotas served by fake_lfs."""
+    mount = tmp_path / "lustre"
+    for name in ("a", "b"):
+        (mount / name).mkdir(parents=True)
+    group = grp.getgrgid(os.stat(mount).st_gid).gr_name
+    log = tmp_path / "lfs.log"
+    monkeypatch.setenv("FAKE_LFS_LOG", str(log))
+    monkeypatch.setenv("FAKE_LFS_QUOTAS", json.dumps({group: "1000 0 5000 - 10 0 100 -"}))
+
+    now = [0.0]
+    collector = LustreQuotaCollector(command=FAKE_LFS, mounts={"/": "ext4", str(mount): "lustre"},
+                                     ttl=300, max_stale=600, clock=lambda: now[0])
+
+    def calls():
+        return log.read_text().splitlines() if log.exists() else []
+
+    return collector, mount, group, now, calls
+
+
+def test_collect_queries_each_quota_once_and_caches(lustre, tmp_path):
+    collector, mount, group, now, calls = lustre
+    paths = [str(mount / "a"), str(mount / "b"), str(tmp_path)]
+
+    usage = collector.collect(paths)
+    # both dirs share the group quota; tmp_path isn't on Lustre
+    assert set(usage) == {str(mount / "a"), str(mount / "b")}
+    assert usage[str(mount / "a")].free_bytes == 4000 * 1024
+    assert calls() == [f"quota -q -g {group} {mount}"]
+
+    now[0] = 299
+    collector.collect(paths)
+    assert len(calls()) == 1
+    now[0] = 300
+    collector.collect(paths)
+    assert len(calls()) == 2
+
+
+def test_failures_use_recent_result_then_statvfs(lustre, monkeypatch):
+    collector, mount, group, now, calls = lustre
+    path = str(mount / "a")
+    assert collector.collect([path])[path].kbytes == 1000
+
+    monkeypatch.setenv("FAKE_LFS_QUOTAS", "{}")
+    now[0] = 400
+    assert collector.collect([path])[path].kbytes == 1000
+    now[0] = 700
+    assert collector.collect([path]) == {}
+
+
+def test_timeout(lustre, monkeypatch):
+    collector, mount, group, now, calls = lustre
+    collector.timeout = 0.2
+    monkeypatch.setenv("FAKE_LFS_SLEEP", "2")
+    assert collector.collect([str(mount / "a")]) == {}
+
+
+def test_project_mode(lustre, monkeypatch):
+    collector, mount, group, now, calls = lustre
+    collector.mode = "project"
+    monkeypatch.setenv("FAKE_LFS_PROJECTS", json.dumps({str(mount / "a"): 462000963}))
+    monkeypatch.setenv("FAKE_LFS_QUOTAS", json.dumps({"462000963": "1 0 2 - 3 0 4 -"}))
+
+    usage = collector.collect([str(mount / "a")])
+    assert usage[str(mount / "a")].free_inodes == 1
+    assert calls() == [f"project -d {mount / 'a'}", f"quota -q -p 462000963 {mount}"]
+
+
+def test_snapshot_prefers_quota_headroom(monkeypatch):
+    paths = list(snapshot.free_bytes_config)
+    monkeypatch.setattr(snapshot.lustre_quota, "collect", lambda _: {
+        paths[0]: QuotaUsage(kbytes=1, kbytes_limit=3, files=0, files_limit=None),
+    })
+    monkeypatch.setattr(snapshot, "get_free_bytes", lambda path: 42)
+    monkeypatch.setattr(snapshot, "get_free_inodes", lambda path: 7)
+    monkeypatch.setattr(snapshot.util, "get_job_state", lambda users: [])
+    monkeypatch.setattr(snapshot.util, "get_queue_days", lambda partition: "1.0")
+
+    state = snapshot.ClusterDataSnapshot()
+    assert state.free_bytes[paths[0]] == 2 * 1024
+    assert all(state.free_bytes[path] == 42 for path in paths[1:])
+    # no inode limit in the quota: statvfs
+    assert set(state.free_inodes.values()) == {7}
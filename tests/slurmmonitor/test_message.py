@@ -71,4 +71,66 @@ def test_message_changes_state_inactive_to_active():
     result = tracker.handle(msg2)
     assert tracker.messages["TestTopic"] == msg2
     assert result == msg2
-    assert tracker.get_active_messages() == [msg2]
\ No newline at end of file
+    assert tracker.get_active_messages() == [msg2]
+
+
+def test_same_text_active_change_is_reported():
+    tracker = MessageTracker()
+    tracker.handle(Message(topic="T", text="same", details=None, active=True))
+    result = tracker.handle(Message(topic="T", text="same", details=None, active=False))
+    assert result is not None
+
+
+def test_dwell_delays_report_until_state_persists():
+    tracker = MessageTracker(min_dwell=120)
+    tracker.handle(Message("T", "ok", None, active=False), now=0)
+    assert tracker.handle(Message("T", "broken", None), now=60) is None
+    assert tracker.handle(Message("T", "broken", None), now=120) is None
+    assert tracker.handle(Message("T", "broken", None), now=180).text == "broken"
+    assert tracker.handle(Message("T", "broken", None), now=240) is None
+
+
+def test_change_reverted_within_dwell_is_not_reported():
+    tracker = MessageTracker(min_dwell=120)
+    # new alerts wait out the dwell time too
+    assert tracker.handle(Message("T", "a", None), now=0) is None
+    assert tracker.handle(Message("T", "a", None), now=120).text == "a"
+    assert tracker.handle(Message("T", "b", None), now=180) is None
+    assert tracker.handle(Message("T", "a", None), now=240) is None
+    assert tracker.handle(Message("T", "a", None), now=600) is None
+    assert tracker.pending == {}
+
+
+def test_dwell_per_topic_prefix():
+    tracker = MessageTracker(dwell={"job_status": 300, "job_status special": 0})
+    assert tracker.dwell_time("job_status x", now=0) == 300
+    assert tracker.dwell_time("job_status special", now=0) == 0
+    assert tracker.dwell_time("free_bytes /p", now=0) == 0
+
+
+def test_flapping_topic_gets_exponential_dwell():
+    tracker = MessageTracker(flap_threshold=2, flap_dwell=100, max_dwell=350, flap_window=3600)
+    tracker.handle(Message("T", "a", None), now=0)
+    assert tracker.handle(Message("T", "b", None), now=10) is not None
+    assert tracker.handle(Message("T", "a", None), now=20) is not None
+    assert tracker.dwell_time("T", now=20) == 100
+    # third flip has to wait out the dwell time
+    assert tracker.handle(Message("T", "b", None), now=30) is None
+    assert tracker.handle(Message("T", "b", None), now=130).text == "b"
+    assert tracker.dwell_time("T", now=130) == 200
+    assert tracker.dwell_time("T", now=130 + 3600) == 0
+
+
+def test_hold_keeps_active_alert():
+    tracker = MessageTracker()
+    tracker.handle(Message("T", "low", None, active=True))
+    assert tracker.handle(Message("T", "ok", None, active=False, hold=True)) is None
+    assert tracker.messages["T"].text == "low"
+    assert tracker.handle(Message("T", "ok", None, active=False)).text == "ok"
+
+
+def test_hold_without_active_alert_is_clear_message():
+    tracker = MessageTracker()
+    assert tracker.handle(Message("T", "ok", None, active=False, hold=True)) is None
+    assert tracker.messages["T"].text == "ok"
+    assert not tracker.messages["T"].hold
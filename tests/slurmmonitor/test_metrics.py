@@ -0,0 +1,80 @@
+import urllib.request
+from datetime import datetime
+
+from slurmmonitor.metrics import CONTENT_TYPE, MetricsExporter, MetricsServer, render_openmetrics
+from slurmmonitor.slurm.util import JobState
+from slurmmonitor.timing import StageTimer
+
+
+class MockClusterState:
+    def __init__(self):
+        self.free_bytes = {"/scratch/project_1": 10e12}
+        self.free_inodes = {"/scratch/project_1": 12345}
+        self.queue_days = {"standard-g": "1.5", "small-g": "inf"}
+        self.jobs = {
+            "train": JobState(job_id=42, state="RUNNING", name="train", time_running=10, time_left=3600, time_since_submit=100),
+        }
+        self.jobs_running_count = {"train": 1}
+        self.jobs_stalled = {}
+
+
+def test_render_snapshot_values():
+    text = render_openmetrics(MockClusterState(), snapshot_time=1700000000)
+    lines = text.splitlines()
+
+    assert lines[-1] == "# EOF"
+    assert "slurmmonitor_snapshot_timestamp_seconds 1700000000" in lines
+    assert 'slurmmonitor_free_bytes{path="/scratch/project_1"} 10000000000000' in lines
+    assert 'slurmmonitor_free_inodes{path="/scratch/project_1"} 12345' in lines
+    assert 'slurmmonitor_queue_days{partition="standard-g"} 1.5' in lines
+    assert 'slurmmonitor_queue_days{partition="small-g"} +Inf' in lines
+    assert 'slurmmonitor_job_running{job="train",state="RUNNING"} 1' in lines
+    assert 'slurmmonitor_job_time_left_seconds{job="train"} 3600' in lines
+    assert 'slurmmonitor_job_id{job="train"} 42' in lines
+    assert "# TYPE slurmmonitor_free_bytes gauge" in lines
+    # no stalled jobs -> no empty family
+    assert "# TYPE slurmmonitor_job_stalled gauge" not in lines
+
+
+def test_render_quota_and_histograms():
+    timer = StageTimer()
+    timer.record("collect.squeue", 0.2)
+    timer.record("collect.squeue", 3.0)
+    quota = {
+        "updated_at": datetime(2025, 1, 1),
+        "projects": {"project_1": {"gpu_used": 100, "gpu_allocated": 1000, "gpu_hours_7d": None}},
+    }
+
+    lines = render_openmetrics(quota=quota, timer=timer).splitlines()
+
+    assert 'slurmmonitor_gpu_quota_used_hours{project="project_1"} 100' in lines
+    assert 'slurmmonitor_gpu_quota_allocated_hours{project="project_1"} 1000' in lines
+    assert not any(line.startswith("slurmmonitor_gpu_quota_used_7d_hours{") for line in lines)
+    assert "# TYPE slurmmonitor_stage_duration_seconds histogram" in lines
+    assert 'slurmmonitor_stage_duration_seconds_bucket{stage="collect.squeue",le="0.1"} 0' in lines
+    assert 'slurmmonitor_stage_duration_seconds_bucket{stage="collect.squeue",le="0.25"} 1' in lines
+    assert 'slurmmonitor_stage_duration_seconds_bucket{stage="collect.squeue",le="5"} 2' in lines
+    assert 'slurmmonitor_stage_duration_seconds_bucket{stage="collect.squeue",le="+Inf"} 2' in lines
+    assert 'slurmmonitor_stage_duration_seconds_count{stage="collect.squeue"} 2' in lines
+
+
+def test_label_values_are_escaped():
+    state = MockClusterState()
+    state.free_bytes = {'/odd "path"\\x': 1}
+    assert 'slurmmonitor_free_bytes{path="/odd \\"path\\"\\\\x"} 1' in render_openmetrics(state)
+
+
+def test_server_serves_latest_snapshot():
+    exporter = MetricsExporter(timer=StageTimer())
+    server = MetricsServer(exporter, "127.0.0.1", 0).start()
+    try:
+        url = f"http://127.0.0.1:{server.port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert response.read().decode() == "# EOF\n"
+
+        exporter.update_snapshot(MockClusterState())
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert 'slurmmonitor_free_bytes{path="/scratch/project_1"}' in response.read().decode()
+    finally:
+        server.stop()
@@ -0,0 +1,204 @@
+from datetime import datetime
+
+from slurmmonitor.journal import TrackerJournal
+from slurmmonitor.message import MessageTracker
+from slurmmonitor.monitor import Monitor, daily_report_due
+from slurmmonitor.timing import StageTimer
+
+
+class MockClusterState:
+    def __init__(self, free_bytes=None, queue_days=None):
+        self.free_bytes = free_bytes or {}
+        self.free_inodes = {}
+        self.jobs = {}
+        self.queue_days = queue_days or {}
+
+
+def make_monitor(posts, echoed, **kwargs):
+    return Monitor(posts.append, [], {"/path": 100}, {}, echo=echoed.append, **kwargs)
+
+
+def test_daily_report_due():
+    assert daily_report_due(datetime(2025, 1, 1, 8, 59), datetime(2025, 1, 1, 9, 0))
+    assert not daily_report_due(datetime(2025, 1, 1, 9, 0), datetime(2025, 1, 1, 9, 1))
+    assert not daily_report_due(datetime(2025, 1, 1, 7, 59), datetime(2025, 1, 1, 10, 0))
+
+
+def test_first_cycle_is_echoed_not_posted():
+    posts, echoed = [], []
+    monitor = make_monitor(posts, echoed)
+
+    result = monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 12, 0))
+
+    assert [m.topic for m in result.messages] == ["free_bytes /path"]
+    assert result.posted is None
+    assert posts == []
+    assert echoed == ["⚠️ Not enough free space on /path (50 B < 100 B)"]
+
+
+def test_changes_after_first_cycle_are_posted():
+    posts, echoed = [], []
+    monitor = make_monitor(posts, echoed)
+
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 12, 0))
+    result = monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 12, 1))
+    assert result.messages == []
+    assert posts == []
+
+    result = monitor.run_cycle(MockClusterState(free_bytes={"/path": 150}), now=datetime(2025, 1, 1, 12, 2))
+    assert result.posted == "✅ Sufficient free space on /path (150 B > 100 B)"
+    assert posts == [result.posted]
+
+
+def test_daily_report_includes_active_messages_and_quota():
+    posts, echoed = [], []
+    monitor = make_monitor(posts, echoed, quota_lines=lambda: ["GPU quota: fine"])
+
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 8, 59))
+    result = monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 9, 0))
+
+    assert result.daily_report == "Daily Status:\n⚠️ Not enough free space on /path (50 B < 100 B)\nGPU quota: fine"
+    assert posts == [result.daily_report]
+
+
+def test_cycle_stages_are_timed():
+    from slurmmonitor.timing import StageTimer
+
+    posts, echoed = [], []
+    timer = StageTimer()
+    monitor = make_monitor(posts, echoed, timer=timer)
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 12, 0))
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 150}), now=datetime(2025, 1, 1, 12, 1))
+
+    stats = timer.stats()
+    for stage in ["check.queue_days", "check.free_bytes", "check.free_inodes", "check.job_status", "tracker.handle"]:
+        assert stats[stage]["count"] == 2
+    assert stats["post"]["count"] == 1
+
+
+def test_aggregator_batches_posts():
+    from slurmmonitor.aggregator import NotificationAggregator
+
+    posts, echoed = [], []
+    monitor = make_monitor(posts, echoed, aggregator=NotificationAggregator(window=120))
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 12, 0))
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 150}), now=datetime(2025, 1, 1, 12, 1))
+    assert posts == []
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 40}), now=datetime(2025, 1, 1, 12, 2))
+    assert posts == []
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 40}), now=datetime(2025, 1, 1, 12, 3))
+    assert posts == ["⚠️ Not enough free space on /path (40 B < 100 B)\n(1 intermediate updates coalesced)"]
+
+
+def test_restored_tracker_posts_from_first_cycle():
+    from slurmmonitor.message import Message, MessageTracker
+
+    tracker = MessageTracker()
+    tracker.handle(Message("free_bytes /path", "⚠️ Not enough free space on /path", "50 B < 100 B"))
+
+    posts, echoed = [], []
+    monitor = make_monitor(posts, echoed, message_tracker=tracker)
+    assert not monitor.first_run
+
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 150}), now=datetime(2025, 1, 1, 12, 0))
+    assert posts == ["✅ Sufficient free space on /path (150 B > 100 B)"]
+    assert echoed == []
+
+
+def test_fanout_receives_messages_and_daily_report():
+    from slurmmonitor.sinks import FanOut, Sink
+
+    class RecordingSink(Sink):
+        def __init__(self):
+            super().__init__("recording")
+            self.topics_seen = []
+
+        def submit(self, messages):
+            self.topics_seen.append([m.topic for m in messages])
+
+    posts, echoed = [], []
+    sink = RecordingSink()
+    monitor = make_monitor(posts, echoed, fanout=FanOut([sink]))
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 8, 58))
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 150}), now=datetime(2025, 1, 1, 8, 59))
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 150}), now=datetime(2025, 1, 1, 9, 0))
+
+    assert sink.topics_seen == [["free_bytes /path"], ["daily_report"]]
+    assert len(posts) == 2
+
+
+def test_incremental_skips_unchanged_checks():
+    posts, echoed = [], []
+    timer = StageTimer()
+    monitor = make_monitor(posts, echoed, timer=timer, incremental=True)
+
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 12, 0))
+    assert set(timer.cycle) >= {"check.free_bytes", "check.job_status"}
+
+    timer.start_cycle()
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 12, 1))
+    assert not any(stage.startswith("check.") for stage in timer.cycle)
+
+    timer.start_cycle()
+    result = monitor.run_cycle(MockClusterState(free_bytes={"/path": 150}), now=datetime(2025, 1, 1, 12, 2))
+    assert [stage for stage in timer.cycle if stage.startswith("check.")] == ["check.free_bytes"]
+    assert result.posted == "✅ Sufficient free space on /path (150 B > 100 B)"
+
+
+def test_first_cycle_echoes_changes_still_in_dwell():
+    posts, echoed = [], []
+    tracker = MessageTracker(dwell={"free_bytes": 120})
+    monitor = make_monitor(posts, echoed, message_tracker=tracker)
+
+    # queue_days has no dwell and is reported right away
+    state = MockClusterState(free_bytes={"/path": 50}, queue_days={"small-g": "2.0"})
+    monitor.run_cycle(state, now=datetime(2025, 1, 1, 12, 0))
+    assert len(echoed) == 1 and "/path" in echoed[0]
+    assert tracker.pending == {}
+
+    # the starting state doesn't come out of the dwell time later
+    result = monitor.run_cycle(state, now=datetime(2025, 1, 1, 12, 5))
+    assert result.posted is None and posts == []
+
+
+def test_one_shot_runs_post_alerts_after_dwell(tmp_path):
+    posts, echoed = [], []
+    path = str(tmp_path / "state.jsonl")
+
+    def run(free, minute):
+        # a new Monitor and tracker per run, as main.py --once builds them
+        journal = TrackerJournal(path)
+        tracker = MessageTracker(journal=journal, dwell={"free_bytes": 120})
+        monitor = make_monitor(posts, echoed, message_tracker=tracker)
+        monitor.first_run = not journal.loaded
+        monitor.run_cycle(MockClusterState(free_bytes={"/path": free}), now=datetime(2025, 1, 1, 12, minute))
+
+    run(150, 0)
+    assert echoed == [] and posts == []
+    run(50, 1)
+    run(50, 2)
+    assert posts == []
+    run(50, 3)
+    assert posts == ["⚠️ Not enough free space on /path (50 B < 100 B)"]
+
+
+def test_incremental_reruns_pending_topics_and_daily_report():
+    posts, echoed = [], []
+    timer = StageTimer()
+    tracker = MessageTracker(min_dwell=120)
+    monitor = make_monitor(posts, echoed, timer=timer, message_tracker=tracker, incremental=True)
+
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 150}), now=datetime(2025, 1, 1, 8, 57))
+    monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 8, 58))
+    assert "free_bytes /path" in tracker.pending
+
+    # nothing changed, but the pending alert must still be confirmed
+    timer.start_cycle()
+    result = monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 8, 59))
+    assert "check.free_bytes" in timer.cycle
+    assert result.messages == []
+
+    timer.start_cycle()
+    result = monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 9, 0))
+    assert {"check.free_bytes", "check.job_status", "check.queue_days"} <= set(timer.cycle)
+    assert result.daily_report is not None
@@ -0,0 +1,65 @@
+import os
+
+from slurmmonitor.checks import get_progress
+from slurmmonitor.config import Job, index_jobs
+from slurmmonitor.progress import ProgressReader
+
+
+def test_reads_step_and_caches_until_file_changes(tmp_path):
+    path = tmp_path / "latest_checkpointed_iteration.txt"
+    path.write_text("1000\n")
+    reader = ProgressReader()
+
+    assert reader.step(str(path)) == 1000
+    assert reader.step(str(path)) == 1000
+    assert reader.reads == 1
+
+    path.write_text("12000\n")
+    assert reader.step(str(path)) == 12000
+    assert reader.reads == 2
+
+    # same size, new mtime
+    path.write_text("13000\n")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert reader.step(str(path)) == 13000
+    assert reader.reads == 3
+
+
+def test_reads_only_the_first_line(tmp_path):
+    path = tmp_path / "latest"
+    path.write_text("500\n" + "x" * 10000)
+    assert ProgressReader(max_bytes=16).step(str(path)) == 500
+
+
+def test_unreadable_files(tmp_path):
+    reader = ProgressReader()
+    assert reader.step(str(tmp_path / "missing")) is None
+    (tmp_path / "empty").write_text("")
+    assert reader.step(str(tmp_path / "empty")) is None
+    (tmp_path / "text").write_text("release\n")
+    assert reader.step(str(tmp_path / "text")) is None
+
+
+def test_job_progress(tmp_path):
+    path = tmp_path / "latest"
+    path.write_text("250\n")
+    reader = ProgressReader()
+    assert Job("a", latest=str(path), total=1000).progress(reader) == "25.0%"
+    assert Job("a", latest=str(tmp_path / "missing"), total=1000).progress(reader) == "?"
+    assert Job("a").progress(reader) == "na"
+
+
+def test_get_progress_uses_index(tmp_path):
+    path = tmp_path / "latest"
+    path.write_text("10\n")
+    jobs = [Job("a", latest=str(path), total=100), Job("b")]
+    index = index_jobs(jobs)
+
+    class State:
+        name = "a"
+
+    assert get_progress(index, State) == "10.0%"
+    assert get_progress(jobs, State) == "10.0%"
+    State.name = "unknown"
+    assert get_progress(index, State) == ""
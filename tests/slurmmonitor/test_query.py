@@ -0,0 +1,81 @@
+import json
+from datetime import date, datetime
+
+import pytest
+
+from slurmmonitor import __main__ as cli
+from slurmmonitor.accounting import AccountingCube, GpuJob
+from slurmmonitor.lumi.allocations import AllocationsCache
+from slurmmonitor.query import QueryError, QueryServer, QuotaQuery, ask, format_response
+
+NOW = datetime(2026, 3, 10, 12)
+
+
+def make_cube():
+    cube = AccountingCube(fetch=lambda *args: pytest.fail("sacct should not run"))
+    cube.add_jobs([
+        GpuJob("1", "project_a", "alice", "standard-g", datetime(2026, 3, 9), 10.0, 4.0),
+        GpuJob("2", "project_a", "bob", "small-g", datetime(2026, 3, 10), 2.0, 1.0),
+        GpuJob("3", "project_b", "carol", "standard-g", datetime(2026, 3, 1), 5.0, 1.0),
+    ], date(2026, 3, 1), date(2026, 3, 11), ["project_a", "project_b"])
+    return cube
+
+
+def make_allocations():
+    allocations = AllocationsCache(fetch=lambda: pytest.fail("lumi-allocations should not run"))
+    allocations._loaded = True
+    allocations.data = {
+        "updated_at": datetime(2026, 3, 10, 6),
+        "projects": {"project_a": {"gpu_used": 1000, "gpu_allocated": 5000},
+                     "project_b": {"gpu_used": 10, "gpu_allocated": 20}},
+    }
+    return allocations
+
+
+def test_default_window_is_last_seven_days():
+    query = QuotaQuery(make_cube(), make_allocations(), projects=["project_a", "project_b"], clock=lambda: NOW)
+    response = query.answer({})
+    assert (response["since"], response["until"]) == ("2026-03-04", "2026-03-11")
+    assert response["rows"] == [{"account": "project_a", "gpu_hours": 42.0}]
+    assert response["allocations"]["project_a"] == {"gpu_used": 1000, "gpu_allocated": 5000, "gpu_remaining": 4000}
+
+    response = query.answer({"days": 10, "by": ["account", "user"], "accounts": ["project_b"]})
+    assert response["rows"] == [{"account": "project_b", "user": "carol", "gpu_hours": 5.0}]
+    assert list(response["allocations"]) == ["project_b"]
+
+    text = format_response(query.answer({"by": "user"}))
+    assert "alice  40" in text
+    assert "project_a: 1,000/5,000 GPUh used, 4,000 left" in text
+
+
+@pytest.mark.parametrize("request_, error", [
+    ({"since": "yesterday"}, "since must be YYYY-MM-DD"),
+    ({"by": ["node"]}, "unknown dimension"),
+    ({"days": 0}, "days must be"),
+    ({"since": "2026-03-10", "until": "2026-03-01"}, "until must be after since"),
+    ({"users": "alice"}, "users must be a list"),
+])
+def test_invalid_requests(request_, error):
+    with pytest.raises(QueryError, match=error):
+        QuotaQuery(make_cube(), clock=lambda: NOW).answer(request_)
+
+
+def test_server_round_trip(tmp_path, capsys):
+    path = str(tmp_path / "quota.sock")
+    # a stale socket file from an earlier run is replaced
+    open(path, "w").close()
+    server = QueryServer(QuotaQuery(make_cube(), make_allocations(), clock=lambda: NOW), path).start()
+    try:
+        response = ask(path, {"since": "2026-03-10", "until": "2026-03-11", "by": ["user"]})
+        assert response["rows"] == [{"user": "bob", "gpu_hours": 2.0}]
+        with pytest.raises(QueryError, match="unknown dimension"):
+            ask(path, {"by": ["node"]})
+
+        assert cli.main(["quota", "--socket", path, "--account", "project_a", "--since", "2026-03-09",
+                         "--until", "2026-03-11", "--json"]) == 0
+        assert json.loads(capsys.readouterr().out)["rows"] == [{"account": "project_a", "gpu_hours": 42.0}]
+    finally:
+        server.stop()
+
+    assert cli.main(["quota", "--socket", path]) == 1
+    assert "quota:" in capsys.readouterr().err
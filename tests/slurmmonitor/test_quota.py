@@ -462,3 +462,23 @@ def test_quota_message_absolute_milestone_target(monkeypatch):
     assert len(lines) == 2
     assert "absolute checkpoint 2026-10-31: 400.0K/1000.0K GPUh bonus target" in lines[1]
     assert "(50.0%)" not in lines[1]
+
+
+def test_get_gpu_quota_values(monkeypatch):
+    from slurmmonitor.quota import get_gpu_quota_values
+
+    updated_at = datetime(2025, 10, 10, 12, 0, 0)
+    monkeypatch.setattr("slurmmonitor.quota.get_lumi_allocations", lambda: {
+        "updated_at": updated_at,
+        "projects": {
+            "project_1": {"gpu_used": 10, "gpu_allocated": 100},
+            "project_other": {"gpu_used": 1, "gpu_allocated": 1},
+        },
+    })
+    monkeypatch.setattr("slurmmonitor.quota.get_weekly_gpu_hours_by_project", lambda projects: {"project_1": 7})
+
+    values = get_gpu_quota_values({"project_1": {}, "project_missing": {}})
+    assert values == {
+        "updated_at": updated_at,
+        "projects": {"project_1": {"gpu_used": 10, "gpu_allocated": 100, "gpu_hours_7d": 7}},
+    }
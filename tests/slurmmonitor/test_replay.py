@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+
+from slurmmonitor.replay import RecordedSnapshot, last_record, read_records, replay
+
+
+def job_record(state, job_id=1):
+    return {
+        "job_id": job_id,
+        "state": state,
+        "name": "train",
+        "time_running": 0,
+        "time_left": 3600,
+        "time_since_submit": 60,
+    }
+
+
+def record(ts, free_bytes, state="RUNNING", job_id=1):
+    return {
+        "timestamp": ts.timestamp(),
+        "job_state": {"train": job_record(state, job_id)},
+        "free_bytes": {"/path": free_bytes},
+        "free_inodes": {},
+        "queue_days": {"standard-g": "1.0"},
+    }
+
+
+def test_recorded_snapshot_from_old_log_record():
+    snapshot = RecordedSnapshot.from_record({"timestamp": 0, "job_state": {"train": job_record("PENDING")}})
+    assert snapshot.jobs["train"].pending
+    assert snapshot.free_bytes == {}
+    assert snapshot.queue_days == {}
+
+
+def test_last_record_reads_from_the_end(tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_text("")
+    assert last_record(str(path)) is None
+
+    records = [record(datetime(2025, 1, 1, 0, i), i * 1000) for i in range(50)]
+    path.write_text("".join(json.dumps(r) + "\n" for r in records) + "\n")
+    # blocks smaller than a line still find the whole last line
+    assert last_record(str(path), block_size=16) == records[-1]
+    assert last_record(str(path)) == records[-1]
+
+
+def test_replay_counts_posts_and_daily_reports(tmp_path):
+    records = [
+        record(datetime(2025, 1, 1, 8, 58), 50, state="PENDING"),
+        record(datetime(2025, 1, 1, 8, 59), 50, state="PENDING"),
+        record(datetime(2025, 1, 1, 9, 0), 150),
+        record(datetime(2025, 1, 1, 9, 1), 150),
+    ]
+    log = tmp_path / "log.jsonl"
+    log.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+
+    report = replay(list(read_records(log)), free_bytes_config={"/path": 100})
+    summary = report.summary()
+
+    assert summary["iterations"] == 4
+    assert summary["latency_ms"]["max"] >= summary["latency_ms"]["p50"] > 0
+    assert summary["daily_reports"] == ["2025-01-01T09:00:00"]
+    # first cycle is echoed; 09:00 posts the recovered path/job state plus the daily report
+    assert summary["posts"] == 2
+    assert summary["messages_by_topic"]["free_bytes /path"] == 2
+    assert "✅ Sufficient free space on /path" in report.posts[0][1]
+    assert report.posts[1][1].startswith("Daily Status:")
@@ -0,0 +1,112 @@
+import pytest
+
+from slurmmonitor.checks import check_free_bytes, check_free_inodes, check_queue_days
+from slurmmonitor.rules import RuleSet, builtin_rules, split_threshold
+
+
+class MockClusterState:
+    def __init__(self, free_bytes=None, free_inodes=None, queue_days=None):
+        self.free_bytes = free_bytes or {}
+        self.free_inodes = free_inodes or {}
+        self.queue_days = queue_days or {}
+
+
+def test_builtin_rules_match_checks():
+    free_bytes_config = {"/a": 100, "/b": (2e12, 3e12)}
+    free_inodes_config = {"/a": 5000}
+    state = MockClusterState(
+        free_bytes={"/a": 50, "/b": 2.5e12},
+        free_inodes={"/a": 9000},
+        queue_days={"small-g": "1.5", "standard-g": "inf"},
+    )
+
+    rules = RuleSet(builtin_rules(free_bytes_config, free_inodes_config))
+    expected = (check_queue_days(state)
+                + check_free_bytes(free_bytes_config, state)
+                + check_free_inodes(free_inodes_config, state))
+
+    got = rules.evaluate(state)
+    assert [m.to_dict() for m in got] == [m.to_dict() for m in expected]
+    assert [str(m) for m in got] == [
+        "small-g queue status (1.5 days)",
+        "standard-g queue status (inf days)",
+        "⚠️ Not enough free space on /a (50 B < 100 B)",
+        "✅ Sufficient free space on /b (2.5 TB > 2.0 TB)",
+        "✅ Sufficient free inodes on /a (9.0K > 5.0K)",
+    ]
+    assert got[3].hold
+    assert rules.metrics == ["queue_days", "free_bytes", "free_inodes"]
+
+
+def test_pattern_rules_and_upper_bounds():
+    rules = RuleSet([{
+        "metric": "free_bytes",
+        "keys": ["/scratch/*"],
+        "threshold": (1000, 1200),
+        "op": "<",
+        "severity": "critical",
+        "topic": "low {key}",
+        "message": "{icon} {key} is almost full",
+        "details": "bytes",
+    }, {
+        "metric": "queue_days",
+        "keys": ["small-g"],
+        "threshold": (3, 2),
+        "op": ">",
+        "message": "{icon} {key} queue is {value} days long",
+    }])
+    state = MockClusterState(
+        free_bytes={"/scratch/x": 900, "/scratch/y": 1100, "/flash/x": 1},
+        queue_days={"small-g": 2.5, "standard-g": 10},
+    )
+
+    messages = rules.evaluate(state)
+
+    assert [(m.topic, m.text, m.active, m.hold) for m in messages] == [
+        ("low /scratch/x", "🚨 /scratch/x is almost full", True, False),
+        ("low /scratch/y", "✅ free_bytes on /scratch/y", False, True),
+        ("queue_days small-g", "✅ queue_days on small-g", False, True),
+    ]
+    assert messages[2].details == "2.5 < 3"
+    assert [m.to_dict() for m in rules.evaluate(state, ["queue_days"])] == [messages[2].to_dict()]
+
+
+def test_missing_keys_are_skipped_with_a_warning(caplog):
+    rules = RuleSet(builtin_rules({"/a": 100}, {"/a": 100}))
+    messages = rules.evaluate(MockClusterState(free_bytes={"/a": 200}))
+    assert [str(m) for m in messages] == ["✅ Sufficient free space on /a (200 B > 100 B)"]
+    assert caplog.messages == ["No free_inodes value for /a in the snapshot, not checking it"]
+    # warned once while the key stays missing
+    rules.evaluate(MockClusterState(free_bytes={"/a": 200}))
+    assert len(caplog.messages) == 1
+
+
+def test_has_topic():
+    ruleset = RuleSet(builtin_rules({"/a": 100}, {}) + [
+        {"metric": "gpu_temp", "keys": ["nid*"], "threshold": 90, "op": ">", "topic": "hot {key} ({severity})"},
+    ])
+    assert ruleset.has_topic("free_bytes /a")
+    assert not ruleset.has_topic("free_bytes /b")
+    assert not ruleset.has_topic("free_inodes /a")
+    assert ruleset.has_topic("queue_days_small-g")
+    assert ruleset.has_topic("hot nid001 (warning)")
+    assert not ruleset.has_topic("hot login1 (warning)")
+
+
+def test_split_threshold_direction():
+    assert split_threshold(5) == (5, 5)
+    assert split_threshold((5, 4), "<") == (5, 5)
+    assert split_threshold((5, 4), ">") == (5, 4)
+    assert split_threshold((5, 6), ">") == (5, 5)
+
+
+@pytest.mark.parametrize("spec", [
+    {"thresholds": {"/a": 1}, "op": "<"},
+    {"metric": "free_bytes", "thresholds": {"/a": 1}, "op": "~"},
+    {"metric": "free_bytes", "op": "<"},
+    {"metric": "free_bytes", "threshold": 1, "op": "<", "colour": "red"},
+    {"metric": "free_bytes", "threshold": 1, "op": "<", "severity": "fatal"},
+])
+def test_invalid_rules_are_rejected(spec):
+    with pytest.raises(ValueError):
+        RuleSet([spec])
@@ -0,0 +1,175 @@
+from concurrent.futures import Future
+from datetime import datetime
+
+import pytest
+
+from slurmmonitor.monitor import Monitor
+from slurmmonitor.schedule import FixedRateTicker, JobScheduler, Schedule
+from slurmmonitor.settings import SettingsError, compile_settings
+from slurmmonitor.sinks import FanOut, Sink
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_ticker_keeps_fixed_rate_regardless_of_cycle_time():
+    clock = FakeClock()
+    ticker = FixedRateTicker(60, clock=clock, sleep=clock.sleep)
+    for work in (5, 20, 59):
+        clock.now += work
+        assert ticker.wait() == 0
+    assert clock.sleeps == [55, 40, 1]
+    assert clock.now == 1000 + 3 * 60
+
+
+def test_ticker_skips_overrun_ticks():
+    clock = FakeClock()
+    ticker = FixedRateTicker(60, clock=clock, sleep=clock.sleep)
+    # a 150s cycle: tick 60 is late, tick 120 passed entirely
+    clock.now += 150
+    assert ticker.wait() == 1
+    assert clock.sleeps == []
+    # back on the original grid at 180
+    clock.now += 10
+    assert ticker.wait() == 0
+    assert clock.now == 1000 + 180
+    assert ticker.skipped == 1
+
+
+def test_ticker_jitter_only_delays_the_sleep():
+    clock = FakeClock()
+    ticker = FixedRateTicker(60, jitter=5, clock=clock, sleep=clock.sleep, uniform=lambda a, b: b)
+    ticker.wait()
+    ticker.wait()
+    # ticks stay on the 60s grid, each sleep is 5s past its tick
+    assert clock.sleeps == [65, 60]
+    assert clock.now == 1000 + 2 * 60 + 5
+
+
+def test_schedule_previous():
+    daily = Schedule("daily 09:00")
+    assert daily.previous(datetime(2026, 3, 4, 9, 0)) == datetime(2026, 3, 4, 9, 0)
+    assert daily.previous(datetime(2026, 3, 4, 8, 59)) == datetime(2026, 3, 3, 9, 0)
+    weekly = Schedule("weekly Mon 09:00")
+    # 2026-03-04 is a Wednesday
+    assert weekly.previous(datetime(2026, 3, 4, 12, 0)) == datetime(2026, 3, 2, 9, 0)
+    assert weekly.previous(datetime(2026, 3, 2, 8, 0)) == datetime(2026, 2, 23, 9, 0)
+    with pytest.raises(ValueError):
+        Schedule("hourly")
+
+
+def test_scheduler_catches_up_once_across_restarts(tmp_path):
+    state = str(tmp_path / "schedule.json")
+    jobs = {"daily_report": "daily 09:00"}
+    scheduler = JobScheduler(jobs, state)
+    # a fresh scheduler waits for the next 09:00
+    assert scheduler.due(datetime(2026, 3, 4, 10, 0)) == []
+    assert scheduler.due(datetime(2026, 3, 5, 8, 59)) == []
+    # any cycle after 09:00 triggers it, not only one in the 09 hour
+    assert scheduler.due(datetime(2026, 3, 5, 10, 30)) == ["daily_report"]
+    # until it's marked done
+    assert scheduler.due(datetime(2026, 3, 5, 10, 31)) == ["daily_report"]
+    scheduler.done("daily_report", datetime(2026, 3, 5, 10, 31))
+    assert scheduler.due(datetime(2026, 3, 5, 23, 0)) == []
+
+    # down for two days: one report on restart
+    restarted = JobScheduler(jobs, state)
+    assert restarted.due(datetime(2026, 3, 8, 7, 0)) == ["daily_report"]
+    restarted.done("daily_report", datetime(2026, 3, 8, 7, 0))
+    assert restarted.due(datetime(2026, 3, 8, 8, 59)) == []
+
+
+def test_monitor_sends_scheduled_reports():
+    posts = []
+    scheduler = JobScheduler({"daily_report": "daily 09:00", "weekly_summary": "weekly mon 09:00"})
+    monitor = Monitor(posts.append, [], {}, {}, echo=lambda text: None, scheduler=scheduler,
+                      weekly_lines=lambda: ["project_x:", "  alice: 10 GPUh"])
+
+    class Empty:
+        jobs, free_bytes, free_inodes, queue_days = {}, {}, {}, {}
+
+    assert monitor.run_cycle(Empty(), now=datetime(2026, 3, 1, 8, 0)).daily_report is None
+    # the 09:00 cycle was missed (e.g. a failed snapshot); Monday 2026-03-02
+    result = monitor.run_cycle(Empty(), now=datetime(2026, 3, 2, 9, 7))
+    assert result.daily_report.startswith("Daily Status:")
+    assert result.weekly_summary == "Weekly Summary:\nproject_x:\n  alice: 10 GPUh"
+    result = monitor.run_cycle(Empty(), now=datetime(2026, 3, 2, 9, 8))
+    assert (result.daily_report, result.weekly_summary) == (None, None)
+    assert len(posts) == 2
+
+
+class PendingSink(Sink):
+    def __init__(self):
+        super().__init__("pending")
+        self.futures = []
+
+    def submit(self, messages):
+        self.futures.append(Future())
+        return self.futures[-1]
+
+
+def test_report_is_done_only_once_delivered():
+    sink = PendingSink()
+    scheduler = JobScheduler({"daily_report": "daily 09:00"})
+    monitor = Monitor(lambda text: None, [], {}, {}, echo=lambda text: None, scheduler=scheduler,
+                      fanout=FanOut([sink]))
+
+    class Empty:
+        jobs, free_bytes, free_inodes, queue_days = {}, {}, {}, {}
+
+    monitor.run_cycle(Empty(), now=datetime(2026, 3, 1, 8, 0))
+    assert monitor.run_cycle(Empty(), now=datetime(2026, 3, 1, 9, 0)).daily_report is not None
+    # not sent again while the sink is still delivering it
+    assert monitor.run_cycle(Empty(), now=datetime(2026, 3, 1, 9, 1)).daily_report is None
+    # the sink gave up: the report is due again
+    sink.futures[0].set_result(False)
+    assert monitor.run_cycle(Empty(), now=datetime(2026, 3, 1, 9, 2)).daily_report is not None
+    sink.futures[1].set_result(True)
+    assert monitor.run_cycle(Empty(), now=datetime(2026, 3, 1, 9, 3)).daily_report is None
+    assert scheduler.last_run["daily_report"] == datetime(2026, 3, 1, 9, 2)
+    assert len(sink.futures) == 2
+
+
+def test_failed_weekly_summary_stays_due():
+    posts, echoed = [], []
+    results = [RuntimeError("sacct: timed out"), ["project_x:"], []]
+
+    def weekly_lines():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    scheduler = JobScheduler({"weekly_summary": "weekly mon 09:00"})
+    monitor = Monitor(posts.append, [], {}, {}, echo=echoed.append, scheduler=scheduler, weekly_lines=weekly_lines)
+
+    class Empty:
+        jobs, free_bytes, free_inodes, queue_days = {}, {}, {}, {}
+
+    monitor.run_cycle(Empty(), now=datetime(2026, 3, 1, 8, 0))
+    assert monitor.run_cycle(Empty(), now=datetime(2026, 3, 2, 9, 0)).weekly_summary is None
+    assert echoed == ["Error computing weekly summary: sacct: timed out"]
+    assert scheduler.due(datetime(2026, 3, 2, 9, 1)) == ["weekly_summary"]
+    assert monitor.run_cycle(Empty(), now=datetime(2026, 3, 2, 9, 1)).weekly_summary == "Weekly Summary:\nproject_x:"
+    assert scheduler.due(datetime(2026, 3, 2, 9, 2)) == []
+    # a week with nothing to report is done all the same
+    assert monitor.run_cycle(Empty(), now=datetime(2026, 3, 9, 9, 0)).weekly_summary is None
+    assert scheduler.due(datetime(2026, 3, 9, 9, 1)) == []
+    assert posts == ["Weekly Summary:\nproject_x:"]
+
+
+def test_settings_validate_schedule():
+    with pytest.raises(SettingsError, match="schedule_config.jobs.daily_report"):
+        compile_settings({"schedule_config": {"jobs": {"daily_report": "daily 25:00"}}})
+    with pytest.raises(SettingsError, match="unknown jobs"):
+        compile_settings({"schedule_config": {"jobs": {"hourly": "daily 09:00"}}})
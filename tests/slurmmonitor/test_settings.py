@@ -0,0 +1,172 @@
+import dataclasses
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from slurmmonitor import config
+from slurmmonitor.journal import TrackerJournal
+from slurmmonitor.message import MessageTracker
+from slurmmonitor.monitor import Monitor
+from slurmmonitor.quota import QuotaProject, compute_gpu_quota_messages
+from slurmmonitor.settings import (
+    SettingsError, SettingsWatcher, compile_settings, diff_settings, load_settings,
+)
+
+TOML = """
+users = ["alice", "bob", "alice"]
+
+[free_bytes_config]
+"/scratch/project_x/" = [10e12, 11e12]
+"/scratch/project_x" = [10e12, 11e12]
+
+[[job_config]]
+name = "7B"
+logfile = "/scratch/project_x/logs/latest.out"
+stall_factor = 10
+
+[gpu_quota_projects.project_x]
+start = "2026-01-01"
+end = "2026-12-31"
+milestone = { name = "checkpoint", date = "2026-06-30", target_pct = 40.0 }
+"""
+
+
+class MockClusterState:
+    def __init__(self, free_bytes=None):
+        self.free_bytes = free_bytes or {}
+        self.free_inodes = {}
+        self.jobs = {}
+        self.queue_days = {}
+
+
+def write(path, sections):
+    path.write_text(json.dumps(sections))
+    # make sure the reload sees a new mtime even on coarse timestamps
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_load_toml_compiles_and_freezes(tmp_path):
+    path = tmp_path / "monitor.toml"
+    path.write_text(TOML)
+    settings = load_settings(str(path))
+
+    assert settings.users == ("alice", "bob")
+    assert dict(settings.free_bytes_config) == {"/scratch/project_x": (10e12, 11e12)}
+    assert settings.jobs_by_name["7B"].stall_factor == 10
+    project = settings.gpu_quota_projects["project_x"]
+    assert isinstance(project, QuotaProject)
+    assert project.start == datetime(2026, 1, 1)
+    assert project.milestones[0].target_used(1000) == pytest.approx(400)
+    # sections the file doesn't set come from config.py
+    assert settings.slurm_partitions == tuple(config.slurm_partitions)
+    assert settings.tracker_config["dwell"]["job_status"] == config.tracker_config["dwell"]["job_status"]
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.users = ()
+    with pytest.raises(TypeError):
+        settings.free_bytes_config["/tmp"] = 1
+
+
+@pytest.mark.parametrize("sections, error", [
+    ({"colour": "blue"}, "unknown settings"),
+    ({"users": "alice"}, "users: expected a list"),
+    ({"job_config": [{"name": "a"}, {"name": "a"}]}, "duplicate job names"),
+    ({"job_config": [{"name": "a", "lgofile": "x"}]}, "unknown keys"),
+    ({"free_inodes_config": {"/a": 1, "/a/": 2}}, "listed twice"),
+    ({"rules_config": [{"metric": "free_bytes", "op": "~"}]}, "rules_config"),
+    ({"gpu_quota_projects": {"p": {"start": "2026-01-01",
+                                   "milestone": {"date": "2026-02-01", "target_pct": 140}}}},
+     "gpu_quota_projects.p: milestone target_pct"),
+])
+def test_invalid_settings_are_rejected(sections, error):
+    with pytest.raises(SettingsError, match=error):
+        compile_settings(sections)
+
+
+def test_compiled_projects_report_like_raw_config(monkeypatch):
+    raw = {"project_x": {"start": "2025-01-01", "end": "2026-12-31",
+                         "milestone": {"name": "checkpoint", "date": "2026-01-31", "target_mode": "linear"}}}
+    monkeypatch.setattr("slurmmonitor.quota.get_lumi_allocations", lambda: {
+        "updated_at": datetime(2026, 1, 1, 12),
+        "projects": {"project_x": {"gpu_used": 300_000, "gpu_allocated": 1_000_000}},
+    })
+    monkeypatch.setattr("slurmmonitor.quota.get_weekly_gpu_hours_by_project", lambda projects: {"project_x": 35_000})
+    monkeypatch.setattr("slurmmonitor.quota.get_gpu_forecasts", lambda projects: {})
+
+    compiled = compile_settings({"gpu_quota_projects": raw}).gpu_quota_projects
+    assert compute_gpu_quota_messages(compiled) == compute_gpu_quota_messages(raw)
+
+
+def test_watcher_reloads_and_diffs(tmp_path, caplog):
+    path = tmp_path / "monitor.json"
+    write(path, {"job_config": [{"name": "a"}], "free_bytes_config": {"/x": 100}})
+    watcher = SettingsWatcher(str(path), stat=os.stat)
+    assert watcher.poll() is None
+
+    write(path, {"job_config": [{"name": "a", "total": 10}, {"name": "b"}], "free_bytes_config": {"/x": 100}})
+    settings, changes = watcher.poll()
+    assert watcher.current is settings
+    assert changes == {"job_config": {"added": ["b"], "removed": [], "changed": ["a"]}}
+
+    # a broken file keeps the running settings
+    path.write_text("{not json")
+    os.utime(path, ns=(0, 1))
+    assert watcher.poll() is None
+    assert watcher.current is settings
+    assert "Not reloading settings" in caplog.text
+
+    write(path, {"job_config": [{"name": "a", "total": 10}, {"name": "b"}], "free_bytes_config": {"/x": 100},
+                 "notification_config": {"window": 10}})
+    _, changes = watcher.poll()
+    assert changes == {"notification_config": {"added": [], "removed": ["max_lines", "max_posts_per_minute"],
+                                               "changed": ["window"]}}
+    assert "take effect after a restart" in caplog.text
+
+
+def test_diff_of_identical_settings_is_empty():
+    assert diff_settings(load_settings(), load_settings()) == {}
+
+
+def test_reconfigure_reruns_only_affected_checks():
+    posts, echoed = [], []
+    old = compile_settings({"free_bytes_config": {"/path": 100}, "free_inodes_config": {}, "job_config": []})
+    monitor = Monitor(posts.append, old.jobs, old.free_bytes_config, old.free_inodes_config,
+                      echo=echoed.append, incremental=True)
+    state = MockClusterState(free_bytes={"/path": 50})
+    monitor.run_cycle(state, now=datetime(2025, 1, 1, 12, 0))
+    assert monitor.message_tracker.messages["free_bytes /path"].active
+
+    new = compile_settings({"free_bytes_config": {"/path": 10}, "free_inodes_config": {}, "job_config": []})
+    changes = diff_settings(old, new)
+    assert set(changes) == {"free_bytes_config"}
+    monitor.reconfigure(new, changes)
+    assert "job_status" not in monitor.forced_checks
+
+    # same snapshot, but the threshold moved: the free_bytes check runs again
+    result = monitor.run_cycle(MockClusterState(free_bytes={"/path": 50}), now=datetime(2025, 1, 1, 12, 1))
+    assert [m.topic for m in result.messages] == ["free_bytes /path"]
+    assert not monitor.message_tracker.messages["free_bytes /path"].active
+    assert monitor.forced_checks == set()
+
+
+def test_removed_paths_and_jobs_leave_the_tracker(tmp_path):
+    journal = str(tmp_path / "state.jsonl")
+    old = compile_settings({"free_bytes_config": {"/a": 100, "/b": 100}, "free_inodes_config": {},
+                            "job_config": [{"name": "7B"}]})
+    monitor = Monitor(lambda text: None, old.jobs, old.free_bytes_config, old.free_inodes_config,
+                      echo=lambda text: None, message_tracker=MessageTracker(journal=TrackerJournal(journal)))
+    monitor.run_cycle(MockClusterState(free_bytes={"/a": 50, "/b": 50}), now=datetime(2025, 1, 1, 12, 0))
+    assert set(monitor.message_tracker.messages) == {"free_bytes /a", "free_bytes /b", "job_status 7B"}
+
+    new = compile_settings({"free_bytes_config": {"/a": 100}, "free_inodes_config": {}, "job_config": []})
+    monitor.reconfigure(new, diff_settings(old, new))
+    assert set(monitor.message_tracker.messages) == {"free_bytes /a"}
+    assert [m.topic for m in monitor.message_tracker.get_active_messages()] == ["free_bytes /a"]
+
+    # journaled topics the configuration no longer checks are dropped on restart
+    monitor = Monitor(lambda text: None, old.jobs, {"/b": 100}, {}, echo=lambda text: None,
+                      message_tracker=MessageTracker(journal=TrackerJournal(journal)))
+    assert set(monitor.message_tracker.messages) == set()
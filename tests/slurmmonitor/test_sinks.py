@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+
+import pytest
+
+from slurmmonitor.delivery import QueuedWorker
+from slurmmonitor.message import Message
+from slurmmonitor.sinks import FanOut, NdjsonSink, Sink, WebhookSink, build_sinks
+
+
+class RecordingSink(Sink):
+    def __init__(self, name, topics=None):
+        super().__init__(name, topics)
+        self.batches = []
+
+    def submit(self, messages):
+        self.batches.append([str(m) for m in messages])
+
+
+class BlockingWorker(QueuedWorker):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.items = []
+
+    def send(self, item):
+        self.release.wait(5)
+        self.items.append(item)
+
+
+class BlockingSink(Sink):
+    def __init__(self, name):
+        super().__init__(name)
+        self.worker = BlockingWorker()
+
+    def submit(self, messages):
+        self.worker.submit(messages)
+
+    def start(self):
+        self.worker.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.worker.release.set()
+        self.worker.stop(timeout)
+
+
+def test_topic_prefix_filter():
+    everything = RecordingSink("all")
+    jobs = RecordingSink("jobs", topics=["job_status", "job_stalled"])
+    fanout = FanOut([everything, jobs])
+
+    fanout.dispatch([
+        Message("free_bytes /p", "low space", None),
+        Message("job_status x", "x queued", None),
+        Message(None, "(2 intermediate updates coalesced)", None),
+    ])
+    fanout.dispatch([Message("free_bytes /p", "ok", None), Message(None, "summary", None)])
+
+    assert everything.batches == [
+        ["low space", "x queued", "(2 intermediate updates coalesced)"],
+        ["ok", "summary"],
+    ]
+    # topic-less summaries only travel along with messages the sink wants
+    assert jobs.batches == [["x queued", "(2 intermediate updates coalesced)"]]
+
+
+def test_ndjson_sink_writes_audit_lines(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    sink = NdjsonSink("audit", str(path), clock=lambda: 1234.0).start()
+    try:
+        sink.submit([Message("t", "text", "details", active=False)])
+        assert sink.writer.flush(timeout=5)
+    finally:
+        sink.stop(timeout=5)
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines == [{"topic": "t", "text": "text", "details": "details", "active": False, "timestamp": 1234.0}]
+
+
+def test_ndjson_sink_retries_write_errors(tmp_path):
+    sleeps = []
+    sink = NdjsonSink("audit", str(tmp_path / "missing" / "audit.jsonl"), max_retries=2, sleep=sleeps.append)
+    assert not sink.writer.send([{"topic": "t"}])
+    assert sleeps == [1.0, 2.0]
+    assert sink.writer.failed == 1
+
+
+def test_slow_sink_does_not_delay_others(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    slow = BlockingSink("slow")
+    audit = NdjsonSink("audit", str(path))
+    fanout = FanOut([slow, audit]).start()
+    try:
+        start = time.monotonic()
+        fanout.dispatch([Message("t", "one", None)])
+        fanout.dispatch([Message("t", "two", None)])
+        assert time.monotonic() - start < 0.1
+
+        assert audit.writer.flush(timeout=5)
+        assert len(path.read_text().splitlines()) == 2
+        assert slow.worker.items == []
+    finally:
+        fanout.stop(timeout=5)
+    assert len(slow.worker.items) == 2
+
+
+def test_sink_without_submit_fails_on_creation():
+    class Incomplete(Sink):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete")
+
+
+def test_build_sinks():
+    sinks = build_sinks([
+        {"type": "webhook", "name": "slack", "url_env": "HOOK"},
+        {"type": "webhook", "name": "team", "url_env": "UNSET_HOOK", "topics": ["job_"]},
+        {"type": "ndjson", "name": "audit", "path": "/tmp/audit.jsonl", "topics": ["free_"]},
+    ], environ={"HOOK": "http://127.0.0.1:9/hook"})
+
+    assert [s.name for s in sinks] == ["slack", "audit"]
+    assert isinstance(sinks[0], WebhookSink)
+    assert sinks[0].delivery.url == "http://127.0.0.1:9/hook"
+    assert sinks[1].topics == ["free_"]
+
+    with pytest.raises(ValueError, match="unknown sink type"):
+        build_sinks([{"type": "carrier-pigeon"}])
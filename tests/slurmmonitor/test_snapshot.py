@@ -43,3 +43,64 @@ def test_statvfs_rejects_repeated_suspicious_all_available_blocks(monkeypatch):
 
     with pytest.raises(RuntimeError, match='suspicious free space'):
         snapshot.get_free_bytes('/scratch/project')
+
+
+def test_snapshot_records_collector_spans(monkeypatch):
+    from slurmmonitor.timing import StageTimer
+
+    monkeypatch.setattr(snapshot.os, 'statvfs', lambda _: StatvfsResult())
+    monkeypatch.setattr(snapshot.util, 'get_job_state', lambda users: [])
+    monkeypatch.setattr(snapshot.util, 'get_queue_days', lambda partition: "1.0")
+
+    timer = StageTimer()
+    timer.start_cycle()
+    snapshot.ClusterDataSnapshot(timer=timer)
+
+    stages = timer.cycle_timings()
+    assert "collect.squeue" in stages
+    for path in snapshot.free_bytes_config:
+        assert f"collect.free_bytes {path}" in stages
+    for partition in snapshot.slurm_partitions:
+        assert f"collect.queue_days {partition}" in stages
+
+
+def test_snapshot_diff_ignores_ticking_job_times():
+    class State:
+        def __init__(self, free_bytes, job):
+            self.free_bytes = free_bytes
+            self.free_inodes = {}
+            self.queue_days = {"small-g": "1.0"}
+            self.jobs = {"train": job}
+
+    class Job:
+        def __init__(self, job_id, state, time_left):
+            self.job_id, self.state, self.time_left = job_id, state, time_left
+
+    prev = State({"/a": 10, "/b": 20}, Job(1, "RUNNING", 100))
+    cur = State({"/a": 10, "/b": 30}, Job(1, "RUNNING", 40))
+    diff = snapshot.snapshot_diff(prev, cur)
+    assert diff.changed["free_bytes"] == {"/b"}
+    assert not diff.touches(["jobs", "queue_days", "jobs_stalled"])
+
+    cur.jobs["train"] = Job(2, "PENDING", 100)
+    cur.free_bytes = dict(prev.free_bytes)
+    diff = snapshot.snapshot_diff(prev, cur)
+    assert diff.touches(["jobs"]) and not diff.touches(["free_bytes"])
+    assert not snapshot.snapshot_diff(prev, prev)
+
+
+def test_snapshot_from_settings_with_configured_job(monkeypatch, tmp_path):
+    from slurmmonitor.settings import compile_settings
+    from slurmmonitor.slurm.util import parse_job_state
+
+    logfile = tmp_path / "latest.out"
+    logfile.write_text("")
+    settings = compile_settings({
+        "job_config": [{"name": "7B", "logfile": str(logfile)}],
+        "free_bytes_config": {}, "free_inodes_config": {}, "slurm_partitions": [],
+    })
+    squeue = "JOBID STATE NAME TIME TIME_LEFT SUBMIT_TIME\n1 PENDING 7B 0:00 1:00:00 2023-11-20T19:21:14\n"
+    monkeypatch.setattr(snapshot.util, 'get_job_state', lambda users: parse_job_state(squeue))
+
+    state = snapshot.ClusterDataSnapshot(settings=settings)
+    assert state.jobs["7B"].pending
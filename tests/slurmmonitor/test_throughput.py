@@ -0,0 +1,88 @@
+from slurmmonitor.checks import check_job_status, check_job_throughput
+from slurmmonitor.throughput import ThroughputTracker
+
+HOUR = 3600
+
+
+class MockJob:
+    def __init__(self, name, job_id=1, running=True, state="RUNNING"):
+        self.name = name
+        self.job_id = job_id
+        self.running = running
+        self.state = state
+        self.emoji = "😊"
+        self.time_left = 3600
+
+
+class MockConfig:
+    def __init__(self, name, total=None):
+        self.name = name
+        self.total = total
+        self.logfile = None
+
+    def stalled(self):
+        return False
+
+    def progress(self):
+        return "na"
+
+
+class MockClusterState:
+    def __init__(self, jobs, job_progress):
+        self.jobs = jobs
+        self.job_progress = job_progress
+
+
+def feed(tracker, name, job_id, points):
+    for now, iteration in points:
+        tracker.observe(name, job_id, iteration, now)
+
+
+def test_rate_baseline_and_slowdown():
+    tracker = ThroughputTracker(window=2 * HOUR, history=24 * HOUR, slowdown_fraction=0.7, min_segments=3)
+    # 1000 it/h for 6 hours, checkpoints every hour
+    feed(tracker, "a", 1, [(h * HOUR, h * 1000) for h in range(7)])
+    assert tracker.rate("a", 6 * HOUR) == 1000
+    assert tracker.baseline("a", 6 * HOUR) == 1000
+    assert tracker.slowed_down("a", 6 * HOUR) is False
+
+    # requeued onto slower nodes: queue time isn't a slow segment
+    feed(tracker, "a", 2, [(9 * HOUR, 6000), (10 * HOUR, 6500), (11 * HOUR, 7000)])
+    assert tracker.rate("a", 11 * HOUR) == 500
+    assert tracker.baseline("a", 11 * HOUR) == 1000
+    assert tracker.slowed_down("a", 11 * HOUR) is True
+    assert tracker.eta("a", 10000, 11 * HOUR) == 6 * HOUR
+
+
+def test_not_enough_history():
+    tracker = ThroughputTracker()
+    assert tracker.slowed_down("a", 0) is None
+    feed(tracker, "a", 1, [(0, 0), (HOUR, 100)])
+    assert tracker.rate("a", HOUR) == 100
+    assert tracker.slowed_down("a", HOUR) is None
+    assert tracker.eta("a", None, HOUR) is None
+
+
+def test_check_job_throughput_and_eta_in_job_status():
+    tracker = ThroughputTracker(window=2 * HOUR, min_segments=3)
+    configs = [MockConfig("a", total=20000), MockConfig("b")]
+    jobs = {"a": MockJob("a"), "b": MockJob("b", running=False, state="PENDING")}
+
+    messages = []
+    for h in range(7):
+        state = MockClusterState(jobs, {"a": h * 1000, "b": 0})
+        messages = check_job_throughput(configs, state, tracker, h * HOUR)
+    assert [(m.topic, m.text, m.active) for m in messages] == [
+        ("job_slowdown a", "a throughput is normal", False),
+    ]
+    assert messages[0].details == "1000 it/h, median 1000 it/h, ETA 00d14h00m00s"
+
+    for h, iteration in [(8, 6400), (9, 7000)]:
+        state = MockClusterState(jobs, {"a": iteration})
+        messages = check_job_throughput(configs, state, tracker, h * HOUR)
+    assert messages[0].text == "🐢 a has slowed down"
+    assert messages[0].active
+
+    # 1000 iterations in the last 3 hours, 13000 to go
+    status = check_job_status(configs, state, state, tracker, 9 * HOUR)
+    assert status[0].details.endswith("00d01h00m00s remaining, ETA 01d15h00m00s at current throughput")
@@ -0,0 +1,64 @@
+from slurmmonitor.timing import NULL_TIMER, StageTimer, percentile
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile([5], 99) == 5
+
+
+def test_span_records_cycle_and_rolling_stats():
+    clock = FakeClock()
+    timer = StageTimer(clock=clock)
+
+    for duration in [1.0, 2.0, 10.0]:
+        timer.start_cycle()
+        with timer.span("collect.squeue"):
+            clock.now += duration
+        with timer.span("post"):
+            clock.now += 0.5
+        with timer.span("post"):
+            clock.now += 0.5
+
+    assert timer.cycle_timings() == {"collect.squeue": 10000.0, "post": 1000.0, "total": 11000.0}
+    assert timer.format_cycle() == "cycle 11.00s: collect.squeue=10.00s post=1.00s"
+
+    stats = timer.stats()
+    assert stats["collect.squeue"] == {"count": 3, "p50": 2.0, "p95": 10.0, "max": 10.0}
+    assert stats["post"]["count"] == 6
+    assert timer.format_stats().splitlines()[0].startswith("collect.squeue: p50 2000.0ms p95 10000.0ms")
+
+
+def test_span_records_when_stage_raises():
+    clock = FakeClock()
+    timer = StageTimer(clock=clock)
+    timer.start_cycle()
+    try:
+        with timer.span("collect.statvfs"):
+            clock.now += 3.0
+            raise OSError("hung mount")
+    except OSError:
+        pass
+    assert timer.cycle_timings()["collect.statvfs"] == 3000.0
+
+
+def test_rolling_window_is_bounded():
+    timer = StageTimer(window=2)
+    for seconds in [5.0, 1.0, 2.0]:
+        timer.record("stage", seconds)
+    assert timer.stats()["stage"]["max"] == 2.0
+
+
+def test_null_timer_spans_are_noops():
+    with NULL_TIMER.span("anything"):
+        pass
+    NULL_TIMER.start_cycle()
@@ -0,0 +1,138 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from slurmmonitor.monitor import Monitor
+from slurmmonitor.query import QueryError, QuotaQuery, format_usage
+from slurmmonitor.usage import UsageReport, UsageScanner, UsageScans, _owner_name
+
+OWNER = _owner_name(str(os.getuid()))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "project"
+    (root / "a").mkdir(parents=True)
+    (root / "b" / "c").mkdir(parents=True)
+    (root / "top.txt").write_text("x")
+    (root / "a" / "f1").write_text("x" * 10000)
+    (root / "b" / "c" / "f2").write_text("x")
+    (root / "b" / "c" / "f3").write_text("x")
+    os.symlink("/", root / "a" / "link")
+    return root
+
+
+def inodes(report):
+    return {name: values[1] for name, values in report.by_subdir.items()}
+
+
+def test_scan_attributes_inodes_to_owner_and_top_dir(tree):
+    report = UsageScanner().scan(str(tree))
+
+    # the symlink counts as an entry but isn't followed
+    assert inodes(report) == {".": 1, "a": 3, "b": 4}
+    assert report.by_owner[OWNER][1] == 8
+    assert report.by_subdir["a"][0] >= 10000
+    assert (report.dirs, report.reused, report.errors) == (4, 0, 0)
+    assert report.summary().startswith(f"top inodes owners: {OWNER} 100%; dirs: b 50%, a 38%, . 12%")
+
+
+def test_rescan_only_lists_changed_directories(tree, tmp_path):
+    cache = str(tmp_path / "usage.json")
+    UsageScanner(cache).scan(str(tree))
+
+    # a new scanner instance starts from the saved records
+    report = UsageScanner(cache).scan(str(tree))
+    assert report.reused == 4
+    assert inodes(report) == {".": 1, "a": 3, "b": 4}
+
+    (tree / "b" / "c" / "f4").write_text("x")
+    (tree / "a" / "f1").unlink()
+    report = UsageScanner(cache).scan(str(tree))
+    assert report.reused == 2
+    assert inodes(report) == {".": 1, "a": 2, "b": 5}
+
+
+def test_usage_scans_runs_in_background_and_rate_limits(tree):
+    now = [0.0]
+    scans = UsageScans(UsageScanner(), min_interval=60, clock=lambda: now[0]).start()
+    try:
+        assert scans.report(str(tree)) is None
+        assert scans.request(str(tree))
+        assert not scans.request(str(tree))
+        assert scans.flush(timeout=10)
+        assert scans.report(str(tree)).by_owner[OWNER][1] == 8
+        now[0] = 61
+        assert scans.request(str(tree))
+    finally:
+        scans.stop(timeout=10)
+
+
+class FakeScans:
+    def __init__(self):
+        self.reports = {}
+        self.requests = []
+
+    def request(self, path):
+        self.requests.append(path)
+        return True
+
+    def report(self, path):
+        return self.reports.get(path)
+
+
+class MockClusterState:
+    def __init__(self, free_inodes):
+        self.free_bytes = {}
+        self.free_inodes = free_inodes
+        self.jobs = {}
+        self.queue_days = {}
+
+
+def test_monitor_attaches_usage_to_inode_alerts():
+    scans = FakeScans()
+    posts = []
+    monitor = Monitor(posts.append, [], {}, {"/scratch/p": 100}, echo=lambda text: None,
+                      incremental=True, usage=scans)
+    monitor.first_run = False
+    state = MockClusterState({"/scratch/p": 50})
+
+    monitor.run_cycle(state, now=datetime(2025, 1, 1, 12, 0))
+    assert scans.requests == ["/scratch/p"]
+    assert posts == ["⚠️ Not enough free inodes on /scratch/p (50 < 100)"]
+    # re-run while the scan is outstanding
+    assert monitor.forced_checks == {"free_inodes"}
+
+    scans.reports["/scratch/p"] = UsageReport("/scratch/p", {"alice": [10, 90], "bob": [10, 10]},
+                                              {"runs": [20, 100]}, 3, 0, 0, 0.1, 0)
+    monitor.run_cycle(MockClusterState({"/scratch/p": 50}), now=datetime(2025, 1, 1, 12, 1))
+    details = monitor.message_tracker.messages["free_inodes /scratch/p"].details
+    assert details.endswith("; top inodes owners: alice 90%, bob 10%; dirs: runs 100%")
+    assert monitor.forced_checks == set()
+    # the alert is posted again with the breakdown, once
+    assert len(posts) == 2 and posts[1].endswith(details + ")")
+    monitor.forced_checks = {"free_inodes"}
+    monitor.run_cycle(MockClusterState({"/scratch/p": 50}), now=datetime(2025, 1, 1, 12, 2))
+    assert len(posts) == 2
+
+    # recovered paths aren't scanned
+    scans.requests.clear()
+    monitor.run_cycle(MockClusterState({"/scratch/p": 500}), now=datetime(2025, 1, 1, 12, 3))
+    assert scans.requests == []
+
+
+def test_query_returns_latest_scan():
+    scans = FakeScans()
+    query = QuotaQuery(None, usage=scans)
+    with pytest.raises(QueryError, match="no usage scan"):
+        query.answer({"usage": "/scratch/p"})
+    assert scans.requests == []
+
+    scans.reports["/scratch/p"] = UsageReport("/scratch/p", {"alice": [2e9, 90]}, {"runs": [2e9, 90]},
+                                              3, 1, 0, 0.1, 0)
+    usage = query.answer({"usage": "/scratch/p"})["usage"]
+    assert usage["by_owner"] == {"alice": {"bytes": 2e9, "inodes": 90}}
+    text = format_usage(usage)
+    assert "2.0 GB, 90 inodes (3 dirs, 1 unchanged" in text
+    assert "alice" in text and "runs" in text
@@ -0,0 +1,78 @@
+import pytest
+
+from slurmmonitor.watch import FileMetadataCache, InotifyWatcher, filesystem_type
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_filesystem_type_uses_longest_mount():
+    mounts = {"/": "ext4", "/scratch": "lustre", "/scratch/local": "tmpfs"}
+    assert filesystem_type("/scratch/project_x/log.out", mounts) == "lustre"
+    assert filesystem_type("/scratch/local/x", mounts) == "tmpfs"
+    assert filesystem_type("/scratchy/x", mounts) == "ext4"
+
+
+def test_polling_cache_without_watcher(tmp_path):
+    path = tmp_path / "log.out"
+    path.write_text("a")
+    clock = FakeClock()
+    cache = FileMetadataCache(poll_ttl=30, clock=clock)
+
+    size = cache.stat(str(path)).st_size
+    path.write_text("abc")
+    assert cache.stat(str(path)).st_size == size
+    assert cache.stats == 1
+
+    clock.now = 31
+    assert cache.stat(str(path)).st_size == 3
+    assert not cache.exists(str(tmp_path / "missing"))
+
+    assert FileMetadataCache().stat(str(path)).st_size == 3
+
+
+def test_unwatchable_filesystems_are_polled(tmp_path):
+    class Watcher:
+        def add(self, directory):
+            raise AssertionError("lustre must not be watched")
+
+        def read_changes(self):
+            return set()
+
+    path = tmp_path / "log.out"
+    path.write_text("a")
+    cache = FileMetadataCache(Watcher(), mounts={"/": "lustre"})
+    cache.stat(str(path))
+    cache.stat(str(path))
+    assert cache.stats == 2
+
+
+def test_inotify_invalidates_cached_metadata(tmp_path):
+    try:
+        watcher = InotifyWatcher()
+    except OSError as e:
+        pytest.skip(f"inotify not available: {e}")
+
+    path = tmp_path / "log.out"
+    cache = FileMetadataCache(watcher, mounts={str(tmp_path): "tmpfs"})
+    try:
+        assert not cache.exists(str(path))
+        assert not cache.exists(str(path))
+        assert cache.stats == 1
+
+        path.write_text("abc")
+        assert cache.stat(str(path)).st_size == 3
+        assert cache.stat(str(path)).st_size == 3
+        assert cache.stats == 2
+
+        with open(path, "a") as f:
+            f.write("def")
+        assert cache.stat(str(path)).st_size == 6
+        assert cache.stats == 3
+    finally:
+        watcher.close()